@@ -3,12 +3,43 @@ tests to run and debug your minimax and alphabeta agents locally.  The test
 cases used by the project assistant are not public.
 """
 
+import itertools
+import os
+import pickle
+import random
+import subprocess
+import sys
+import tempfile
+import timeit
 import unittest
 
 import isolation
+import isolation.symmetry
+import benchmark
+import competition_agent
+import endgame
 import game_agent
+import game_record
+import heuristics
+import opening_book
+import position_suite
+import ratings
+import results_db
+import sample_players
+import search_stats
+import selfplay
+import smp
+import time_manager
+import tournament
+import transposition
 
 from importlib import reload
+from unittest import mock
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class IsolationTest(unittest.TestCase):
@@ -21,5 +52,1181 @@ class IsolationTest(unittest.TestCase):
         self.game = isolation.Board(self.player1, self.player2)
 
 
+class ImportTest(unittest.TestCase):
+    """Check that game_agent loads the optional modules only when used"""
+
+    def test_optional_imports(self):
+        script = "import sys, game_agent; print(' '.join(sys.modules))"
+        output = subprocess.run(
+            [sys.executable, "-c", script], check=True, stdout=subprocess.PIPE,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            universal_newlines=True).stdout
+        loaded = set(output.split())
+        for module in ("endgame", "heuristics", "isolation.symmetry",
+                       "search_stats", "smp", "threading", "timeit",
+                       "transposition"):
+            self.assertNotIn(module, loaded)
+
+
+class BitBoardTest(unittest.TestCase):
+    """Check that isolation.BitBoard behaves exactly like isolation.Board"""
+
+    def setUp(self):
+        self.player1 = "Player1"
+        self.player2 = "Player2"
+
+    def assertSameState(self, board, bitboard):
+        self.assertEqual(board.to_string(), bitboard.to_string())
+        self.assertEqual(board.active_player, bitboard.active_player)
+        self.assertEqual(board.move_count, bitboard.move_count)
+        self.assertEqual(board.hash(), bitboard.hash())
+        self.assertEqual(board.get_blank_spaces(), bitboard.get_blank_spaces())
+        self.assertEqual(board.blocked_mask(), bitboard.blocked_mask())
+        for player in (self.player1, self.player2):
+            self.assertEqual(board.get_player_location(player),
+                             bitboard.get_player_location(player))
+            self.assertEqual(board.location_index(player),
+                             bitboard.location_index(player))
+            self.assertEqual(sorted(board.get_legal_moves(player)),
+                             sorted(bitboard.get_legal_moves(player)))
+            self.assertEqual(board.utility(player), bitboard.utility(player))
+            self.assertEqual(board.is_winner(player), bitboard.is_winner(player))
+            self.assertEqual(board.is_loser(player), bitboard.is_loser(player))
+
+    def test_random_games(self):
+        for width, height in [(7, 7), (5, 8), (9, 6)]:
+            for seed in range(10):
+                board = isolation.Board(self.player1, self.player2, width, height)
+                bitboard = isolation.BitBoard(self.player1, self.player2, width, height)
+                rng = random.Random(seed)
+                while True:
+                    self.assertSameState(board, bitboard)
+                    moves = sorted(board.get_legal_moves())
+                    if not moves:
+                        break
+                    move = rng.choice(moves)
+                    self.assertEqual(board.forecast_move(move).to_string(),
+                                     bitboard.forecast_move(move).to_string())
+                    board.apply_move(move)
+                    bitboard.apply_move(move)
+
+    def test_copy_is_independent(self):
+        bitboard = isolation.BitBoard(self.player1, self.player2)
+        bitboard.apply_move((2, 3))
+        bitboard.apply_move((0, 5))
+        clone = bitboard.copy()
+        clone.apply_move((0, 2))
+        self.assertEqual(bitboard.move_count, 2)
+        self.assertTrue(bitboard.move_is_legal((0, 2)))
+        self.assertFalse(clone.move_is_legal((0, 2)))
+        self.assertEqual(bitboard.get_player_location(self.player1), (2, 3))
+
+
+class DeterministicMovesTest(unittest.TestCase):
+    """Check the fixed move order used with shuffle_moves=False"""
+
+    def test_fixed_order(self):
+        board = isolation.Board("Player1", "Player2", shuffle_moves=False)
+        bitboard = isolation.BitBoard("Player1", "Player2", shuffle_moves=False)
+        rng = random.Random(0)
+        while True:
+            moves = board.get_legal_moves()
+            self.assertEqual(moves, bitboard.get_legal_moves())
+            self.assertEqual(moves, board.copy().get_legal_moves())
+            self.assertEqual(moves, sorted(moves, key=lambda m: (m[1], m[0])))
+            if not moves:
+                break
+            move = rng.choice(moves)
+            board.apply_move(move)
+            bitboard.apply_move(move)
+
+    def test_reproducible_search(self):
+        counts = set()
+        for _ in range(3):
+            player = game_agent.AlphaBetaPlayer()
+            calls = [0]
+
+            def time_left():
+                calls[0] += 1
+                return float("inf")
+
+            player.time_left = time_left
+            game = isolation.BitBoard(player, "Opponent", shuffle_moves=False)
+            game.apply_move((3, 3))
+            game.apply_move((2, 4))
+            player.alphabeta(game, 5)
+            counts.add(calls[0])
+        self.assertEqual(len(counts), 1)
+
+
+class ForecastBoard(isolation.Board):
+    """A board without push_move()/pop_move(), like the project template"""
+
+    @property
+    def push_move(self):
+        raise AttributeError("push_move")
+
+    @property
+    def pop_move(self):
+        raise AttributeError("pop_move")
+
+
+class PushPopTest(unittest.TestCase):
+    """Check the in-place push_move()/pop_move() API of both board classes"""
+
+    def test_push_pop_restores_state(self):
+        for board_class in (isolation.Board, isolation.BitBoard):
+            game = board_class("Player1", "Player2")
+            rng = random.Random(0)
+            snapshots = []
+            while game.get_legal_moves():
+                snapshots.append((game.to_string(), game.hash(),
+                                  game.active_player, game.move_count))
+                move = rng.choice(sorted(game.get_legal_moves()))
+                game.push_move(move)
+                self.assertEqual(game.to_string(), game.copy().to_string())
+            while snapshots:
+                game.pop_move()
+                self.assertEqual((game.to_string(), game.hash(),
+                                  game.active_player, game.move_count),
+                                 snapshots.pop())
+
+    def test_search_timeout_restores_board(self):
+        player1 = game_agent.AlphaBetaPlayer()
+        player2 = game_agent.AlphaBetaPlayer()
+        game = isolation.BitBoard(player1, player2)
+        game.apply_move((3, 3))
+        game.apply_move((2, 2))
+        before = game.to_string()
+        calls = iter(range(1000, 0, -1))
+        player1.time_left = lambda: next(calls, 0) - 500
+        with self.assertRaises(game_agent.SearchTimeout):
+            player1.alphabeta(game, 20)
+        self.assertEqual(game.to_string(), before)
+        self.assertEqual(game.move_count, 2)
+
+    def test_boards_without_push_pop(self):
+        factories = [
+            game_agent.MinimaxPlayer,
+            game_agent.AlphaBetaPlayer,
+            lambda: game_agent.AlphaBetaPlayer(
+                tt_size=2**12, move_ordering=True, driver="pvs",
+                lmr_moves=2)]
+        for factory in factories:
+            results = []
+            for board_class in (isolation.Board, ForecastBoard):
+                player = factory()
+                game = board_class(player, "Opponent", shuffle_moves=False)
+                game.apply_move((3, 3))
+                game.apply_move((2, 4))
+                player.time_left = lambda: float("inf")
+                if isinstance(player, game_agent.AlphaBetaPlayer):
+                    player.new_search()
+                    move = player.alphabeta(game, 4), player.root_value
+                else:
+                    move = player.minimax(game, 3)
+                results.append((move, game.move_count))
+            self.assertEqual(results[0], results[1])
+
+
+class TranspositionTest(unittest.TestCase):
+    """Check Zobrist hashing and the transposition table search"""
+
+    def test_hash_ignores_move_order(self):
+        for board_class in (isolation.Board, isolation.BitBoard):
+            game1 = board_class("Player1", "Player2")
+            for move in [(0, 0), (6, 6), (2, 1), (4, 5), (4, 2)]:
+                game1.apply_move(move)
+            # same cells for each player, in a different order
+            game2 = board_class("Player1", "Player2")
+            for move in [(2, 1), (6, 6), (0, 0), (4, 5), (4, 2)]:
+                game2.apply_move(move)
+            self.assertEqual(game1.to_string(), game2.to_string())
+            self.assertEqual(game1.hash(), game2.hash())
+            # same blocked cells, but player 2 ends on a different cell
+            game3 = board_class("Player1", "Player2")
+            for move in [(0, 0), (4, 5), (2, 1), (6, 6), (4, 2)]:
+                game3.apply_move(move)
+            self.assertNotEqual(game1.hash(), game3.hash())
+
+    def test_table_search_values_match(self):
+        inf = float("inf")
+        for seed in range(5):
+            values = []
+            for tt_size in (None, 4096):
+                player = game_agent.AlphaBetaPlayer(tt_size=tt_size)
+                player.time_left = lambda: inf
+                game = isolation.BitBoard(player, "Opponent")
+                rng = random.Random(seed)
+                for _ in range(6):
+                    game.apply_move(rng.choice(sorted(game.get_legal_moves())))
+                for depth in range(1, 5):
+                    player.alphabeta(game, depth)
+                    values.append(player.max_value(game, depth + 1, -inf, inf))
+            self.assertEqual(values[:4], values[4:])
+
+    def test_bounds(self):
+        table = transposition.TranspositionTable(16)
+        table.record(1, 3, 5., 0., 10., (0, 1))
+        table.record(2, 3, 5., 0., 5., (0, 2))
+        table.record(3, 3, 5., 5., 10., (0, 3))
+        self.assertEqual(table.lookup(1, 3, 0., 10.), (5., (0, 1)))
+        self.assertEqual(table.lookup(1, 4, 0., 10.), (None, (0, 1)))
+        # a lower bound settles windows below it, an upper bound those above
+        self.assertEqual(table.lookup(2, 3, 0., 5.), (5., (0, 2)))
+        self.assertEqual(table.lookup(2, 3, 0., 6.), (None, (0, 2)))
+        self.assertEqual(table.lookup(3, 3, 5., 10.), (5., (0, 3)))
+        self.assertEqual(table.lookup(3, 3, 4., 10.), (None, (0, 3)))
+        self.assertEqual(table.lookup(4, 3, 0., 10.), (None, None))
+
+    def test_sides_kept_apart(self):
+        inf = float("inf")
+        for seed in range(10):
+            rng = random.Random(seed)
+            moves = []
+            game = isolation.BitBoard("Player1", "Player2")
+            for _ in range(6):
+                moves.append(rng.choice(sorted(game.get_legal_moves())))
+                game.apply_move(moves[-1])
+            values = []
+            for both_sides in (False, True):
+                player = game_agent.AlphaBetaPlayer(tt_size=2**16)
+                player.time_left = lambda: inf
+                if both_sides:
+                    # values stored while searching as the second player
+                    # must not be reused when searching as the first
+                    board = isolation.BitBoard("Opponent", player,
+                                               shuffle_moves=False)
+                    for move in moves[:5]:
+                        board.apply_move(move)
+                    player.alphabeta(board, 6)
+                board = isolation.BitBoard(player, "Opponent",
+                                           shuffle_moves=False)
+                for move in moves:
+                    board.apply_move(move)
+                player.alphabeta(board, 4)
+                values.append(player.root_value)
+            self.assertEqual(values[0], values[1])
+
+
+class EvaluationCacheTest(unittest.TestCase):
+    """Check that cached scores match the heuristic and stay bounded"""
+
+    def test_cached_search(self):
+        inf = float("inf")
+        for seed in range(3):
+            values = []
+            for eval_cache in (None, 8):
+                player = game_agent.AlphaBetaPlayer(
+                    score_fn=game_agent.custom_score_2, eval_cache=eval_cache)
+                player.time_left = lambda: inf
+                game = isolation.BitBoard(player, "Opponent")
+                rng = random.Random(seed)
+                for _ in range(6):
+                    game.apply_move(rng.choice(sorted(game.get_legal_moves())))
+                values.append([player.max_value(game, depth, -inf, inf)
+                               for depth in range(1, 5)])
+            self.assertEqual(values[0], values[1])
+            self.assertLessEqual(len(player.score), 8)
+            self.assertGreater(player.score.misses, 8)
+
+    def test_hits_and_sides(self):
+        cache = transposition.EvaluationCache(sample_players.improved_score)
+        game = isolation.BitBoard("Player1", "Player2")
+        game.apply_move((3, 3))
+        game.apply_move((0, 0))
+        for player in ("Player1", "Player2", "Player1"):
+            self.assertEqual(cache(game, player),
+                             sample_players.improved_score(game, player))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        self.assertAlmostEqual(cache.hit_rate, 1 / 3)
+
+
+class SharedTableTest(unittest.TestCase):
+    """Check the shared-memory table and the Lazy-SMP player"""
+
+    def test_same_entries_as_table(self):
+        rng = random.Random(0)
+        shared = smp.SharedTranspositionTable(64)
+        table = transposition.TranspositionTable(64)
+        for _ in range(1000):
+            if rng.random() < 0.02:
+                shared.new_search()
+                table.new_search()
+            entry = (rng.getrandbits(64), rng.randrange(20), rng.randrange(3),
+                     rng.choice([float("inf"), float("-inf"), rng.random()]),
+                     rng.choice([None, (rng.randrange(16), rng.randrange(16))]))
+            shared.store(*entry)
+            table.store(*entry)
+            key = rng.choice([entry[0], rng.getrandbits(64)])
+            self.assertEqual(shared.probe(key), table.probe(key))
+        self.assertEqual(len(shared), len(table))
+
+    def test_parallel_search(self):
+        player = smp.LazySMPPlayer(workers=1)
+        try:
+            game = isolation.BitBoard(player, "Opponent")
+            game.apply_move((3, 3))
+            game.apply_move((2, 4))
+            start = timeit.default_timer()
+            move = player.get_move(
+                game, lambda: 200 - 1000 * (timeit.default_timer() - start))
+            self.assertIn(move, game.get_legal_moves())
+            self.assertEqual(len(player.depths), 2)
+            self.assertIsInstance(player.tt, smp.SharedTranspositionTable)
+        finally:
+            player.close()
+
+
+class MoveOrderingTest(unittest.TestCase):
+    """Check that move ordering changes the search effort, not the result"""
+
+    def search(self, seed, depth, **options):
+        random.seed(seed)
+        player = game_agent.AlphaBetaPlayer(**options)
+        calls = [0]
+
+        def time_left():
+            calls[0] += 1
+            return float("inf")
+
+        player.time_left = time_left
+        game = isolation.BitBoard(player, "Opponent")
+        rng = random.Random(seed)
+        for _ in range(6):
+            game.apply_move(rng.choice(sorted(game.get_legal_moves())))
+        for d in range(1, depth + 1):
+            move = player.alphabeta(game, d)
+
+        # value of the chosen move according to a plain search
+        plain = game_agent.AlphaBetaPlayer()
+        plain.time_left = lambda: float("inf")
+        game._player_1 = game._active_player = plain
+        game.push_move(move)
+        value = plain.min_value(game, depth, float("-inf"), float("inf"))
+        return value, calls[0], player
+
+    def test_ordering_keeps_values(self):
+        plain_calls = ordered_calls = 0
+        for seed in range(5):
+            value, calls, _ = self.search(seed, 5)
+            plain_calls += calls
+            ordered_value, calls, player = self.search(seed, 5, move_ordering=True)
+            ordered_calls += calls
+            self.assertEqual(value, ordered_value)
+            self.assertEqual(len(player.pv), 5)
+        self.assertLess(ordered_calls, plain_calls)
+
+
+class PonderTest(unittest.TestCase):
+    """Check that pondering searches the predicted reply in a helper process"""
+
+    def time_limit(self, millis):
+        start = timeit.default_timer()
+        return lambda: millis - 1000 * (timeit.default_timer() - start)
+
+    def start_pondering(self, player):
+        game = isolation.BitBoard(player, "Opponent", shuffle_moves=False)
+        game.apply_move((3, 3))
+        game.apply_move((2, 4))
+        # the helper process only runs beside the opponent on several CPUs
+        with mock.patch("os.cpu_count", return_value=2):
+            move = player.get_move(game.copy(), self.time_limit(50))
+        game.apply_move(move)
+        return game
+
+    def test_ponder_hit(self):
+        self.assertRaises(ValueError, game_agent.AlphaBetaPlayer, ponder=True)
+
+        player = game_agent.AlphaBetaPlayer(tt_size=2**14, move_ordering=True,
+                                            ponder=True, ponder_limit=1000.)
+        self.addCleanup(player.close)
+        game = self.start_pondering(player)
+        self.assertTrue(player._ponder_worker.pondering)
+        # as set by tournament.play_game() between two games
+        stats = player.stats = search_stats.SearchStats()
+        self.assertIsInstance(player.tt, smp.SharedTranspositionTable)
+
+        for reply in game.get_legal_moves():
+            game.push_move(reply)
+            if game.hash() == player._ponder_key:
+                break
+            game.pop_move()
+        self.assertEqual(game.move_count, 4)
+
+        move = player.get_move(game, self.time_limit(50))
+        self.assertEqual(player.ponder_hits, 1)
+        self.assertIn(move, game.get_legal_moves())
+        player.stop_pondering()
+        self.assertFalse(player._ponder_worker.pondering)
+        # the helper process searches without touching the player
+        self.assertIs(player.stats, stats)
+        self.assertEqual(stats.moves, 1)
+
+        player.close()
+        self.assertIsNone(player._ponder_worker)
+        self.assertNotIsInstance(player.tt, smp.SharedTranspositionTable)
+
+    def test_single_cpu(self):
+        player = game_agent.AlphaBetaPlayer(tt_size=2**10, ponder=True)
+        game = isolation.BitBoard(player, "Opponent", shuffle_moves=False)
+        game.apply_move((3, 3))
+        game.apply_move((2, 4))
+        with mock.patch("os.cpu_count", return_value=1):
+            player.get_move(game, self.time_limit(50))
+        self.assertIsNone(player._ponder_worker)
+        self.assertIsNone(player._ponder_key)
+
+    def test_no_legal_moves(self):
+        for board_class in (isolation.Board, isolation.BitBoard):
+            player = game_agent.AlphaBetaPlayer(tt_size=2**10, ponder=True)
+            # the centre of a 3x3 board has no knight moves
+            game = board_class(player, "Opponent", 3, 3)
+            game.apply_move((1, 1))
+            game.apply_move((0, 0))
+            move = player.get_move(game, self.time_limit(50))
+            self.assertNotIn(move, game.get_legal_moves())
+            self.assertIsNone(player._ponder_worker)
+
+    def test_game_end(self):
+        player = game_agent.AlphaBetaPlayer(tt_size=2**12, ponder=True)
+        self.addCleanup(player.close)
+        with mock.patch("os.cpu_count", return_value=2), \
+                mock.patch.object(tournament, "TIME_LIMIT", 50):
+            tournament.play_game((player, sample_players.GreedyPlayer(),
+                                  [(3, 3), (2, 4)], 0, timeit.default_timer))
+        self.assertIsNotNone(player._ponder_worker)
+        self.assertFalse(player._ponder_worker.pondering)
+
+    def test_pickle(self):
+        player = game_agent.AlphaBetaPlayer(tt_size=2**10, ponder=True)
+        self.addCleanup(player.close)
+        self.start_pondering(player)
+        copy = pickle.loads(pickle.dumps(player))
+        self.assertIsNone(copy._ponder_worker)
+        self.assertNotIsInstance(copy.tt, smp.SharedTranspositionTable)
+
+        # after a game, the timer is a closure local to Board.play()
+        player = game_agent.AlphaBetaPlayer(tt_size=2**10)
+        game = isolation.BitBoard(player, sample_players.RandomPlayer(), 5, 5)
+        game.play(time_limit=20)
+        copy = pickle.loads(pickle.dumps(player))
+        self.assertIsNone(copy.time_left)
+
+
+class SearchStatsTest(unittest.TestCase):
+    """Check the search statistics collected by the agents"""
+
+    def test_counts(self):
+        player = game_agent.AlphaBetaPlayer(stats=True, move_ordering=True)
+        game = isolation.Board(player, "Opponent", shuffle_moves=False)
+        game.apply_move((3, 3))
+        game.apply_move((2, 4))
+        player.time_left = lambda: float("inf")
+        player.new_search()
+        player.stats.start_move()
+        for depth in range(1, 5):
+            player.stats.start_iteration()
+            player.alphabeta(game, depth)
+            player.stats.end_iteration(depth)
+        player.stats.end_move(4)
+
+        stats = player.stats
+        self.assertEqual(stats.depths, [0, 0, 0, 0, 1])
+        self.assertEqual(stats.iterations, [0, 1, 1, 1, 1])
+        self.assertEqual(sum(stats.iteration_nodes), stats.nodes)
+        self.assertGreater(stats.nodes, stats.evaluations)
+        self.assertGreater(sum(stats.cutoffs), 0)
+        self.assertGreater(stats.branching_factor, 1)
+
+        total = search_stats.SearchStats().merge(stats).merge(stats)
+        self.assertEqual(total.nodes, 2 * stats.nodes)
+        self.assertEqual(total.depths, [0, 0, 0, 0, 2])
+        self.assertAlmostEqual(total.branching_factor, stats.branching_factor)
+        self.assertEqual(total.to_dict()["iterations"][0]["count"], 2)
+
+    def test_disabled(self):
+        player = game_agent.MinimaxPlayer()
+        self.assertIsNone(player.stats)
+        player = game_agent.MinimaxPlayer(stats=True)
+        game = isolation.Board(player, "Opponent")
+        game.apply_move((3, 3))
+        game.apply_move((2, 4))
+        player.get_move(game, lambda: float("inf"))
+        self.assertEqual(player.stats.depths, [0, 0, 0, 1])
+        self.assertEqual(player.stats.moves, 1)
+
+
+class TimerCheckTest(unittest.TestCase):
+    """Check the node-count amortised timer checks"""
+
+    def test_check_interval(self):
+        nodes_per_call = {}
+        for interval in (1, 16):
+            player = game_agent.AlphaBetaPlayer(
+                score_fn=heuristics.improved_score, stats=True,
+                check_interval=interval)
+            game = isolation.BitBoard(player, "Player2", 5, 5)
+            game.apply_move((2, 2))
+            game.apply_move((0, 0))
+            calls = []
+
+            def time_left():
+                calls.append(None)
+                return 1000. if len(calls) < 500 else -1.
+            move = player.get_move(game, time_left)
+            self.assertIn(move, game.get_legal_moves())
+            # the search stopped soon after the timer expired
+            self.assertLess(len(calls), 505)
+            nodes_per_call[interval] = player.stats.nodes / len(calls)
+        self.assertLess(nodes_per_call[1], 1.)
+        self.assertGreater(nodes_per_call[16], 4.)
+
+
+class DriverTest(unittest.TestCase):
+    """Check that the root search drivers agree with plain alpha-beta"""
+
+    def test_same_values(self):
+        positions = benchmark.sample_positions(isolation.BitBoard, 6, 8,
+                                               seed=1)
+        results = benchmark.compare_drivers(positions, 5)
+        for driver in game_agent.DRIVERS:
+            self.assertEqual(results[driver]["values"],
+                             results["alphabeta"]["values"])
+
+    def test_get_move(self):
+        for driver in game_agent.DRIVERS:
+            player = game_agent.AlphaBetaPlayer(tt_size=2**12, driver=driver)
+            game = isolation.Board(player, "Player2", 5, 5)
+            game.apply_move((2, 2))
+            game.apply_move((0, 0))
+            deadline = timeit.default_timer() + 0.05
+            move = player.get_move(game, lambda: 1000. * (
+                deadline - timeit.default_timer()))
+            self.assertIn(move, game.get_legal_moves())
+        with self.assertRaises(ValueError):
+            game_agent.AlphaBetaPlayer(driver="mtdf")
+        with self.assertRaises(ValueError):
+            game_agent.AlphaBetaPlayer(driver="negascout")
+
+    def test_fixed_depth(self):
+        player = game_agent.AlphaBetaPlayer(tt_size=2**12, driver="mtdf")
+        player.time_left = lambda: float("inf")
+        game = isolation.Board(player, "Player2", 5, 5)
+        game.apply_move((2, 2))
+        game.apply_move((0, 0))
+        move = player.search_fixed_depth(game, 4)
+        self.assertIn(move, game.get_legal_moves())
+        self.assertEqual(len(player.iteration_values), 4)
+        self.assertEqual(player.iteration_moves[-1], move)
+
+        # every move loses: a legal move is still returned
+        game = isolation.Board(player, "Player2", 4, 4)
+        for move in [(3, 1), (1, 0), (2, 3), (0, 2), (1, 1), (2, 1), (3, 0),
+                     (1, 3)]:
+            game.apply_move(move)
+        self.assertEqual(player.search_fixed_depth(game, 3), (2, 2))
+        self.assertEqual(player.root_value, float("-inf"))
+
+
+class SelectiveSearchTest(unittest.TestCase):
+    """Check the low-mobility extensions and late move reductions"""
+
+    def search(self, positions, depth, **options):
+        inf = float("inf")
+        values = []
+        stats = search_stats.SearchStats()
+        for position in positions:
+            player = game_agent.AlphaBetaPlayer(
+                score_fn=heuristics.improved_score, tt_size=2**12,
+                move_ordering=True, stats=True, **options)
+            player.time_left = lambda: inf
+            game = isolation.swap_players(position, player, "Opponent")
+            player.new_search()
+            move = player.alphabeta(game, depth)
+            self.assertIn(move, game.get_legal_moves())
+            values.append(player.root_value)
+            stats.merge(player.stats)
+        return values, stats
+
+    def test_extensions(self):
+        positions = benchmark.sample_positions(isolation.BitBoard, 7, 6,
+                                               fill=0.4, seed=2)
+        values, stats = self.search(positions, 4)
+        self.assertEqual(stats.extensions, 0)
+        self.assertEqual(self.search(positions, 4, extend_moves=2,
+                                     extension_plies=0)[0], values)
+        _, extended = self.search(positions, 4, extend_moves=2)
+        self.assertGreater(extended.extensions, 0)
+        self.assertGreater(extended.nodes, stats.nodes)
+
+    def test_reductions(self):
+        positions = benchmark.sample_positions(isolation.BitBoard, 7, 6,
+                                               seed=2)
+        _, stats = self.search(positions, 6)
+        _, reduced = self.search(positions, 6, lmr_moves=2)
+        self.assertEqual(stats.reductions, 0)
+        self.assertGreater(reduced.reductions, reduced.researches)
+        self.assertLess(reduced.nodes, stats.nodes)
+        with self.assertRaises(ValueError):
+            game_agent.AlphaBetaPlayer(lmr_moves=2, lmr_depth=1)
+
+
+class TimeManagerTest(unittest.TestCase):
+    """Check the iteration decisions of the time manager"""
+
+    def test_skips_iterations_that_cannot_finish(self):
+        manager = time_manager.TimeManager(min_margin=1., soft_fraction=1.)
+        self.assertEqual(manager.start(lambda: 100., 10.), 10.)
+        self.assertTrue(manager.next_iteration(100., []))
+        self.assertTrue(manager.next_iteration(98., [(0, 1)]))
+        # iterations grow 4x: the next one needs 32ms and only 30ms remain
+        self.assertTrue(manager.next_iteration(90., [(0, 1), (1, 2)]))
+        self.assertFalse(manager.next_iteration(58., [(0, 1), (1, 2), (2, 3)]))
+        self.assertEqual(manager.skipped, 1)
+
+    def test_soft_limit_and_margin(self):
+        manager = time_manager.TimeManager(min_margin=1., soft_fraction=0.5)
+        for last_move, expected in (((0, 1), False), ((1, 2), True)):
+            manager.start(lambda: 100., 10.)
+            manager.next_iteration(100., [])
+            manager.next_iteration(80., [(0, 1)])
+            # 46ms of 90ms used, and the next iteration should take ~34ms
+            self.assertEqual(manager.next_iteration(54., [(0, 1), last_move]),
+                             expected)
+        self.assertEqual((manager.soft_stops, manager.skipped), (1, 0))
+
+        manager.finish(8., True)
+        self.assertEqual(manager.start(lambda: 100., 10.), 4.)
+
+    def test_search_depth_is_bounded(self):
+        player = game_agent.AlphaBetaPlayer(
+            tt_size=2**12, time_manager=time_manager.TimeManager())
+        game = isolation.Board(player, "Opponent", 5, 5)
+        game.apply_move((2, 2))
+        game.apply_move((0, 0))
+        move = player.get_move(game, lambda: float("inf"))
+        self.assertIn(move, game.get_legal_moves())
+        self.assertEqual(len(player.iteration_moves), 23)
+
+    def test_partial_iteration_move(self):
+        # abort MTD(f) searches at many points: a move other than the best
+        # move of the last completed iteration must really be better
+        positions = position_suite.random_positions(5, 5, (4, 10), seed=0)
+        for moves in [next(positions) for _ in range(6)]:
+            for checks in range(20, 520, 20):
+                random.seed(0)
+                player = game_agent.AlphaBetaPlayer(
+                    score_fn=sample_players.improved_score, tt_size=2**12,
+                    driver="mtdf", time_manager=time_manager.TimeManager())
+                game = isolation.swap_players(
+                    position_suite.position(moves, 5, 5), player, "Opponent")
+                # plenty of time left until the timer has been checked
+                # `checks` times
+                timer = itertools.chain([1e9] * checks,
+                                        itertools.repeat(-1.))
+                player.time_left = lambda: next(timer)
+                player.new_search()
+                move = player.iterative_deepening(game)
+                if not player.iteration_moves:
+                    continue
+                previous = player.iteration_moves[-1]
+                if move != previous:
+                    values = position_suite.reference_values(
+                        moves, 5, 5, len(player.iteration_moves) + 1,
+                        sample_players.improved_score)
+                    self.assertGreater(values[move], values[previous])
+
+
+class RatingsTest(unittest.TestCase):
+    """Check the Elo and SPRT helpers used by the rated tournament"""
+
+    def test_elo_update_is_zero_sum(self):
+        table = {}
+        ratings.update_elo(table, "A", "B")
+        self.assertAlmostEqual(sum(table.values()), 2 * ratings.DEFAULT_RATING)
+        self.assertGreater(table["A"], table["B"])
+        self.assertAlmostEqual(ratings.elo_difference(
+            ratings.expected_score(1700, 1500)), 200)
+
+    def test_sprt_decisions(self):
+        strong = ratings.SPRT(0, 50)
+        while strong.status() is None:
+            strong.update(True)
+        self.assertEqual(strong.status(), "H1")
+        weak = ratings.SPRT(0, 50)
+        while weak.status() is None:
+            weak.update(False)
+        self.assertEqual(weak.status(), "H0")
+        self.assertLess(weak.wins + weak.losses, 30)
+
+
+class TournamentTest(unittest.TestCase):
+    """Check that a tournament round gives the same results in parallel"""
+
+    def test_parallel_round(self):
+        cpu_agent = tournament.Agent(sample_players.RandomPlayer(), "Random")
+        test_agents = [tournament.Agent(sample_players.GreedyPlayer(),
+                                        "Greedy")]
+        results = []
+        for processes in (1, 2):
+            win_counts = {cpu_agent.player: 0, test_agents[0].player: 0}
+            games = []
+            pool = tournament.Pool(processes) if processes > 1 else None
+            try:
+                counts = tournament.play_round(
+                    cpu_agent, test_agents, win_counts, 3, seed=0, pool=pool,
+                    recorder=lambda task, result: games.append(result[3]))
+            finally:
+                if pool is not None:
+                    pool.close()
+                    pool.join()
+            results.append((counts, list(win_counts.values()), games))
+        self.assertEqual(len(results[0][2]), 6)
+        self.assertEqual(results[1], results[0])
+
+
+class ResultsDBTest(unittest.TestCase):
+    """Check the tournament results database"""
+
+    def test_agent_version(self):
+        version = results_db.agent_version
+        self.assertEqual(version(game_agent.AlphaBetaPlayer()),
+                         version(game_agent.AlphaBetaPlayer(stats=True)))
+        self.assertNotEqual(version(game_agent.AlphaBetaPlayer()),
+                            version(game_agent.AlphaBetaPlayer(timeout=5.)))
+        self.assertNotEqual(
+            version(game_agent.AlphaBetaPlayer()),
+            version(game_agent.AlphaBetaPlayer(
+                score_fn=sample_players.improved_score)))
+
+    def test_configuration_contents(self):
+        version = results_db.agent_version
+        weights = [1., -1., 0.5, -0.5, 0., 0.]
+        players = [game_agent.AlphaBetaPlayer(
+            score_fn=selfplay.LinearScore(w)) for w in (weights, weights[::-1])]
+        self.assertNotEqual(version(players[0]), version(players[1]))
+        books = [opening_book.OpeningBook() for _ in range(2)]
+        game = isolation.Board("Player1", "Player2")
+        books[1].add(game, (3, 3))
+        self.assertNotEqual(
+            version(game_agent.AlphaBetaPlayer(book=books[0])),
+            version(game_agent.AlphaBetaPlayer(book=books[1])))
+        self.assertEqual(
+            version(game_agent.AlphaBetaPlayer(book=books[1])),
+            version(game_agent.AlphaBetaPlayer(book=books[1])))
+
+    def test_stored_games(self):
+        players = [sample_players.RandomPlayer(),
+                   sample_players.GreedyPlayer()]
+        tasks = [(players[0], players[1], tournament.opening_moves(seed),
+                  "seed-{}".format(seed), timeit.default_timer)
+                 for seed in range(4)]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "results.db")
+            db = results_db.ResultsDB(path, "test")
+            db.register(players[0], "Random")
+            db.register(players[1], "Greedy")
+            results = tournament.play_tasks(tasks[:3], db=db)
+            db.close()
+
+            db = results_db.ResultsDB(path, "test")
+            db.register(players[0], "Random")
+            db.register(players[1], "Greedy")
+            again = tournament.play_tasks(tasks, db=db)
+            self.assertEqual((db.hits, db.misses), (3, 1))
+            self.assertEqual([r[:2] for r in again[:3]],
+                             [r[:2] for r in results])
+            summary = {row["agent"]: row for row in db.summary()}
+            self.assertEqual(summary["Random"]["won"] +
+                             summary["Greedy"]["won"], 4)
+            self.assertEqual(db.summary("other"), [])
+            db.close()
+
+
+class GameRecordTest(unittest.TestCase):
+    """Check that recorded tournament games are read back and replayed"""
+
+    def test_record_and_replay(self):
+        players = [sample_players.RandomPlayer(),
+                   sample_players.GreedyPlayer()]
+        tasks = [(players[0], players[1], tournament.opening_moves(seed),
+                  "seed-{}".format(seed), timeit.default_timer)
+                 for seed in range(3)]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "games.bin")
+            with game_record.RecordWriter(path) as writer:
+                def recorder(task, result):
+                    writer.write(game_record.GameRecord(
+                        7, 7, "Random", "Greedy", result[3], result[0],
+                        result[1]))
+                results = tournament.play_tasks(tasks, recorder=recorder)
+            records = list(game_record.read_records(path))
+            # one byte per move after the file and game headers
+            self.assertEqual(os.path.getsize(path), 5 + sum(
+                6 + 2 + len("RandomGreedy") + len(r[3]) for r in results))
+
+        self.assertEqual(len(records), 3)
+        for record, result in zip(records, results):
+            self.assertEqual((record.player_1, record.player_2),
+                             ("Random", "Greedy"))
+            self.assertEqual(record.moves, result[3])
+            self.assertEqual((record.winner, record.termination), result[:2])
+            board = game_record.replay(record, check=True)
+            self.assertEqual(board.move_count, len(record.moves))
+            self.assertEqual(board.is_loser(board.active_player),
+                             record.termination == "illegal move")
+            boards = [b.hash() for b in game_record.positions(record)]
+            self.assertEqual(len(boards), len(record.moves) + 1)
+            self.assertEqual(boards[5],
+                             game_record.replay(record, ply=5).hash())
+
+    def test_limits(self):
+        with self.assertRaises(ValueError):
+            game_record.GameRecord(17, 7, "a", "b", [], 0, "timeout")
+        with self.assertRaises(ValueError):
+            game_record.GameRecord(7, 7, "a", "b", [], 0, "resigned")
+        record = game_record.GameRecord(16, 16, "a", "b", [(15, 15), (0, 0)],
+                                        1, "timeout")
+        self.assertEqual(record.pack()[-2:], bytes([255, 0]))
+
+    def test_long_names(self):
+        # two bytes per character, so 255 bytes would end mid-character
+        record = game_record.GameRecord(7, 7, "é" * 200, "Ünïcödé", [(0, 0)],
+                                        0, "timeout")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "games.bin")
+            with game_record.RecordWriter(path) as writer:
+                writer.write(record)
+            stored, = game_record.read_records(path)
+        self.assertEqual((stored.player_1, stored.player_2),
+                         ("é" * 127, "Ünïcödé"))
+
+
+class OpeningBookTest(unittest.TestCase):
+    """Check symmetric opening book lookups and the book file format"""
+
+    def test_symmetric_lookup(self):
+        book = opening_book.OpeningBook()
+        game = isolation.BitBoard("Player1", "Player2")
+        for move in [(0, 1), (3, 4), (2, 2)]:
+            game.apply_move(move)
+        book.add(game, (5, 5))
+
+        for perm in opening_book.symmetries(7, 7):
+            variant = isolation.Board("Player1", "Player2")
+            for move in [(0, 1), (3, 4), (2, 2)]:
+                variant.apply_move(opening_book.transform_move(move, perm, 7))
+            self.assertEqual(book.lookup(variant),
+                             opening_book.transform_move((5, 5), perm, 7))
+
+        game.apply_move((5, 5))
+        self.assertIsNone(book.lookup(game))
+
+    def test_save_and_load(self):
+        book = opening_book.build_book(5, 5, plies=2, depth=2)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "book.bin")
+            book.save(path)
+            loaded = opening_book.OpeningBook.load(path)
+        self.assertEqual(loaded.moves, book.moves)
+        self.assertEqual(loaded.plies, 2)
+
+        player = game_agent.AlphaBetaPlayer(book=loaded)
+        game = isolation.Board(player, "Opponent", 5, 5)
+        move = player.get_move(game, lambda: 0)
+        self.assertIn(move, game.get_legal_moves())
+
+
+class SymmetryTest(unittest.TestCase):
+    """Check the canonical keys of symmetric positions"""
+
+    def variants(self, moves, width, height, player_1="Player1"):
+        for perm in isolation.symmetry.symmetries(width, height):
+            variant = isolation.Board(player_1, "Player2", width, height)
+            for move in moves:
+                variant.apply_move(isolation.symmetry.transform_move(
+                    move, perm, height))
+            yield perm, variant
+
+    def test_canonical_key(self):
+        for width, height in [(7, 7), (5, 6)]:
+            rng = random.Random(width)
+            game = isolation.BitBoard("Player1", "Player2", width, height)
+            moves = []
+            for _ in range(8):
+                moves.append(rng.choice(game.get_legal_moves()))
+                game.apply_move(moves[-1])
+                key, transform = isolation.symmetry.canonical_key(game)
+                hashes = []
+                for _, variant in self.variants(moves, width, height):
+                    self.assertEqual(
+                        isolation.symmetry.canonical_key(variant)[0], key)
+                    hashes.append(variant.hash())
+                self.assertEqual(len(hashes), 8 if width == height else 4)
+                self.assertEqual(key, min(hashes))
+                self.assertEqual(hashes[transform], key)
+
+    def test_symmetric_table(self):
+        moves = [(3, 3), (1, 2)]
+        player = game_agent.AlphaBetaPlayer(
+            score_fn=sample_players.improved_score, tt_size=2**16,
+            symmetry_plies=4)
+        player.time_left = lambda: float("inf")
+        game = isolation.Board(player, "Player2")
+        for move in moves:
+            game.apply_move(move)
+        best_move = player.alphabeta(game, 3)
+        self.assertEqual(player.probe(game, 3, 0, 0)[3], best_move)
+
+        for perm, variant in self.variants(moves, 7, 7, player):
+            self.assertEqual(player.probe(variant, 3, 0, 0)[3],
+                             isolation.symmetry.transform_move(best_move,
+                                                               perm, 7))
+
+    def test_asymmetric_score(self):
+        symmetric_score = isolation.symmetry.symmetric_score
+        self.assertTrue(symmetric_score(sample_players.improved_score))
+        self.assertTrue(symmetric_score(heuristics.open_move_score))
+        self.assertFalse(symmetric_score(sample_players.center_score))
+        for score_fn in (game_agent.custom_score, heuristics.center_score):
+            with self.assertRaises(ValueError):
+                game_agent.AlphaBetaPlayer(score_fn=score_fn, tt_size=16,
+                                           symmetry_plies=4)
+        game_agent.AlphaBetaPlayer(score_fn=heuristics.improved_score,
+                                   tt_size=16, symmetry_plies=4,
+                                   eval_cache=16)
+
+
+class BenchmarkTest(unittest.TestCase):
+    """Check the board size scaling benchmark"""
+
+    def test_scaling_exponent(self):
+        cells = [25, 49, 81, 121]
+        self.assertAlmostEqual(benchmark.scaling_exponent(
+            cells, [3. * c**1.5 for c in cells]), 1.5)
+
+    def test_benchmark_size(self):
+        positions = benchmark.sample_positions(isolation.BitBoard, 9, 3)
+        for game in positions:
+            self.assertGreaterEqual(game.move_count, 2)
+            self.assertTrue(game.get_legal_moves())
+        results = [benchmark.benchmark_size(size, positions=2, searches=1,
+                                            time_limit=30., min_time=0.001)
+                   for size in (5, 6)]
+        self.assertEqual(set(benchmark.summarize(results)),
+                         set(results[0]["time_us"]) |
+                         {"search.seconds_per_node"})
+        self.assertGreater(results[1]["search"]["mean_depth"], 0)
+
+
+class PositionSuiteTest(unittest.TestCase):
+    """Check the position suite benchmark under a node budget"""
+
+    def test_suite(self):
+        suite = position_suite.make_suite(count=3, depth=4, plies=(6, 10))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "suite.json")
+            position_suite.save_suite(suite, path)
+            self.assertEqual(position_suite.load_suite(path), suite)
+        for entry in suite["positions"]:
+            game = position_suite.position(entry["moves"])
+            self.assertEqual(len(entry["values"]),
+                             len(game.get_legal_moves()))
+            self.assertLess(len(entry["best_moves"]), len(entry["values"]))
+
+        def make_player():
+            return game_agent.AlphaBetaPlayer(
+                score_fn=heuristics.improved_score, stats=True)
+        reports = [position_suite.run_suite(suite, make_player, nodes=300,
+                                            memory=memory)
+                   for memory in (True, False)]
+        self.assertEqual(reports[0]["results"], reports[1]["results"])
+        self.assertEqual(reports[0]["nodes"], 3 * 300)
+        self.assertGreater(reports[0]["peak_memory_kib"], 0)
+        self.assertIsNone(reports[1]["peak_memory_kib"])
+        self.assertGreater(reports[0]["mean_depth"], 0)
+
+        with self.assertRaises(ValueError):
+            position_suite.run_suite(suite, game_agent.AlphaBetaPlayer,
+                                     nodes=300)
+
+
+class HeuristicsTest(unittest.TestCase):
+    """Check that the fast heuristics match the original functions"""
+
+    def test_identical_scores(self):
+        for width, height in [(7, 7), (5, 8), (9, 6)]:
+            for seed in range(10):
+                rng = random.Random(seed)
+                game = isolation.BitBoard("Player1", "Player2", width, height)
+                # most heuristics need both players on the board
+                game.apply_move((rng.randrange(height), 0))
+                game.apply_move((rng.randrange(height), width - 1))
+                while True:
+                    for score_fn, fast_fn in heuristics.FAST_EQUIVALENTS.items():
+                        for player in ("Player1", "Player2"):
+                            self.assertEqual(score_fn(game, player),
+                                             fast_fn(game, player))
+                    moves = sorted(game.get_legal_moves())
+                    if not moves:
+                        break
+                    game.apply_move(rng.choice(moves))
+
+    def test_fallback(self):
+        game = isolation.Board("Player1", "Player2")
+        game.apply_move((2, 3))
+        game.apply_move((0, 5))
+        self.assertEqual(heuristics.custom_score_2(game, "Player1"),
+                         game_agent.custom_score_2(game, "Player1"))
+        self.assertIs(heuristics.fast_equivalent(sample_players.null_score),
+                      sample_players.null_score)
+
+
+class EndgameTest(unittest.TestCase):
+    """Check the endgame solver against exhaustive game-tree search"""
+
+    def wins(self, game):
+        """Return True if the active player wins with perfect play. """
+        for move in game.get_legal_moves():
+            game.push_move(move)
+            opponent_wins = self.wins(game)
+            game.pop_move()
+            if not opponent_wins:
+                return True
+        return False
+
+    def test_separated_positions(self):
+        solver = endgame.EndgameSolver()
+        solved = 0
+        for seed in range(40):
+            rng = random.Random(seed)
+            game = isolation.BitBoard("Player1", "Player2", 5, 5,
+                                      shuffle_moves=False)
+            while game.get_legal_moves():
+                solution = solver.solve(game)
+                if solution is not None:
+                    break
+                game.apply_move(rng.choice(game.get_legal_moves()))
+            if solution is None:
+                continue
+            solved += 1
+            move, own_length, opp_length = solution
+            self.assertEqual(own_length > opp_length, self.wins(game))
+            game.push_move(move)
+            self.assertEqual(own_length > opp_length, not self.wins(game))
+        self.assertGreater(solved, 10)
+
+
+class MCTSTest(unittest.TestCase):
+    """Check the Monte Carlo tree search competition agent"""
+
+    def countdown(self, iterations):
+        """Return a time_left function that expires after a fixed number
+        of calls, so the tests do not depend on the speed of the machine.
+        """
+        calls = []
+
+        def time_left():
+            calls.append(None)
+            return iterations - len(calls)
+        return time_left
+
+    def test_plays_legal_moves(self):
+        for playout in ("random", "mobility"):
+            player = competition_agent.CustomPlayer(timeout=0.,
+                                                    playout=playout)
+            opponent = competition_agent.CustomPlayer(timeout=0.)
+            game = isolation.BitBoard(player, opponent, 5, 5)
+            while game.get_legal_moves():
+                move = game.active_player.get_move(game.copy(),
+                                                   self.countdown(200))
+                self.assertIn(move, game.get_legal_moves())
+                game.apply_move(move)
+            self.assertEqual(
+                game.active_player.get_move(game, self.countdown(10)),
+                (-1, -1))
+
+    def test_tree_reuse(self):
+        player = competition_agent.CustomPlayer(timeout=0.)
+        game = isolation.BitBoard(player, "Opponent", 5, 5)
+        game.apply_move(player.get_move(game, self.countdown(2000)))
+        reply = player._tree.children[0].move
+        game.apply_move((reply % 5, reply // 5))
+        visits = player._tree.children[0].visits
+        self.assertEqual(player.reuse_tree(game.blocked_mask(),
+                                           reply).visits, visits)
+
+    def test_custom_score(self):
+        player = competition_agent.CustomPlayer()
+        game = isolation.Board(player, "Opponent", 5, 5)
+        game.apply_move((2, 2))
+        game.apply_move((0, 0))
+        random.seed(0)
+        value = player.score(game, player)
+        self.assertTrue(0. <= value <= 1.)
+        random.seed(0)
+        self.assertEqual(player.score(game, "Opponent"), 1. - value)
+
+        # the player to move, in the centre of a 3x3 board, has lost
+        game = isolation.Board(player, "Opponent", 3, 3)
+        game.apply_move((1, 1))
+        game.apply_move((0, 0))
+        self.assertEqual(player.score(game, player), float("-inf"))
+        self.assertEqual(player.score(game, "Opponent"), float("inf"))
+
+
+class SelfPlayTest(unittest.TestCase):
+    """Check the self-play data generator and heuristic tuner"""
+
+    def setUp(self):
+        self.columns = selfplay.generate_positions(4, 5, 5, depth=2)
+
+    def test_positions(self):
+        columns = self.columns
+        self.assertEqual(columns, selfplay.generate_positions(4, 5, 5,
+                                                              depth=2))
+        for name in ("game", "ply", "blocked", "own", "opp", "move", "mover",
+                     "score", "features", "outcome"):
+            self.assertEqual(len(columns[name]), len(columns["game"]))
+        for idx in range(len(columns["game"])):
+            self.assertEqual(columns["mover"][idx], columns["ply"][idx] % 2)
+            blocked = columns["blocked"][idx]
+            self.assertTrue(blocked >> columns["own"][idx] & 1)
+            self.assertFalse(blocked >> columns["move"][idx] & 1)
+            # the side to move at the end of each game loses
+            last = (idx + 1 == len(columns["game"]) or
+                    columns["game"][idx + 1] != columns["game"][idx])
+            if last:
+                self.assertEqual(columns["outcome"][idx], 1)
+
+    def test_linear_score(self):
+        score = selfplay.LinearScore({"own_moves": 1., "opp_moves": -1.})
+        score = pickle.loads(pickle.dumps(score))
+        game = isolation.Board("Player1", "Player2", 5, 5)
+        for move in [(2, 2), (0, 0), (0, 1)]:
+            game.apply_move(move)
+            for player in ("Player1", "Player2"):
+                self.assertEqual(score(game, player),
+                                 sample_players.improved_score(game, player))
+        with self.assertRaises(ValueError):
+            selfplay.LinearScore({"mobility": 1.})
+
+    @unittest.skipIf(numpy is None, "requires NumPy")
+    def test_save_and_fit(self):
+        path = os.path.join(tempfile.mkdtemp(), "selfplay.npz")
+        selfplay.save_positions(self.columns, path)
+        data = selfplay.load_positions(path)
+        self.assertEqual(data["features"].shape,
+                         (len(self.columns["game"]), len(selfplay.FEATURES)))
+        self.assertEqual(data["blocked"].sum(),
+                         sum(bin(mask).count("1")
+                             for mask in self.columns["blocked"]))
+        for target in ("outcome", "score"):
+            score, accuracy = selfplay.fit_weights(data, target)
+            self.assertTrue(all(numpy.isfinite(score.weights)))
+            self.assertGreater(accuracy, 0.)
+
+
 if __name__ == '__main__':
     unittest.main()
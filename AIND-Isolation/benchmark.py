@@ -0,0 +1,282 @@
+"""Measure how the speed of the Isolation boards, heuristics and search
+agents scales with the size of the board.
+
+For each board size, a fixed set of mid-game positions (random play until
+a fraction of the cells is blocked) is used to time
+
+- move generation (`get_legal_moves()`) and `copy()`, for `isolation.Board`
+  and `isolation.BitBoard`;
+- every heuristic of `sample_players` and `game_agent`, and its fast
+  equivalent from `heuristics`;
+- iterative deepening alpha-beta search under a fixed time limit per move,
+  reporting nodes per second and the mean depth reached.
+
+With `--drivers`, the root search drivers of `AlphaBetaPlayer` (see its
+`driver` option) are compared instead: each one searches the same positions
+by iterative deepening to a fixed depth, and the total number of nodes they
+visit is reported along with a check that they all find the same values.
+
+The summary fits the cost of each operation against the number of cells
+(`cost ~ cells ** exponent`, by least squares on the logarithms), so that
+components whose cost per call grows faster than the board are easy to
+spot: an exponent near 1 means the cost is linear in the number of cells.
+
+    python benchmark.py --sizes 5 7 9 11 13 15 --json scaling.json
+    python benchmark.py --drivers --sizes 7 --depth 7
+"""
+import argparse
+import json
+import math
+import random
+import timeit
+
+import game_agent
+import heuristics
+import sample_players
+
+from isolation import Board, BitBoard, swap_players
+from search_stats import SearchStats
+
+# Exponents above this are reported as super-linear
+SUPERLINEAR = 1.25
+
+HEURISTICS = [
+    ("open_move_score", sample_players.open_move_score),
+    ("improved_score", sample_players.improved_score),
+    ("center_score", sample_players.center_score),
+    ("custom_score", game_agent.custom_score),
+    ("custom_score_2", game_agent.custom_score_2),
+    ("custom_score_3", game_agent.custom_score_3),
+]
+
+
+def sample_positions(board_class, size, count, fill=0.25, seed=0):
+    """Return `count` positions on a `size` x `size` board reached by random
+    play until `fill` of the cells are blocked (or the game ends sooner),
+    with both players on the board.
+    """
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        game = board_class("Player1", "Player2", size, size)
+        target = max(2, int(fill * size * size))
+        while game.move_count < target:
+            moves = game.get_legal_moves()
+            if not moves:
+                break
+            game.apply_move(rng.choice(sorted(moves)))
+        if game.move_count >= 2 and game.get_legal_moves():
+            positions.append(game)
+    return positions
+
+
+def time_calls(fn, args_list, min_time=0.2):
+    """Return the mean time (in seconds) of one call of `fn` over the
+    argument tuples of `args_list`, repeated for at least `min_time`
+    seconds.
+    """
+    calls = 0
+    start = timeit.default_timer()
+    while True:
+        for args in args_list:
+            fn(*args)
+        calls += len(args_list)
+        elapsed = timeit.default_timer() - start
+        if elapsed >= min_time:
+            return elapsed / calls
+
+
+def time_search(positions, time_limit, seed=0):
+    """Run one timed alpha-beta search from each position.
+
+    Returns
+    -------
+    dict
+        The nodes per second and mean depth reached by the search.
+    """
+    random.seed(seed)
+    player = game_agent.AlphaBetaPlayer(
+        score_fn=heuristics.improved_score, tt_size=2**16,
+        move_ordering=True, stats=True)
+    player.stats = SearchStats()
+    for position in positions:
+        game = swap_players(position, player, "Opponent")
+        start = timeit.default_timer()
+        player.get_move(game, lambda: time_limit - 1000. * (
+            timeit.default_timer() - start))
+    return {"nodes_per_second": player.stats.nodes_per_second,
+            "mean_depth": player.stats.mean_depth}
+
+
+def benchmark_size(size, positions=20, time_limit=150., searches=5,
+                   min_time=0.2, seed=0):
+    """Time every operation on `size` x `size` boards.
+
+    Returns
+    -------
+    dict
+        The mean time (in microseconds) per call of each operation, keyed by
+        operation name, and the search results.
+    """
+    results = {"size": size, "cells": size * size, "time_us": {}}
+    times = results["time_us"]
+    for board_class in (Board, BitBoard):
+        games = sample_positions(board_class, size, positions, seed=seed)
+        name = board_class.__name__
+        times[name + ".get_legal_moves"] = time_calls(
+            board_class.get_legal_moves, [(g,) for g in games], min_time)
+        times[name + ".copy"] = time_calls(
+            board_class.copy, [(g,) for g in games], min_time)
+        for score_name, score_fn in HEURISTICS:
+            args = [(g, g.active_player) for g in games]
+            if board_class is BitBoard:
+                score_fn = heuristics.fast_equivalent(score_fn)
+                score_name = "fast_" + score_name
+            times[score_name + " (" + name + ")"] = time_calls(
+                score_fn, args, min_time)
+    for op in times:
+        times[op] *= 1e6
+
+    games = sample_positions(BitBoard, size, searches, seed=seed)
+    results["search"] = time_search(games, time_limit, seed)
+    return results
+
+
+def compare_drivers(positions, depth, drivers=game_agent.DRIVERS, seed=0):
+    """Search every position by iterative deepening to `depth` plies with
+    each root driver, using a new player (and transposition table) per
+    position.
+
+    Returns
+    -------
+    dict
+        For each driver, the total number of nodes visited and the list of
+        the root values found at `depth`.
+    """
+    results = {}
+    for driver in drivers:
+        nodes = 0
+        values = []
+        for position in positions:
+            random.seed(seed)
+            player = game_agent.AlphaBetaPlayer(
+                score_fn=heuristics.improved_score, tt_size=2**16,
+                move_ordering=True, stats=True, driver=driver)
+            player.time_left = lambda: float("inf")
+            game = swap_players(position, player, "Opponent")
+            player.search_fixed_depth(game, depth)
+            nodes += player.stats.nodes
+            values.append(player.root_value)
+        results[driver] = {"nodes": nodes, "values": values}
+    return results
+
+
+def scaling_exponent(cells, costs):
+    """Fit `cost ~ cells ** exponent` by least squares on the logarithms
+    and return the exponent.
+    """
+    xs = [math.log(c) for c in cells]
+    ys = [math.log(c) for c in costs]
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    var = sum((x - mean_x)**2 for x in xs)
+    if not var:
+        return 0.
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var
+
+
+def summarize(results):
+    """Return the scaling exponent of the cost of every operation (and of
+    the search nodes per second, whose exponent is usually negative).
+    """
+    cells = [r["cells"] for r in results]
+    exponents = {op: scaling_exponent(cells, [r["time_us"][op]
+                                              for r in results])
+                 for op in results[0]["time_us"]}
+    nps = [r["search"]["nodes_per_second"] for r in results]
+    if all(nps):
+        exponents["search.seconds_per_node"] = scaling_exponent(
+            cells, [1. / n for n in nps])
+    return exponents
+
+
+def print_report(results, exponents):
+    """Print the timings of each board size and the scaling exponents. """
+    sizes = ["{0}x{0}".format(r["size"]) for r in results]
+    header = "{:<34}".format("microseconds per call") + "".join(
+        "{:>9}".format(s) for s in sizes) + "{:>10}".format("exponent")
+    print(header)
+    print("-" * len(header))
+    for op in results[0]["time_us"]:
+        flag = " *" if exponents[op] > SUPERLINEAR else ""
+        print("{:<34}".format(op) + "".join(
+            "{:>9.2f}".format(r["time_us"][op]) for r in results) +
+            "{:>10.2f}{}".format(exponents[op], flag))
+    print("{:<34}".format("search nodes/second") + "".join(
+        "{:>9.0f}".format(r["search"]["nodes_per_second"]) for r in results))
+    print("{:<34}".format("search mean depth") + "".join(
+        "{:>9.2f}".format(r["search"]["mean_depth"]) for r in results))
+    if "search.seconds_per_node" in exponents:
+        print("\nsearch cost per node scales with exponent {:.2f}".format(
+            exponents["search.seconds_per_node"]))
+    print("(* cost grows faster than cells ** {})".format(SUPERLINEAR))
+
+
+def main(args):
+    if args.drivers:
+        report = {}
+        for size in args.sizes:
+            positions = sample_positions(BitBoard, size, args.positions,
+                                         seed=args.seed)
+            results = compare_drivers(positions, args.depth, seed=args.seed)
+            baseline = results[game_agent.DRIVERS[0]]
+            print("{0}x{0}, {1} positions, depth {2}".format(
+                size, len(positions), args.depth))
+            for driver, result in results.items():
+                print("  {:<12}{:>12} nodes{:>9.1f}%  {}".format(
+                    driver, result["nodes"],
+                    100. * result["nodes"] / baseline["nodes"],
+                    "same values" if result["values"] == baseline["values"]
+                    else "DIFFERENT VALUES"))
+            report[size] = results
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+        return
+
+    results = []
+    for size in args.sizes:
+        results.append(benchmark_size(size, args.positions, args.time_limit,
+                                      args.searches, args.min_time,
+                                      args.seed))
+    exponents = summarize(results) if len(results) > 1 else {
+        op: 0. for op in results[0]["time_us"]}
+    print_report(results, exponents)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"results": results, "exponents": exponents}, f,
+                      indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the Isolation boards, heuristics and search "
+                    "on board sizes from 5x5 to 15x15.")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[5, 7, 9, 11, 13, 15])
+    parser.add_argument("--positions", type=int, default=20,
+                        help="number of positions timed per board size")
+    parser.add_argument("--searches", type=int, default=5,
+                        help="number of timed searches per board size")
+    parser.add_argument("--time-limit", type=float, default=150.,
+                        help="milliseconds per timed search")
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="minimum seconds spent timing each operation")
+    parser.add_argument("--drivers", action="store_true",
+                        help="compare the node counts of the root search "
+                             "drivers instead")
+    parser.add_argument("--depth", type=int, default=6,
+                        help="search depth used with --drivers")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", metavar="PATH",
+                        help="write the results and exponents to PATH")
+    main(parser.parse_args())
@@ -4,8 +4,16 @@ champions) in a tournament.
 
          COMPLETING AND SUBMITTING A COMPETITION AGENT IS OPTIONAL
 """
+import math
 import random
 
+from isolation.bitboard import board_tables, popcount
+from opening_book import OpeningBook
+
+
+# Number of simulated games averaged by custom_score()
+PLAYOUTS = 32
+
 
 class SearchTimeout(Exception):
     """Subclass base exception for code clarity. """
@@ -18,6 +26,10 @@ def custom_score(game, player):
 
     This should be the best heuristic function for your project submission.
 
+    The position is scored the way `CustomPlayer` scores the leaves of its
+    search tree: by the fraction of `PLAYOUTS` random games, played from the
+    position to the end, that `player` wins.
+
     Parameters
     ----------
     game : `isolation.Board`
@@ -33,16 +45,71 @@ def custom_score(game, player):
     float
         The heuristic value of the current game state to the specified player.
     """
-    raise NotImplementedError
+    if game.is_loser(player):
+        return float("-inf")
+
+    if game.is_winner(player):
+        return float("inf")
+
+    simulator = CustomPlayer()
+    _, blocked, locations = simulator.prepare(game)
+    wins = sum(simulator.simulate(blocked, locations, 0) == 0
+               for _ in range(PLAYOUTS))
+    if player != game.active_player:
+        wins = PLAYOUTS - wins
+    return wins / PLAYOUTS
+
+
+class Node:
+    """A node of the Monte Carlo search tree.
+
+    Parameters
+    ----------
+    move : int
+        The cell index of the move that leads to this node from its parent.
+
+    untried : int
+        A bitmask of the legal moves in this position that have no child
+        node yet.
+    """
+    __slots__ = ("move", "children", "untried", "wins", "visits")
+
+    def __init__(self, move, untried):
+        self.move = move
+        self.children = []
+        self.untried = untried
+        self.wins = 0
+        self.visits = 0
+
+    def select(self, exploration):
+        """Return the child with the highest upper confidence bound (UCT).
+        """
+        log_visits = math.log(self.visits)
+        return max(self.children, key=lambda child: (
+            child.wins / child.visits +
+            exploration * math.sqrt(log_visits / child.visits)))
+
+
+def random_bit(mask):
+    """Return the index of a uniformly chosen set bit of `mask`. """
+    bits = []
+    while mask:
+        low = mask & -mask
+        bits.append(low.bit_length() - 1)
+        mask ^= low
+    return random.choice(bits)
 
 
 class CustomPlayer:
     """Game-playing agent to use in the optional player vs player Isolation
     competition.
 
-    You must at least implement the get_move() method and a search function
-    to complete this class, but you may use any of the techniques discussed
-    in lecture or elsewhere on the web -- opening books, MCTS, etc.
+    The agent chooses moves with Monte Carlo tree search: it runs UCT
+    iterations (selection, expansion, a simulated game to the end, and
+    backpropagation of the result) until the time limit, then plays the most
+    visited move.  Simulations run on a bare `(blocked cells bitmask,
+    locations)` state, and the subtree of the position reached after the
+    opponent replies is kept for the next turn.
 
     **************************************************************************
           THIS CLASS IS OPTIONAL -- IT IS ONLY USED IN THE ISOLATION PvP
@@ -52,19 +119,43 @@ class CustomPlayer:
     Parameters
     ----------
     data : string
-        The name of the search method to use in get_move().
+        The path of an opening book file (see `opening_book.py`) to consult
+        before searching; no book is used if None.
 
     timeout : float (optional)
         Time remaining (in milliseconds) when search is aborted.  Note that
         the PvP competition uses more accurate timers that are not cross-
         platform compatible, so a limit of 1ms (vs 10ms for the other classes)
         is generally sufficient.
+
+    exploration : float (optional)
+        The exploration constant of the UCT selection rule.
+
+    playout : {"random", "mobility"} (optional)
+        The policy of the simulated games: uniformly random moves, or the
+        move that leaves the moving player the most onward moves.
     """
 
-    def __init__(self, data=None, timeout=1.):
+    def __init__(self, data=None, timeout=1., exploration=math.sqrt(2),
+                 playout="random"):
         self.score = custom_score
         self.time_left = None
         self.TIMER_THRESHOLD = timeout
+        self.book = OpeningBook.load(data) if data else None
+        self.exploration = exploration
+        if playout not in ("random", "mobility"):
+            raise ValueError("Unknown playout policy: {}".format(playout))
+        self.playout = playout
+
+        # Number of iterations run by the last call to get_move()
+        self.iterations = 0
+
+        # Subtree kept for the next turn: the node after our last move, and
+        # the blocked cells at that node
+        self._tree = None
+        self._tree_blocked = None
+        self._knight_masks = None
+        self._full_mask = 0
 
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
@@ -93,5 +184,130 @@ class CustomPlayer:
             Board coordinates corresponding to a legal move; may return
             (-1, -1) if there are no available legal moves.
         """
-        # OPTIONAL: Finish this function!
-        raise NotImplementedError
+        self.time_left = time_left
+        if self.book is not None:
+            book_move = self.book.lookup(game)
+            if book_move is not None:
+                return book_move
+
+        legal_moves = game.get_legal_moves()
+        if not legal_moves:
+            return (-1, -1)
+
+        coords, blocked, locations = self.prepare(game)
+        root = self.reuse_tree(blocked, locations[1])
+        if root is None:
+            root = Node(None, self.moves(blocked, locations[0]))
+
+        self.iterations = 0
+        while time_left() > self.TIMER_THRESHOLD:
+            self.iterate(root, blocked, locations)
+            self.iterations += 1
+
+        if not root.children:
+            return random.choice(legal_moves)
+        best = max(root.children, key=lambda child: child.visits)
+        self._tree = best
+        self._tree_blocked = blocked | 1 << best.move
+        return coords[best.move]
+
+    def prepare(self, game):
+        """Set up the move tables for the size of `game` and return the
+        coordinates of its cells, its blocked cells bitmask, and the cell
+        indices of the active and inactive players (-1 before their first
+        move).
+        """
+        coords, self._knight_masks = board_tables(game.width, game.height)
+        self._full_mask = (1 << (game.width * game.height)) - 1
+        locations = []
+        for player in (game.active_player, game.inactive_player):
+            idx = game.location_index(player)
+            locations.append(-1 if idx is None else idx)
+        return coords, game.blocked_mask(), locations
+
+    def reuse_tree(self, blocked, opponent_loc):
+        """Return the node of the kept subtree that matches the current
+        position, or None if the position is not in the tree.
+        """
+        tree, self._tree = self._tree, None
+        if tree is None or opponent_loc < 0:
+            return None
+        if blocked != self._tree_blocked | 1 << opponent_loc:
+            return None
+        for child in tree.children:
+            if child.move == opponent_loc:
+                return child
+        return None
+
+    def moves(self, blocked, loc):
+        """Return the bitmask of legal moves from cell `loc`. """
+        if loc < 0:
+            return self._full_mask & ~blocked
+        return self._knight_masks[loc] & ~blocked
+
+    def iterate(self, root, blocked, locations):
+        """Run one iteration of MCTS from the root position. """
+        # Nodes are not linked to their parents (so the tree has no reference
+        # cycles and discarded subtrees are freed at once); the path from the
+        # root is kept for backpropagation instead
+        node = root
+        path = [root]
+        locations = locations[:]
+        turn = 0
+
+        # Selection
+        while not node.untried and node.children:
+            node = node.select(self.exploration)
+            path.append(node)
+            blocked |= 1 << node.move
+            locations[turn] = node.move
+            turn ^= 1
+
+        # Expansion
+        if node.untried:
+            move = random_bit(node.untried)
+            node.untried ^= 1 << move
+            blocked |= 1 << move
+            locations[turn] = move
+            turn ^= 1
+            node = Node(move, self.moves(blocked, locations[turn]))
+            path[-1].children.append(node)
+            path.append(node)
+
+        # Simulation: the side to move at the end of the game loses
+        winner = self.simulate(blocked, locations, turn)
+
+        # Backpropagation: each node scores the wins of the side that moved
+        # into it, which is the opposite of the side to move at the node
+        for node in reversed(path):
+            node.visits += 1
+            turn ^= 1
+            if turn == winner:
+                node.wins += 1
+
+    def simulate(self, blocked, locations, turn):
+        """Play the game to the end with the playout policy and return the
+        index (0 for the root player) of the winner.
+        """
+        knight_masks = self._knight_masks
+        locations = locations[:]
+        mobility = self.playout == "mobility"
+        while True:
+            moves = self.moves(blocked, locations[turn])
+            if not moves:
+                return turn ^ 1
+            if mobility and locations[turn] >= 0:
+                best = -1
+                while moves:
+                    low = moves & -moves
+                    moves ^= low
+                    idx = low.bit_length() - 1
+                    onward = popcount(knight_masks[idx] & ~blocked)
+                    if onward > best or (onward == best and
+                                         random.random() < 0.5):
+                        best, move = onward, idx
+            else:
+                move = random_bit(moves)
+            blocked |= 1 << move
+            locations[turn] = move
+            turn ^= 1
@@ -0,0 +1,162 @@
+"""Exact endgame solver for Isolation positions where the players are
+separated.
+
+Once no cell can be reached by both players (following knight moves over
+open cells), the players can no longer interfere with each other, and the
+game reduces to two independent longest-path problems: the player to move
+wins exactly when the longest knight path open to it is longer than the
+longest path open to its opponent.  Both lengths are computed by exhaustive
+depth-first search over bitmasks, memoized on (location, open cells), and
+the player to move follows its longest path.
+"""
+from isolation.bitboard import board_tables, popcount
+
+
+class SolverAborted(Exception):
+    """Raised when the solver runs out of nodes or time. """
+    pass
+
+
+def reachable(loc, free, knight_masks):
+    """Return the bitmask of the cells in `free` that a knight standing on
+    cell `loc` can reach through cells in `free`.
+    """
+    region = 0
+    frontier = knight_masks[loc] & free
+    while frontier:
+        region |= frontier
+        step = 0
+        while frontier:
+            low = frontier & -frontier
+            step |= knight_masks[low.bit_length() - 1]
+            frontier ^= low
+        frontier = step & free & ~region
+    return region
+
+
+class EndgameSolver:
+    """Solve separated Isolation positions exactly.
+
+    Parameters
+    ----------
+    node_limit : int (optional)
+        The maximum number of longest-path nodes expanded by one call to
+        `solve()` before giving up with `SolverAborted`.
+
+    memo_limit : int (optional)
+        The memoized path lengths are discarded when there are more than
+        this many; results are otherwise reused between calls.
+    """
+
+    def __init__(self, node_limit=100000, memo_limit=250000):
+        self.node_limit = node_limit
+        self.memo_limit = memo_limit
+        self._memo = {}
+        self._knight_masks = None
+        self._nodes = 0
+        self._time_left = None
+        self._threshold = 0.
+
+    def is_partitioned(self, game):
+        """Test whether the players on `game` are in disjoint regions. """
+        return self._regions(game) is not None
+
+    def solve(self, game, time_left=None, threshold=0.):
+        """Find the best move for the active player if the players are in
+        separate regions of the board.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            The current game state.
+
+        time_left : callable (optional)
+            A function that returns the number of milliseconds left in the
+            current turn; the solver aborts when it falls below `threshold`.
+
+        Returns
+        -------
+        ((int, int), int, int) or None
+            The best move, the length of the longest path available to the
+            active player (counting that move) and the length of the longest
+            path available to its opponent; the active player wins exactly
+            when the first length is larger. None if the players are not
+            separated (or the active player has no legal move).
+        """
+        regions = self._regions(game)
+        if regions is None:
+            return None
+        own_loc, own_region, opp_loc, opp_region = regions
+
+        self._nodes = 0
+        self._time_left = time_left
+        self._threshold = threshold
+        if len(self._memo) > self.memo_limit:
+            self._memo.clear()
+
+        opp_length = self.longest_path(opp_loc, opp_region)
+        best = None
+        moves = self._knight_masks[own_loc] & own_region
+        while moves:
+            low = moves & -moves
+            moves ^= low
+            length = 1 + self.longest_path(low.bit_length() - 1,
+                                           own_region & ~low)
+            if best is None or length > best[1]:
+                best = (low.bit_length() - 1, length)
+        if best is None:
+            return None
+
+        coords = board_tables(game.width, game.height)[0]
+        return coords[best[0]], best[1], opp_length
+
+    def longest_path(self, loc, free):
+        """Return the number of moves in the longest knight path that starts
+        at cell `loc` and only visits cells in `free`.
+        """
+        key = (loc, free)
+        if key in self._memo:
+            return self._memo[key]
+
+        self._nodes += 1
+        if self._nodes > self.node_limit:
+            raise SolverAborted()
+        if (self._time_left is not None and not self._nodes & 255 and
+                self._time_left() < self._threshold):
+            raise SolverAborted()
+
+        best = 0
+        bound = popcount(free)
+        moves = self._knight_masks[loc] & free
+        while moves and best < bound:
+            low = moves & -moves
+            moves ^= low
+            length = 1 + self.longest_path(low.bit_length() - 1, free & ~low)
+            if length > best:
+                best = length
+        self._memo[key] = best
+        return best
+
+    def _regions(self, game):
+        """Return the locations and reachable regions of the active and
+        inactive players, or None if the regions intersect.
+        """
+        own = game.get_player_location(game.active_player)
+        opp = game.get_player_location(game.inactive_player)
+        if own is None or opp is None:
+            return None
+
+        knight_masks = board_tables(game.width, game.height)[1]
+        if knight_masks is not self._knight_masks:
+            # path lengths are only valid for one board size
+            self._knight_masks = knight_masks
+            self._memo = {}
+
+        free = ((1 << (game.width * game.height)) - 1) & ~game.blocked_mask()
+        own_loc = own[0] + own[1] * game.height
+        opp_loc = opp[0] + opp[1] * game.height
+        own_region = reachable(own_loc, free, knight_masks)
+        opp_region = reachable(opp_loc, free, knight_masks)
+        if own_region & opp_region:
+            return None
+        return own_loc, own_region, opp_loc, opp_region
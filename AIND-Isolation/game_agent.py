@@ -2,6 +2,7 @@
 test your agent's strength against a set of known agents using tournament.py
 and include the results in your report.
 """
+import math
 import random
 
 
@@ -10,6 +11,14 @@ class SearchTimeout(Exception):
     pass
 
 
+def unwind(game, move_count):
+    """Pop every move pushed onto `game` with `push_move()` since the board
+    had `move_count` moves applied, restoring it after an aborted search.
+    """
+    while game.move_count > move_count:
+        game.pop_move()
+
+
 def custom_score_2(game, player):
     """
     Calculate the number of open spaces around the player in a 2
@@ -177,8 +186,38 @@ class MinimaxPlayer(IsolationPlayer):
     Game-playing agent that chooses a move using depth-limited minimax
     search. You must finish and test this player to make sure it properly uses
     minimax to return a good move before the search time limit expires.
+
+    Parameters
+    ----------
+    search_depth, score_fn, timeout
+        See `IsolationPlayer`.
+
+    stats : bool (optional)
+        Collect search statistics in `self.stats` (see
+        `search_stats.SearchStats`); `self.stats` is None otherwise.
+
+    eval_cache : int (optional)
+        Remember the scores of up to this many positions (see
+        `transposition.EvaluationCache`, available as `self.score`), so that
+        positions reached again by a transposition or by the search of a
+        later move are not scored twice. No cache is used if `eval_cache` is
+        None.
     """
 
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10.,
+                 stats=False, eval_cache=None):
+        super().__init__(search_depth, score_fn, timeout)
+        if eval_cache:
+            from transposition import EvaluationCache
+            self.score = EvaluationCache(score_fn, eval_cache)
+        if stats:
+            from search_stats import SearchStats
+            self.stats = SearchStats()
+        else:
+            self.stats = None
+        # True if the board supports push_move()/pop_move() (see minimax())
+        self._in_place = False
+
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
         result before the time limit expires.
@@ -208,6 +247,10 @@ class MinimaxPlayer(IsolationPlayer):
             (-1, -1) if there are no available legal moves.
         """
         self.time_left = time_left
+        stats = self.stats
+        if stats is not None:
+            stats.start_move()
+            stats.start_iteration()
 
         # Initialize the best move so that this function returns something
         # in case the search fails due to timeout
@@ -216,11 +259,19 @@ class MinimaxPlayer(IsolationPlayer):
         try:
             # The try/except block will automatically catch the exception
             # raised when the timer is about to expire.
-            return self.minimax(game, self.search_depth)
+            best_move = self.minimax(game, self.search_depth)
+            if stats is not None:
+                stats.end_iteration(self.search_depth)
+                stats.end_move(self.search_depth)
+            return best_move
 
         except SearchTimeout:
             pass  # Handle any actions required after timeout as needed
 
+        if stats is not None:
+            stats.abort_iteration()
+            stats.end_move(0)
+
         # Return the best move from the last completed search iteration
         return best_move
 
@@ -269,13 +320,27 @@ class MinimaxPlayer(IsolationPlayer):
         best_score = float('-inf')
         best_move = None
 
-        i = 0
-        for move in game.get_legal_moves():
-            move_score = self.min_value(game.forecast_move(move), depth)
-            if move_score > best_score:
-                best_move = move
-                best_score = move_score
-            i += 1
+        # Moves are applied to `game` in-place if the board supports
+        # push_move()/pop_move() (see `isolation.Board`), and to copies made
+        # with forecast_move() otherwise
+        in_place = self._in_place = hasattr(game, "push_move")
+        move_count = game.move_count
+        try:
+            for move in game.get_legal_moves():
+                if in_place:
+                    game.push_move(move)
+                    child = game
+                else:
+                    child = game.forecast_move(move)
+                move_score = self.min_value(child, depth)
+                if in_place:
+                    game.pop_move()
+                if move_score > best_score:
+                    best_move = move
+                    best_score = move_score
+        except SearchTimeout:
+            unwind(game, move_count)
+            raise
 
         return best_move
 
@@ -283,33 +348,55 @@ class MinimaxPlayer(IsolationPlayer):
         if self.time_left() < self.TIMER_THRESHOLD:
             raise SearchTimeout()
 
+        if self.stats is not None:
+            self.stats.nodes += 1
+
         # If terminal state or search depth has been reached
         if self.terminal_test(game) or depth <= 0:
             return 1
 
         depth -= 1
         if depth <= 0:
+            if self.stats is not None:
+                self.stats.evaluations += 1
             return self.score(game, self)
 
+        in_place = self._in_place
         v = float('inf')
         for move in game.get_legal_moves():
-            v = min(v, self.max_value(game.forecast_move(move), depth))
+            if in_place:
+                game.push_move(move)
+                v = min(v, self.max_value(game, depth))
+                game.pop_move()
+            else:
+                v = min(v, self.max_value(game.forecast_move(move), depth))
         return v
 
     def max_value(self, game, depth):
         if self.time_left() < self.TIMER_THRESHOLD:
             raise SearchTimeout()
 
+        if self.stats is not None:
+            self.stats.nodes += 1
+
         if self.terminal_test(game):
             return -1
 
         depth -= 1
         if depth <= 0:
+            if self.stats is not None:
+                self.stats.evaluations += 1
             return self.score(game, self)
 
+        in_place = self._in_place
         v = float('-inf')
         for move in game.get_legal_moves():
-            v = max(v, self.min_value(game.forecast_move(move), depth))
+            if in_place:
+                game.push_move(move)
+                v = max(v, self.min_value(game, depth))
+                game.pop_move()
+            else:
+                v = max(v, self.min_value(game.forecast_move(move), depth))
 
         return v
 
@@ -320,12 +407,237 @@ class MinimaxPlayer(IsolationPlayer):
         return not bool(game.get_legal_moves())
 
 
+# Root search drivers of AlphaBetaPlayer
+DRIVERS = ("alphabeta", "aspiration", "pvs", "mtdf")
+
+
 class AlphaBetaPlayer(IsolationPlayer):
     """Game-playing agent that chooses a move using iterative deepening minimax
     search with alpha-beta pruning. You must finish and test this player to
     make sure it returns a good move before the search time limit expires.
+
+    Parameters
+    ----------
+    search_depth, score_fn, timeout
+        See `IsolationPlayer`.
+
+    eval_cache
+        See `MinimaxPlayer`.
+
+    tt_size : int (optional)
+        The number of entries in the transposition table shared by every
+        search this player runs. Positions already searched deeply enough
+        (e.g., reached by a different move order, or during a previous
+        iteration) are not searched again, and the best move stored for a
+        position is searched first. No table is used if `tt_size` is None.
+
+    move_ordering : bool (optional)
+        Order the moves at every node using the principal variation of the
+        previous iteration, two killer moves per ply and the history
+        heuristic, so that alpha-beta cutoffs happen as early as possible.
+
+    book : `opening_book.OpeningBook` (optional)
+        An opening book consulted before searching; positions found in the
+        book are answered immediately with the book move.
+
+    endgame_nodes : int (optional)
+        Once the players are in separate regions of the board, choose moves
+        with the exact endgame solver (see `endgame.EndgameSolver`), allowed
+        to expand this many nodes per move before falling back to the
+        search (after at most half of the time left). The solver is not
+        used if `endgame_nodes` is None.
+
+    ponder : bool (optional)
+        After each move, keep searching the position reached by the reply
+        predicted by the principal variation (or the transposition table)
+        in a helper process (see `smp.PonderWorker`) until the next call to
+        get_move() or stop_pondering() (or for at most `ponder_limit`
+        milliseconds). The results reach the next search through the
+        transposition table, so pondering requires `tt_size`. The helper
+        would take its time from an opponent on the same CPU, so nothing is
+        pondered on a single CPU, nor in processes that cannot have children
+        (e.g., the workers of a parallel tournament). Call stop_pondering()
+        when the game ends, as `tournament.play_game()` does, and `close()`
+        when the player is no longer needed.
+
+    ponder_limit : float (optional)
+        The longest time (in milliseconds) spent pondering after a move.
+
+    stats : bool (optional)
+        See `MinimaxPlayer`; searches run while pondering are not counted.
+
+    time_manager : `time_manager.TimeManager` (optional)
+        Decides when iterative deepening stops and calibrates the timer
+        threshold (starting from `timeout`). When the timer aborts an
+        iteration that already searched the previous best move first (as it
+        does with `tt_size` or `move_ordering`), the best move found so far
+        in that iteration is played.
+
+    symmetry_plies : int (optional)
+        Positions with fewer than this many moves applied are stored in the
+        transposition table under their canonical key (see
+        `isolation.symmetry`), so that symmetric positions share one entry.
+        Computing a canonical key costs a pass over the blocked cells, and
+        symmetric transpositions are rare once both players have moved away
+        from the centre, so this only pays off for the first few plies.
+        Symmetric positions only have the same value if the score function
+        treats them alike, so this requires a score function known to do so
+        (see `isolation.symmetry.symmetric_score()`); most heuristics in this
+        project measure distances from an off-centre point or count cells in
+        an asymmetric pattern, and are not.
+
+    check_interval : int (optional)
+        Call `time_left()` at only one in this many timer checks (each node
+        checks the timer up to three times, and every iteration starts with
+        a check). A call costs as much as a few percent of a node, but the
+        search then notices the end of the time up to `check_interval`
+        checks late, which `timeout` must allow for; a `time_manager`
+        measures that delay and widens its margin accordingly.
+
+    driver : {"alphabeta", "aspiration", "pvs", "mtdf"} (optional)
+        How each iteration searches the root: with the full (-inf, inf)
+        window; with a window of `aspiration_window` around the value of the
+        previous iteration, opened on the failing side and searched again if
+        the value falls outside; with principal variation search, which
+        tests every move after the first at each node with a null window
+        and only searches it fully if it may be better; or with MTD(f), a
+        sequence of null-window searches of the root converging on its
+        value, which requires `tt_size`. All drivers find the same value.
+
+    aspiration_window : float (optional)
+        The half-width of the aspiration window, in units of the score
+        function.
+
+    extend_moves : int (optional)
+        Search nodes where the player to move has at most this many legal
+        moves one ply deeper, so that forced and low-mobility lines, where
+        the heuristics are least reliable, are not cut off at the depth
+        limit. No line is extended more than `extension_plies` plies beyond
+        the depth of the iteration, which bounds the extra work. No node is
+        extended if `extend_moves` is 0.
+
+    extension_plies : int (optional)
+        See `extend_moves`.
+
+    lmr_moves : int (optional)
+        Late move reductions: at nodes with at least `lmr_depth` plies left
+        (at least 2), test every move after the first `lmr_moves` (in the
+        order given by `move_ordering` and the transposition table) with a
+        null-window search one ply shallower, and only search it at full
+        depth if the test shows that it may be better than the best move so
+        far. Unlike the search drivers, reductions can change the values and
+        moves found. No move is reduced if `lmr_moves` is None.
+
+    lmr_depth : int (optional)
+        See `lmr_moves`.
     """
 
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10.,
+                 tt_size=None, move_ordering=False, book=None,
+                 endgame_nodes=None, ponder=False, ponder_limit=1000.,
+                 stats=False, time_manager=None, symmetry_plies=0,
+                 check_interval=1, driver="alphabeta", aspiration_window=1.,
+                 eval_cache=None, extend_moves=0, extension_plies=4,
+                 lmr_moves=None, lmr_depth=3):
+        super().__init__(search_depth, score_fn, timeout)
+        if eval_cache:
+            from transposition import EvaluationCache
+            self.score = EvaluationCache(score_fn, eval_cache)
+        if stats:
+            from search_stats import SearchStats
+            self.stats = SearchStats()
+        else:
+            self.stats = None
+        self.time_manager = time_manager
+        if symmetry_plies:
+            from isolation.symmetry import symmetric_score
+            if not symmetric_score(score_fn):
+                raise ValueError("symmetry_plies requires a score function "
+                                 "that gives symmetric positions the same "
+                                 "value")
+        self.symmetry_plies = symmetry_plies
+        self.check_interval = check_interval
+        self._countdown = 0
+        if tt_size:
+            from transposition import SIDE_KEY, TranspositionTable
+            self.tt = TranspositionTable(tt_size)
+            # toggled into the keys of positions searched as the first and
+            # the second player
+            self._side_keys = (0, SIDE_KEY)
+        else:
+            self.tt = None
+            self._side_keys = (0, 0)
+        self.move_ordering = move_ordering
+        self.book = book
+        if endgame_nodes:
+            from endgame import EndgameSolver
+            self.endgame = EndgameSolver(endgame_nodes)
+        else:
+            self.endgame = None
+        if ponder and self.tt is None:
+            raise ValueError("Pondering requires a transposition table")
+        if driver not in DRIVERS:
+            raise ValueError("Unknown search driver: {}".format(driver))
+        if driver == "mtdf" and self.tt is None:
+            raise ValueError("MTD(f) requires a transposition table")
+        self.driver = driver
+        self.aspiration_window = aspiration_window
+        self._pvs = driver == "pvs"
+        if lmr_depth < 2:
+            raise ValueError("Late move reductions need lmr_depth >= 2")
+        self.extend_moves = extend_moves
+        self.extension_plies = extension_plies
+        self.lmr_moves = lmr_moves
+        self.lmr_depth = lmr_depth
+        self.ponder = ponder
+        self.ponder_limit = ponder_limit
+
+        # Number of moves answered in a position that was pondered
+        self.ponder_hits = 0
+        self._ponder_worker = None
+        self._ponder_key = None
+
+        # Principal variation of the last completed iteration, and the best
+        # root move (and its value) found at each depth of the current
+        # iterative deepening
+        self.pv = []
+        self.iteration_moves = []
+        self.iteration_values = []
+        self.root_value = None
+
+        # Killer moves (two per ply, relative to the root of the search) and
+        # history scores (one table for each side) used to order moves
+        self.killers = []
+        self.history = ({}, {})
+
+        self._pv_table = []
+        self._on_pv = False
+        self._root_ply = 0
+        # True if the board supports push_move()/pop_move() (see alphabeta())
+        self._in_place = False
+        # SIDE_KEY if this player searches as the second player, 0 otherwise
+        self._side_key = 0
+        # Extensions do not make any line longer than this many plies
+        self._ply_limit = 0
+
+        # The first root move searched by the current iteration, and the
+        # best root move among those it has completed
+        self._root_first = None
+        self._partial_move = None
+
+    def __getstate__(self):
+        # the pondering helper and its shared table stay with the process
+        # that made them, and the timer of the last move (often a closure
+        # over a board's clock) cannot be sent to another process (e.g., to
+        # play tournament games in parallel)
+        state = self.__dict__.copy()
+        if self._ponder_worker is not None:
+            from transposition import TranspositionTable
+            state["_ponder_worker"] = None
+            state["tt"] = TranspositionTable(self.tt.size)
+        state["time_left"] = None
+        return state
+
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
         result before the time limit expires.
@@ -356,26 +668,143 @@ class AlphaBetaPlayer(IsolationPlayer):
             Board coordinates corresponding to a legal move; may return
             (-1, -1) if there are no available legal moves.
         """
+        self.stop_pondering()
+        if self._ponder_key is not None and self._ponder_key == game.hash():
+            self.ponder_hits += 1
+        self._ponder_key = None
+
         self.time_left = time_left
+        if self.book is not None:
+            book_move = self.book.lookup(game)
+            if book_move is not None:
+                return book_move
+
+        if self.endgame is not None:
+            from endgame import SolverAborted
+            # keep at least half of the time for the search in case the
+            # regions are still too large to solve exactly
+            try:
+                solution = self.endgame.solve(
+                    game, time_left, max(self.TIMER_THRESHOLD, time_left() / 2))
+            except SolverAborted:
+                solution = None
+            if solution is not None:
+                return solution[0]
+
+        self.new_search()
+        if self.stats is not None:
+            self.stats.start_move()
+        best_move = self.iterative_deepening(game)
+        if self.stats is not None:
+            self.stats.end_move(len(self.iteration_moves))
+
+        # with no legal move the search returns None (or (-1, -1) if it
+        # timed out) and there is nothing to ponder
+        if self.ponder and best_move in game.get_legal_moves():
+            self.start_pondering(game, best_move)
+
+        # Return the best move from the last completed search iteration
+        return best_move
 
+    def iterative_deepening(self, game):
+        """Search `game` with increasing depth limits until the timer
+        expires, recording the best move of each iteration in
+        `iteration_moves`.
+
+        Returns
+        -------
+        (int, int)
+            The best move from the last completed search iteration; (-1, -1)
+            if no iteration completed.
+        """
         # Initialize the best move so that this function returns something
         # in case the search fails due to timeout
         best_move = (-1, -1)
 
+        stats = self.stats
+        manager = self.time_manager
+        if manager is not None:
+            self.TIMER_THRESHOLD = manager.start(self.time_left,
+                                                 self.TIMER_THRESHOLD)
+        timed_out = False
         try:
             # The try/except block will automatically catch the exception
             # raised when the timer is about to expire.
-            depth = 1
-            while True:
-                best_move = self.alphabeta(game, depth)
-                depth += 1
+            # Searching deeper than the number of open cells finds nothing
+            # new, so the search stops there.
+            for depth in range(1, len(game.get_blank_spaces()) + 1):
+                if manager is not None and not manager.next_iteration(
+                        self.time_left(), self.iteration_moves):
+                    break
+                if stats is not None:
+                    stats.start_iteration()
+                best_move = self.search_root(game, depth)
+                self.iteration_moves.append(best_move)
+                self.iteration_values.append(self.root_value)
+                if stats is not None:
+                    stats.end_iteration(depth)
 
         except SearchTimeout:
-            pass  # Handle any actions required after timeout as needed
-
-        # Return the best move from the last completed search iteration
+            timed_out = True
+            if stats is not None:
+                stats.abort_iteration()
+            # the aborted iteration searched the previous best move first,
+            # so a different best move so far has been proven better; if no
+            # move has beaten alpha yet, the previous iteration's move stands
+            if (manager is not None and self._partial_move is not None and
+                    self.iteration_moves and
+                    self._root_first == self.iteration_moves[-1]):
+                best_move = self._partial_move
+
+        if manager is not None:
+            manager.finish(self.time_left(), timed_out)
         return best_move
 
+    def start_pondering(self, game, move):
+        """Start searching the position reached after `move` and the reply
+        predicted by the principal variation in the pondering helper
+        process, which is started on first use.
+        """
+        board = game.copy()
+        board.apply_move(move)
+        if len(self.pv) > 1 and self.pv[0] == move:
+            reply = self.pv[1]
+            # the rest of the variation is the expected line after the reply
+            self.pv = self.pv[2:]
+        else:
+            reply = self.probe(board, 0, 0., 0.)[3]
+            self.pv = []
+        if reply is None or reply not in board.get_legal_moves():
+            return
+        board.apply_move(reply)
+
+        if self._ponder_worker is None:
+            import multiprocessing
+            import os
+            if (multiprocessing.current_process().daemon or
+                    (os.cpu_count() or 1) < 2):
+                return
+            from smp import PonderWorker
+            self._ponder_worker = PonderWorker(self)
+        self._ponder_key = board.hash()
+        self._ponder_worker.start(board, self.ponder_limit,
+                                  self.tt.generation + 1)
+
+    def stop_pondering(self):
+        """Stop pondering, if the helper process is searching, and wait for
+        it to finish.
+        """
+        if self._ponder_worker is not None:
+            self._ponder_worker.stop()
+
+    def close(self):
+        """Stop the pondering helper process, if any. """
+        if self._ponder_worker is not None:
+            self._ponder_worker.close()
+            from transposition import TranspositionTable
+            self._ponder_worker = None
+            self.tt = TranspositionTable(self.tt.size)
+
     def alphabeta(self, game, depth, alpha=float("-inf"), beta=float("inf")):
         """Implement depth-limited minimax search with alpha-beta pruning as
         described in the lectures.
@@ -421,31 +850,282 @@ class AlphaBetaPlayer(IsolationPlayer):
                 each helper function or else your agent will timeout during
                 testing.
         """
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout()
+        self.check_time()
 
         best_score = float('-inf')
         best_move = None
+        alpha_orig, beta_orig = alpha, beta
+
+        ordering = self.move_ordering
+        self._root_ply = game.move_count
+        # the player to move at the root holds initiative after an even
+        # number of moves if it is the first player
+        self._side_key = self._side_keys[game.move_count % 2]
+        self._ply_limit = depth + self.extension_plies
+        if ordering:
+            self.prepare_tables(game)
+            self._pv_table[0] = []
+
+        hash_move = None
+        if self.tt is not None:
+            key, transform, _, hash_move = self.probe(game, depth, alpha, beta)
+
+        # Moves are applied to `game` in-place with push_move()/pop_move()
+        # if the board supports them (see `isolation.Board`), so the board
+        # must be restored if the search is aborted mid-tree; other boards
+        # are copied with forecast_move()
+        in_place = self._in_place = hasattr(game, "push_move")
+        move_count = game.move_count
+        self._root_first = self._partial_move = None
+        try:
+            self._on_pv = ordering
+            for move in self.order_moves(game.get_legal_moves(), 0, hash_move):
+                if ordering:
+                    self.enter_child(0, True, move)
+                if in_place:
+                    game.push_move(move)
+                    child = game
+                else:
+                    child = game.forecast_move(move)
+                if (self._pvs and best_move is not None and
+                        math.nextafter(alpha, beta) < beta):
+                    move_score = self.min_value(child, depth, alpha,
+                                                math.nextafter(alpha, beta))
+                    if alpha < move_score < beta:
+                        if ordering:
+                            self.enter_child(0, True, move)
+                        move_score = self.min_value(child, depth, alpha,
+                                                    beta)
+                else:
+                    move_score = self.min_value(child, depth, alpha, beta)
+                if in_place:
+                    game.pop_move()
+                if self._root_first is None:
+                    self._root_first = move
+                # Update the best move
+                if move_score > best_score:
+                    best_move = move
+                    best_score = move_score
+                    # with a narrow or null window, only a score above alpha
+                    # proves a move better than those searched before it
+                    # (scores below are upper bounds of their values)
+                    if move_score > alpha:
+                        self._partial_move = move
+                    if ordering and move_score > alpha:
+                        self.update_pv(0, move)
+                # a root searched with a narrow window can fail high
+                if best_score >= beta:
+                    break
+                # Update alpha between nodes, because we start with the min player
+                alpha = max(alpha, move_score)
+        except SearchTimeout:
+            unwind(game, move_count)
+            raise
 
-        for move in game.get_legal_moves():
-            move_score = self.min_value(game.forecast_move(move), depth, alpha, beta)
-            # Update alpha between nodes, because we start with the min player
-            if (move_score > alpha):
-                alpha = move_score
-            alpha = max(alpha, move_score)
-            # Update the best move
-            if move_score > best_score:
-                best_move = move
-                best_score = move_score
+        if ordering:
+            self.pv = self._pv_table[0][:]
+
+        if self.tt is not None and best_move is not None:
+            self.store(game, key, transform, depth, best_score, alpha_orig,
+                       beta_orig, best_move)
+
+        self.root_value = best_score
+        return best_move
+
+    def search_root(self, game, depth):
+        """Search `game` to `depth` plies with the root driver selected by
+        `driver` and return the best move; its value is left in
+        `root_value`.
+        """
+        previous = self.iteration_values[-1] if self.iteration_values else 0.
+        if self.driver == "mtdf":
+            return self.mtdf(game, depth,
+                             previous if math.isfinite(previous) else 0.)
+        if (self.driver == "aspiration" and self.iteration_values and
+                math.isfinite(previous)):
+            alpha = previous - self.aspiration_window
+            beta = previous + self.aspiration_window
+            while True:
+                best_move = self.alphabeta(game, depth, alpha, beta)
+                # re-search with the failing side of the window opened
+                if self.root_value <= alpha and alpha > float("-inf"):
+                    alpha = float("-inf")
+                elif self.root_value >= beta and beta < float("inf"):
+                    beta = float("inf")
+                else:
+                    return best_move
+        return self.alphabeta(game, depth)
+
+    def search_fixed_depth(self, game, depth):
+        """Search `game` by iterative deepening to exactly `depth` plies and
+        return the best move; its value is left in `root_value`.
+
+        Each iteration uses the root driver selected by `driver` and is
+        recorded in `iteration_moves` and `iteration_values`, as in
+        get_move(). The timer is still checked, so searches without a time
+        limit need a `time_left` that always returns infinity.
 
+        Returns
+        -------
+        (int, int) or None
+            The best move; the first legal move if every move loses against
+            perfect play, and None if there are no legal moves.
+        """
+        self.new_search()
+        best_move = None
+        for d in range(1, depth + 1):
+            best_move = self.search_root(game, d)
+            self.iteration_moves.append(best_move)
+            self.iteration_values.append(self.root_value)
+        if best_move is None:
+            # every move loses against perfect play; keep the game going
+            legal_moves = game.get_legal_moves()
+            best_move = legal_moves[0] if legal_moves else None
         return best_move
 
+    def mtdf(self, game, depth, guess):
+        """Find the value of `game` at `depth` plies by a sequence of
+        null-window searches converging from `guess` (MTD(f)), relying on the
+        transposition table to avoid repeating work between the searches.
+
+        Returns
+        -------
+        (int, int)
+            The best move found by the last search that failed high, or by
+            the last search if none did.
+        """
+        lower, upper = float("-inf"), float("inf")
+        value = guess
+        best_move = None
+        while lower < upper:
+            beta = value if value > lower else math.nextafter(value, upper)
+            move = self.alphabeta(game, depth, math.nextafter(beta, lower),
+                                  beta)
+            value = self.root_value
+            if value < beta:
+                upper = value
+            else:
+                lower = value
+                best_move = move
+        self.root_value = value
+        return move if best_move is None else best_move
+
+    def new_search(self):
+        """Reset the per-move search state at the start of get_move(). """
+        if self.tt is not None:
+            self.tt.new_search()
+        self.pv = []
+        self.iteration_moves = []
+        self.iteration_values = []
+        if self.move_ordering:
+            self.killers = []
+            # age the history scores so recent cutoffs dominate
+            for history in self.history:
+                for move in history:
+                    history[move] //= 2
+
+    def prepare_tables(self, game):
+        """Make sure the per-ply move ordering tables cover the longest
+        possible line of play on the board.
+        """
+        max_plies = game.width * game.height + 2
+        while len(self._pv_table) < max_plies:
+            self._pv_table.append([])
+        while len(self.killers) < max_plies:
+            self.killers.append([None, None])
+
+    def order_moves(self, moves, ply, hash_move=None):
+        """Return the legal moves in the order they should be searched: the
+        best move recorded for the position (if any) first, then (with
+        move_ordering enabled) the principal variation move, the killer
+        moves for this ply, and the rest by decreasing history score.
+        """
+        if self.move_ordering:
+            history = self.history[ply & 1]
+            moves.sort(key=lambda move: history.get(move, 0), reverse=True)
+            for killer in reversed(self.killers[ply]):
+                if killer is not None and killer in moves:
+                    moves.remove(killer)
+                    moves.insert(0, killer)
+            if self._on_pv and ply < len(self.pv) and self.pv[ply] in moves:
+                moves.remove(self.pv[ply])
+                moves.insert(0, self.pv[ply])
+        if hash_move is not None and hash_move in moves:
+            moves.remove(hash_move)
+            moves.insert(0, hash_move)
+        return moves
+
+    def enter_child(self, ply, on_pv, move):
+        """Track whether the child reached by `move` is still on the principal
+        variation, and clear its line before searching it.
+        """
+        self._on_pv = on_pv and ply < len(self.pv) and self.pv[ply] == move
+        self._pv_table[ply + 1] = []
+
+    def update_pv(self, ply, move):
+        """Record `move` followed by the child's line as the best line. """
+        self._pv_table[ply] = [move] + self._pv_table[ply + 1]
+
+    def record_cutoff(self, ply, move, depth):
+        """Remember a move that caused a cutoff as a killer move for this ply
+        and reward it in the history table.
+        """
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        history = self.history[ply & 1]
+        history[move] = history.get(move, 0) + depth * depth
+
+    def probe(self, game, depth, alpha, beta):
+        """Look up the current position in the transposition table.
+
+        Returns
+        -------
+        (int, int, float or None, (int, int) or None)
+            The table key of the position, the symmetry mapping the board to
+            the orientation of the key (0 unless the key is canonical, see
+            `symmetry_plies`), the stored value if it was searched at least
+            `depth` plies deep and settles the (alpha, beta) window, and the
+            best move stored for the position.
+        """
+        transform = 0
+        if game.move_count < self.symmetry_plies:
+            from isolation.symmetry import canonical_key
+            key, transform = canonical_key(game)
+        else:
+            key = game.hash()
+        key ^= self._side_key
+        value, move = self.tt.lookup(key, depth, alpha, beta)
+        if transform and move is not None:
+            from isolation.symmetry import inverse_symmetries, transform_move
+            move = transform_move(
+                move, inverse_symmetries(game.width, game.height)[transform],
+                game.height)
+        return key, transform, value, move
+
+    def store(self, game, key, transform, depth, value, alpha, beta, move):
+        """Record the result of searching with the window (alpha, beta)
+        under the key returned by `probe()`.
+        """
+        if transform and move is not None:
+            from isolation.symmetry import symmetries, transform_move
+            move = transform_move(
+                move, symmetries(game.width, game.height)[transform],
+                game.height)
+        self.tt.record(key, depth, value, alpha, beta, move)
+
     def max_value(self, game, depth, alpha, beta):
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout()
+        self._countdown -= 1
+        if self._countdown <= 0:
+            self.check_time()
 
         # If we reached a terminal state (no more valid moves for MAX player)
         # return -1 indicating a branch that terminates in a loss for MAX (win for MIN)
+        stats = self.stats
+        if stats is not None:
+            stats.nodes += 1
+
         if self.terminal_test(game):
             return -1
 
@@ -453,24 +1133,103 @@ class AlphaBetaPlayer(IsolationPlayer):
         # If search depth is reached, evaluate the score of this level
         # and propagate that upwards
         depth -= 1
+        if (self.extend_moves and
+                game.move_count - self._root_ply + depth < self._ply_limit and
+                len(game.get_legal_moves()) <= self.extend_moves):
+            depth += 1
+            if stats is not None:
+                stats.extensions += 1
         if depth <= 0:
+            if stats is not None:
+                stats.evaluations += 1
             return self.score(game, self)
 
+        hash_move = None
+        if self.tt is not None:
+            key, transform, value, hash_move = self.probe(game, depth, alpha,
+                                                          beta)
+            if value is not None:
+                return value
+            alpha_orig = alpha
+
+        ordering = self.move_ordering
+        pvs = self._pvs
+        ply = game.move_count - self._root_ply
+        on_pv = self._on_pv
+
+        reduce = self.lmr_moves is not None and depth >= self.lmr_depth
+        in_place = self._in_place
+
         v = float('-inf')
-        for move in game.get_legal_moves():
-            v = max(v, self.min_value(game.forecast_move(move), depth, alpha, beta))
+        best_move = None
+        for index, move in enumerate(self.order_moves(
+                game.get_legal_moves(), ply, hash_move)):
+            if ordering:
+                self.enter_child(ply, on_pv, move)
+            if in_place:
+                game.push_move(move)
+                child = game
+            else:
+                child = game.forecast_move(move)
+            reduced = (reduce and index >= self.lmr_moves and
+                       math.nextafter(alpha, beta) < beta)
+            if reduced:
+                # late move reduction: test with a null window one ply
+                # shallower that the move is no better than the best one so
+                # far, and search it normally if the test fails
+                score = self.min_value(child, depth - 1, alpha,
+                                       math.nextafter(alpha, beta))
+                if stats is not None:
+                    stats.reductions += 1
+                if score > alpha:
+                    reduced = False
+                    if stats is not None:
+                        stats.researches += 1
+                    if ordering:
+                        self.enter_child(ply, on_pv, move)
+            if (not reduced and pvs and best_move is not None and
+                    math.nextafter(alpha, beta) < beta):
+                # principal variation search: test with a null window that
+                # the move is no better than the best one so far, and only
+                # search it with the full window if the test fails
+                score = self.min_value(child, depth, alpha,
+                                       math.nextafter(alpha, beta))
+                if alpha < score < beta:
+                    if ordering:
+                        self.enter_child(ply, on_pv, move)
+                    score = self.min_value(child, depth, alpha, beta)
+            elif not reduced:
+                score = self.min_value(child, depth, alpha, beta)
+            if in_place:
+                game.pop_move()
+            if best_move is None or score > v:
+                v, best_move = score, move
+                if ordering and alpha < v < beta:
+                    self.update_pv(ply, move)
             if v >= beta:
+                if ordering:
+                    self.record_cutoff(ply, move, depth)
+                if stats is not None:
+                    stats.cutoff(ply)
                 break
             alpha = max(alpha, v)
 
+        if self.tt is not None:
+            self.store(game, key, transform, depth, v, alpha_orig, beta,
+                       best_move)
         return v
 
     def min_value(self, game, depth, alpha, beta):
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout()
+        self._countdown -= 1
+        if self._countdown <= 0:
+            self.check_time()
 
         # If we reached a terminal state (no more valid moves for MIN player)
         # return +1 indicating a branch that terminates in a loss for MIN (win for MAX)
+        stats = self.stats
+        if stats is not None:
+            stats.nodes += 1
+
         if self.terminal_test(game) or depth <= 0:
             return 1
 
@@ -478,19 +1237,97 @@ class AlphaBetaPlayer(IsolationPlayer):
         # If search depth is reached, evaluate the score of this level
         # and propagate that upwards
         depth -= 1
+        if (self.extend_moves and
+                game.move_count - self._root_ply + depth < self._ply_limit and
+                len(game.get_legal_moves()) <= self.extend_moves):
+            depth += 1
+            if stats is not None:
+                stats.extensions += 1
         if depth <= 0:
+            if stats is not None:
+                stats.evaluations += 1
             return self.score(game, self)
 
+        hash_move = None
+        if self.tt is not None:
+            key, transform, value, hash_move = self.probe(game, depth, alpha,
+                                                          beta)
+            if value is not None:
+                return value
+            beta_orig = beta
+
+        ordering = self.move_ordering
+        pvs = self._pvs
+        ply = game.move_count - self._root_ply
+        on_pv = self._on_pv
+
+        reduce = self.lmr_moves is not None and depth >= self.lmr_depth
+        in_place = self._in_place
+
         v = float('inf')
-        for move in game.get_legal_moves():
-            v = min(v, self.max_value(game.forecast_move(move), depth, alpha, beta))
+        best_move = None
+        for index, move in enumerate(self.order_moves(
+                game.get_legal_moves(), ply, hash_move)):
+            if ordering:
+                self.enter_child(ply, on_pv, move)
+            if in_place:
+                game.push_move(move)
+                child = game
+            else:
+                child = game.forecast_move(move)
+            reduced = (reduce and index >= self.lmr_moves and
+                       alpha < math.nextafter(beta, alpha))
+            if reduced:
+                score = self.max_value(child, depth - 1,
+                                       math.nextafter(beta, alpha), beta)
+                if stats is not None:
+                    stats.reductions += 1
+                if score < beta:
+                    reduced = False
+                    if stats is not None:
+                        stats.researches += 1
+                    if ordering:
+                        self.enter_child(ply, on_pv, move)
+            if (not reduced and pvs and best_move is not None and
+                    alpha < math.nextafter(beta, alpha)):
+                score = self.max_value(child, depth,
+                                       math.nextafter(beta, alpha), beta)
+                if alpha < score < beta:
+                    if ordering:
+                        self.enter_child(ply, on_pv, move)
+                    score = self.max_value(child, depth, alpha, beta)
+            elif not reduced:
+                score = self.max_value(child, depth, alpha, beta)
+            if in_place:
+                game.pop_move()
+            if best_move is None or score < v:
+                v, best_move = score, move
+                if ordering and alpha < v < beta:
+                    self.update_pv(ply, move)
             if v <= alpha:
+                if ordering:
+                    self.record_cutoff(ply, move, depth)
+                if stats is not None:
+                    stats.cutoff(ply)
                 break
             beta = min(beta, v)
+
+        if self.tt is not None:
+            self.store(game, key, transform, depth, v, alpha, beta_orig,
+                       best_move)
         return v
 
     def terminal_test(self, game):
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout()
+        self._countdown -= 1
+        if self._countdown <= 0:
+            self.check_time()
 
         return not bool(game.get_legal_moves())
+
+    def check_time(self):
+        """Raise SearchTimeout if the timer is below the threshold, and
+        skip the next `check_interval - 1` timer checks.
+        """
+        self._countdown = self.check_interval
+        if self.time_left() < self.TIMER_THRESHOLD:
+            raise SearchTimeout()
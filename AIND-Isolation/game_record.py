@@ -0,0 +1,201 @@
+"""Compact binary records of Isolation games, and a replayer that rebuilds
+any position of a recorded game.
+
+A record file starts with a 5-byte header (magic and format version)
+followed by any number of game records, each made of
+
+- the board width and height, the index (0 or 1) of the winner, a
+  termination code (see `TERMINATIONS`) and the number of moves;
+- the names of the two agents, as length-prefixed UTF-8 strings;
+- one byte per move, packed as `row << 4 | column` like the moves of an
+  opening book (so boards up to 16x16 are supported).
+
+Records are written and read one at a time, so files of any size can be
+streamed:
+
+    with RecordWriter("games.bin") as writer:
+        writer.write(GameRecord(7, 7, "AB_Improved", "AB_Custom", moves,
+                                winner=0, termination="illegal move"))
+
+    for record in read_records("games.bin"):
+        for board in positions(record):
+            ...
+
+`tournament.py --record PATH` writes the games of a tournament this way.
+"""
+import struct
+
+from isolation import BitBoard
+
+MAGIC = b"ISOR"
+VERSION = 1
+HEADER = struct.Struct("<4sB")  # magic, version
+# width, height, winner index, termination code, number of moves
+GAME = struct.Struct("<BBBBH")
+
+# The reasons for the end of a game returned by `Board.play()`; a game that
+# ends because the player to move has no legal move is an "illegal move"
+TERMINATIONS = ("illegal move", "timeout", "forfeit")
+
+
+class GameRecord:
+    """A complete game: the board size, the names of the two agents (the
+    first player first), the moves played and the result.
+
+    Parameters
+    ----------
+    width, height : int
+        The size of the board; at most 16x16.
+
+    player_1, player_2 : str
+        The names of the agents; names are stored in at most 255 bytes of
+        UTF-8, and longer names are cut at a character boundary.
+
+    moves : list<(int, int)>
+        Every move of the game in order, starting with the first move of
+        the first player.
+
+    winner : int
+        0 if the first player won, 1 otherwise.
+
+    termination : str
+        The reason the game ended; one of `TERMINATIONS`.
+    """
+
+    __slots__ = ("width", "height", "player_1", "player_2", "moves",
+                 "winner", "termination")
+
+    def __init__(self, width, height, player_1, player_2, moves, winner,
+                 termination):
+        if not (0 < width <= 16 and 0 < height <= 16):
+            raise ValueError("Boards larger than 16x16 cannot be recorded")
+        if termination not in TERMINATIONS:
+            raise ValueError("Unknown termination: {}".format(termination))
+        self.width = width
+        self.height = height
+        self.player_1 = player_1
+        self.player_2 = player_2
+        self.moves = [tuple(move) for move in moves]
+        self.winner = winner
+        self.termination = termination
+
+    def __eq__(self, other):
+        return (isinstance(other, GameRecord) and
+                all(getattr(self, name) == getattr(other, name)
+                    for name in self.__slots__))
+
+    def __repr__(self):
+        return "GameRecord({}x{}, {} vs {}, {} moves, winner {}, {})".format(
+            self.width, self.height, self.player_1, self.player_2,
+            len(self.moves), self.winner, self.termination)
+
+    def pack(self):
+        """Return the binary encoding of the record. """
+        data = [GAME.pack(self.width, self.height, self.winner,
+                          TERMINATIONS.index(self.termination),
+                          len(self.moves))]
+        for name in (self.player_1, self.player_2):
+            # never cut a multibyte character in half
+            encoded = str(name).encode("utf-8")[:255].decode(
+                "utf-8", "ignore").encode("utf-8")
+            data.append(bytes([len(encoded)]) + encoded)
+        data.append(bytes(r << 4 | c for r, c in self.moves))
+        return b"".join(data)
+
+
+class RecordWriter:
+    """Append game records to a file (created with its header if needed).
+
+    Parameters
+    ----------
+    path : str
+        The record file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(HEADER.pack(MAGIC, VERSION))
+        self.count = 0
+
+    def write(self, record):
+        """Append one `GameRecord` to the file. """
+        self._file.write(record.pack())
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _read_exactly(f, size, path):
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("{} is truncated".format(path))
+    return data
+
+
+def read_records(path):
+    """Yield the `GameRecord`s stored in a record file, one at a time. """
+    with open(path, "rb") as f:
+        magic, version = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not a game record file".format(path))
+        while True:
+            data = f.read(GAME.size)
+            if not data:
+                return
+            if len(data) != GAME.size:
+                raise ValueError("{} is truncated".format(path))
+            width, height, winner, termination, count = GAME.unpack(data)
+            names = []
+            for _ in range(2):
+                length = _read_exactly(f, 1, path)[0]
+                names.append(_read_exactly(f, length, path).decode("utf-8"))
+            moves = [(move >> 4, move & 15)
+                     for move in _read_exactly(f, count, path)]
+            yield GameRecord(width, height, names[0], names[1], moves,
+                             winner, TERMINATIONS[termination])
+
+
+def positions(record, player_1="Player1", player_2="Player2"):
+    """Yield the board of a recorded game before the first move and after
+    every move.
+
+    The same board is updated and yielded every time (so the positions are
+    replayed in a single pass); copy it to keep a position.  The players of
+    the board are `player_1` and `player_2`.
+    """
+    board = BitBoard(player_1, player_2, record.width, record.height,
+                     shuffle_moves=False)
+    yield board
+    for move in record.moves:
+        board.apply_move(move)
+        yield board
+
+
+def replay(record, ply=None, player_1="Player1", player_2="Player2",
+           check=False):
+    """Return the board of a recorded game after its first `ply` moves (all
+    of them by default).
+
+    Parameters
+    ----------
+    check : bool (optional)
+        Raise ValueError if a move of the record is not legal.
+    """
+    board = BitBoard(player_1, player_2, record.width, record.height,
+                     shuffle_moves=False)
+    moves = record.moves if ply is None else record.moves[:ply]
+    for move in moves:
+        if check and move not in board.get_legal_moves():
+            raise ValueError("Illegal move {} at ply {}".format(
+                move, board.move_count))
+        board.apply_move(move)
+    return board
@@ -0,0 +1,205 @@
+"""Fast equivalents of the heuristics in `game_agent` and `sample_players`.
+
+Each function here returns exactly the same value as the heuristic of the
+same name, but works directly on the blocked-cell bitmask of an
+`isolation.BitBoard`: legal moves, edge cells, the ring of cells two steps
+from a player and the distances to the centre of the board are precomputed
+per cell for each board size, so a score costs a handful of mask operations
+and bit counts instead of building move and blank-space lists.
+
+Positions on other board classes, and positions where a player has not
+moved yet, are passed to the original heuristic.  Use `fast_equivalent()`
+to look up the fast version of a score function:
+
+    player = AlphaBetaPlayer(score_fn=fast_equivalent(improved_score))
+"""
+import game_agent
+import sample_players
+
+from isolation import BitBoard
+from isolation.bitboard import board_tables, popcount
+
+# Cache of the precomputed tables for each board size
+_TABLES = {}
+
+
+def heuristic_tables(width, height):
+    """Return the precomputed heuristic tables for a board of the specified
+    size.
+
+    Returns
+    -------
+    (list<int>, int, list<int>, list<float>, list<float>)
+        The knight move masks (see `isolation.bitboard.board_tables()`), the
+        mask of the cells `custom_score` treats as edges, the mask of the
+        cells counted by `custom_score_2` around each cell, and the
+        per-cell centre distances used by `center_score` and
+        `custom_score_3`.
+    """
+    key = (width, height)
+    if key in _TABLES:
+        return _TABLES[key]
+
+    coords, knight_masks = board_tables(width, height)
+    edge_mask = 0
+    for idx, (r, c) in enumerate(coords):
+        # same comparisons as custom_score, row against width included
+        if r == 0 or r == width or c == 0 or c == height:
+            edge_mask |= 1 << idx
+
+    # custom_score_2 compares the row of each blank cell with the column of
+    # the player (and vice versa), so the ring is built the same way
+    ring_masks = []
+    for own_y, own_x in coords:
+        mask = 0
+        for idx, (bx, by) in enumerate(coords):
+            if (abs(bx - own_x) == 2 and abs(by - own_y) <= 2) or (
+                    abs(by - own_y) == 2 and abs(bx - own_x) <= 2):
+                mask |= 1 << idx
+        ring_masks.append(mask)
+
+    w, h = width / 2., height / 2.
+    center_squares = [float((h - y)**2 + (w - x)**2) for y, x in coords]
+    center_x, center_y = (width / 2), (height / 2)
+    manhattan = [abs(x - center_x) + abs(y - center_y) for y, x in coords]
+
+    _TABLES[key] = (knight_masks, edge_mask, ring_masks, center_squares,
+                    manhattan)
+    return _TABLES[key]
+
+
+def _locations(game, player):
+    """Return whether `player` is to move and the cell indices of `player`
+    and its opponent on a BitBoard, or None if the fast path does not apply.
+    """
+    if not isinstance(game, BitBoard):
+        return None
+    active = game.active_player
+    to_move = player == active
+    own = game.location_index(player)
+    opp = game.location_index(game.inactive_player if to_move else active)
+    if own is None or opp is None:
+        return None
+    return to_move, own, opp
+
+
+def _terminal_value(to_move, own, opp, free, knight_masks):
+    """Return the value of `is_loser()`/`is_winner()` for the player on cell
+    `own`, or None if the active player can still move.
+    """
+    if to_move:
+        if not knight_masks[own] & free:
+            return float("-inf")
+    elif not knight_masks[opp] & free:
+        return float("inf")
+    return None
+
+
+def open_move_score(game, player):
+    """Fast equivalent of `sample_players.open_move_score`. """
+    locations = _locations(game, player)
+    if locations is None:
+        return sample_players.open_move_score(game, player)
+    to_move, own, opp = locations
+    knight_masks = heuristic_tables(game.width, game.height)[0]
+    free = ~game.blocked_mask()
+    value = _terminal_value(to_move, own, opp, free, knight_masks)
+    if value is not None:
+        return value
+    return float(popcount(knight_masks[own] & free))
+
+
+def improved_score(game, player):
+    """Fast equivalent of `sample_players.improved_score`. """
+    locations = _locations(game, player)
+    if locations is None:
+        return sample_players.improved_score(game, player)
+    to_move, own, opp = locations
+    knight_masks = heuristic_tables(game.width, game.height)[0]
+    free = ~game.blocked_mask()
+    value = _terminal_value(to_move, own, opp, free, knight_masks)
+    if value is not None:
+        return value
+    return float(popcount(knight_masks[own] & free) -
+                 popcount(knight_masks[opp] & free))
+
+
+def center_score(game, player):
+    """Fast equivalent of `sample_players.center_score`. """
+    locations = _locations(game, player)
+    if locations is None:
+        return sample_players.center_score(game, player)
+    to_move, own, opp = locations
+    tables = heuristic_tables(game.width, game.height)
+    value = _terminal_value(to_move, own, opp, ~game.blocked_mask(),
+                            tables[0])
+    if value is not None:
+        return value
+    return tables[3][own]
+
+
+def custom_score(game, player):
+    """Fast equivalent of `game_agent.custom_score`. """
+    locations = _locations(game, player)
+    if locations is None:
+        return game_agent.custom_score(game, player)
+    _, own, opp = locations
+    knight_masks, edge_mask = heuristic_tables(game.width, game.height)[:2]
+    free = ~game.blocked_mask()
+    own_moves = knight_masks[own] & free
+    opp_moves = knight_masks[opp] & free
+
+    if not own_moves:
+        return float("-inf")
+
+    if not opp_moves:
+        return float("inf")
+
+    return (popcount(opp_moves & edge_mask) / popcount(opp_moves) -
+            popcount(own_moves & edge_mask) / popcount(own_moves))
+
+
+def custom_score_2(game, player):
+    """Fast equivalent of `game_agent.custom_score_2`. """
+    locations = _locations(game, player)
+    if locations is None:
+        return game_agent.custom_score_2(game, player)
+    to_move, own, opp = locations
+    knight_masks, _, ring_masks = heuristic_tables(game.width, game.height)[:3]
+    free = ~game.blocked_mask()
+    value = _terminal_value(to_move, own, opp, free, knight_masks)
+    if value is not None:
+        return value
+    return float(popcount(ring_masks[own] & free) -
+                 popcount(ring_masks[opp] & free))
+
+
+def custom_score_3(game, player):
+    """Fast equivalent of `game_agent.custom_score_3`. """
+    locations = _locations(game, player)
+    if locations is None:
+        return game_agent.custom_score_3(game, player)
+    to_move, own, opp = locations
+    tables = heuristic_tables(game.width, game.height)
+    value = _terminal_value(to_move, own, opp, ~game.blocked_mask(),
+                            tables[0])
+    if value is not None:
+        return value
+    return float(tables[4][opp] - tables[4][own])
+
+
+FAST_EQUIVALENTS = {
+    sample_players.open_move_score: open_move_score,
+    sample_players.improved_score: improved_score,
+    sample_players.center_score: center_score,
+    game_agent.custom_score: custom_score,
+    game_agent.custom_score_2: custom_score_2,
+    game_agent.custom_score_3: custom_score_3,
+}
+
+
+def fast_equivalent(score_fn):
+    """Return the fast equivalent of `score_fn`, or `score_fn` itself if
+    there is none.
+    """
+    return FAST_EQUIVALENTS.get(score_fn, score_fn)
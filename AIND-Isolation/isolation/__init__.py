@@ -8,4 +8,5 @@ legal moves loses, and the opponent is declared the winner.
 """
 
 # Make the Board class available at the root of the module for imports
-from .isolation import Board
+from .isolation import Board, swap_players
+from .bitboard import BitBoard
@@ -0,0 +1,349 @@
+"""
+This file contains the `BitBoard` class, an alternate implementation of the
+isolation `Board` that packs the blocked cells of the game into a single
+integer bitmask instead of a Python list.
+
+Cell indices follow the same column-major layout as `Board` (the cell at
+(row, column) has index `row + column * height`), so bit `idx` of the mask is
+set exactly when `Board._board_state[idx]` would be non-zero.  Knight-move
+destinations are precomputed per cell as bitmasks, so legal moves are found
+with a single AND against the complement of the occupied mask.
+"""
+import random
+
+from .isolation import Board, zobrist_keys
+
+# Cache of the precomputed tables for each board size, shared by all boards
+_TABLES = {}
+
+
+def board_tables(width, height):
+    """Return the precomputed `(coords, knight_masks)` tables for a board of
+    the specified size.
+
+    Returns
+    -------
+    (list<(int, int)>, list<int>)
+        `coords[idx]` is the (row, column) coordinate pair of cell `idx`, and
+        `knight_masks[idx]` is a bitmask of the cells a knight can reach
+        from cell `idx` on an empty board.
+    """
+    key = (width, height)
+    if key not in _TABLES:
+        directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                      (1, -2), (1, 2), (2, -1), (2, 1)]
+        coords = [(idx % height, idx // height)
+                  for idx in range(width * height)]
+        knight_masks = []
+        for r, c in coords:
+            mask = 0
+            for dr, dc in directions:
+                if 0 <= r + dr < height and 0 <= c + dc < width:
+                    mask |= 1 << (r + dr + (c + dc) * height)
+            knight_masks.append(mask)
+        _TABLES[key] = (coords, knight_masks)
+    return _TABLES[key]
+
+
+def popcount(mask):
+    """Return the number of set bits in `mask`. """
+    return bin(mask).count("1")
+
+
+class BitBoard(Board):
+    """Implement the isolation `Board` using an integer bitmask for the set
+    of blocked cells.
+
+    The public interface (and all function signatures) are identical to
+    `isolation.Board`, so a `BitBoard` can be used anywhere a `Board` is
+    expected.
+
+    Parameters
+    ----------
+    player_1 : object
+        An object with a get_move() function. This is the only function
+        directly called by the Board class for each player.
+
+    player_2 : object
+        An object with a get_move() function. This is the only function
+        directly called by the Board class for each player.
+
+    width : int (optional)
+        The number of columns that the board should have.
+
+    height : int (optional)
+        The number of rows that the board should have.
+
+    shuffle_moves : bool (optional)
+        If False, legal moves are returned in increasing order of cell index
+        (the same order as `Board(..., shuffle_moves=False)`) instead of a
+        random order.
+    """
+
+    def __init__(self, player_1, player_2, width=7, height=7,
+                 shuffle_moves=True):
+        self.width = width
+        self.height = height
+        self.shuffle_moves = shuffle_moves
+        self.move_count = 0
+        self._player_1 = player_1
+        self._player_2 = player_2
+        self._active_player = player_1
+        self._inactive_player = player_2
+
+        self._coords, self._knight_masks = board_tables(width, height)
+        self._full_mask = (1 << (width * height)) - 1
+
+        # Bit `idx` is set when cell `idx` is blocked; the player locations
+        # are cell indices (player 1 first), and initiative is 0 for player 1
+        # and 1 for player 2 -- exactly like the tail of `Board._board_state`
+        self._occupied = 0
+        self._locations = [Board.NOT_MOVED, Board.NOT_MOVED]
+        self._initiative = 0
+        self._zobrist_keys = zobrist_keys(width, height)
+        self._hash = 0
+
+        # Undo records for push_move()/pop_move(): (cell index, previous
+        # location of the player that moved, previous hash)
+        self._move_stack = []
+
+    def hash(self):
+        """Return the Zobrist hash of the current state; equal to the hash of
+        an `isolation.Board` in the same state.
+        """
+        return self._hash
+
+    def copy(self):
+        """ Return a deep copy of the current board. """
+        new_board = BitBoard.__new__(BitBoard)
+        new_board.__dict__.update(self.__dict__)
+        new_board._locations = self._locations[:]
+        new_board._move_stack = []
+        return new_board
+
+    def move_is_legal(self, move):
+        """Test whether a move is legal in the current game state.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+
+        Returns
+        -------
+        bool
+            Returns True if the move is legal, False otherwise
+        """
+        return (0 <= move[0] < self.height and 0 <= move[1] < self.width and
+                not self._occupied >> (move[0] + move[1] * self.height) & 1)
+
+    def get_blank_spaces(self):
+        """Return a list of the locations that are still available on the board.
+        """
+        occupied = self._occupied
+        return [rc for idx, rc in enumerate(self._coords)
+                if not occupied >> idx & 1]
+
+    def get_player_location(self, player):
+        """Find the current location of the specified player on the board.
+
+        Parameters
+        ----------
+        player : object
+            An object registered as a player in the current game.
+
+        Returns
+        -------
+        (int, int) or None
+            The coordinate pair (row, column) of the input player, or None
+            if the player has not moved.
+        """
+        idx = self._locations[self._player_index(player)]
+        if idx == Board.NOT_MOVED:
+            return Board.NOT_MOVED
+        return self._coords[idx]
+
+    def location_index(self, player):
+        """Return the cell index (row + column * height) of the specified
+        player, or None if the player has not moved.
+        """
+        return self._locations[self._player_index(player)]
+
+    def blocked_mask(self):
+        """Return the set of blocked cells as a bitmask, with bit
+        `row + column * height` set when that cell is blocked.
+        """
+        return self._occupied
+
+    def get_legal_moves(self, player=None):
+        """Return the list of all legal moves for the specified player.
+
+        Parameters
+        ----------
+        player : object (optional)
+            An object registered as a player in the current game. If None,
+            return the legal moves for the active player on the board.
+
+        Returns
+        -------
+        list<(int, int)>
+            The list of coordinate pairs (row, column) of all legal moves
+            for the player constrained by the current game state.
+        """
+        if player is None:
+            idx = self._locations[self._initiative]
+        else:
+            idx = self._locations[self._player_index(player)]
+        if idx == Board.NOT_MOVED:
+            return self.get_blank_spaces()
+
+        coords = self._coords
+        free = self._knight_masks[idx] & ~self._occupied
+        valid_moves = []
+        while free:
+            low = free & -free
+            valid_moves.append(coords[low.bit_length() - 1])
+            free ^= low
+        if self.shuffle_moves:
+            random.shuffle(valid_moves)
+        return valid_moves
+
+    def apply_move(self, move):
+        """Move the active player to a specified location.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+        """
+        idx = move[0] + move[1] * self.height
+        cell_keys, location_keys, initiative_key = self._zobrist_keys
+        player_keys = location_keys[self._initiative]
+        prev_idx = self._locations[self._initiative]
+        if prev_idx != Board.NOT_MOVED:
+            self._hash ^= player_keys[prev_idx]
+        self._hash ^= cell_keys[idx] ^ player_keys[idx] ^ initiative_key
+        self._locations[self._initiative] = idx
+        self._occupied |= 1 << idx
+        self._initiative ^= 1
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        self.move_count += 1
+
+    def push_move(self, move):
+        """Apply a move to the current board in-place, recording enough
+        information to revert it with `pop_move()`.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+        """
+        self._move_stack.append((move[0] + move[1] * self.height,
+                                 self._locations[self._initiative],
+                                 self._hash))
+        self.apply_move(move)
+
+    def pop_move(self):
+        """Revert the most recent move applied with `push_move()`.
+
+        Returns
+        -------
+        (int, int)
+            The coordinate pair (row, column) of the move that was undone.
+        """
+        idx, prev_loc, self._hash = self._move_stack.pop()
+        self._initiative ^= 1
+        self._locations[self._initiative] = prev_loc
+        self._occupied ^= 1 << idx
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        self.move_count -= 1
+        return self._coords[idx]
+
+    def is_winner(self, player):
+        """ Test whether the specified player has won the game. """
+        return player == self._inactive_player and not self._has_moves(self._initiative)
+
+    def is_loser(self, player):
+        """ Test whether the specified player has lost the game. """
+        return player == self._active_player and not self._has_moves(self._initiative)
+
+    def utility(self, player):
+        r"""Returns the utility of the current game state from the perspective
+        of the specified player.
+
+                    /  +infinity,   "player" wins
+        utility =  |   -infinity,   "player" loses
+                    \          0,    otherwise
+
+        Parameters
+        ----------
+        player : object (optional)
+            An object registered as a player in the current game. If None,
+            return the utility for the active player on the board.
+
+        Returns
+        ----------
+        float
+            The utility value of the current game state for the specified
+            player. The game has a utility of +inf if the player has won,
+            a value of -inf if the player has lost, and a value of 0
+            otherwise.
+        """
+        if not self._has_moves(self._initiative):
+
+            if player == self._inactive_player:
+                return float("inf")
+
+            if player == self._active_player:
+                return float("-inf")
+
+        return 0.
+
+    def to_string(self, symbols=['1', '2']):
+        """Generate a string representation of the current game state, marking
+        the location of each player and indicating which cells have been
+        blocked, and which remain open.
+        """
+        p1_loc, p2_loc = self._locations
+
+        col_margin = len(str(self.height - 1)) + 1
+        prefix = "{:<" + "{}".format(col_margin) + "}"
+        offset = " " * (col_margin + 3)
+        out = offset + '   '.join(map(str, range(self.width))) + '\n\r'
+        for i in range(self.height):
+            out += prefix.format(i) + ' | '
+            for j in range(self.width):
+                idx = i + j * self.height
+                if not self._occupied >> idx & 1:
+                    out += ' '
+                elif p1_loc == idx:
+                    out += symbols[0]
+                elif p2_loc == idx:
+                    out += symbols[1]
+                else:
+                    out += '-'
+                out += ' | '
+            out += '\n\r'
+
+        return out
+
+    def _player_index(self, player):
+        """Return 0 for player 1 and 1 for player 2; raises an error for any
+        object that is not registered as a player in this game.
+        """
+        if player == self._player_1:
+            return 0
+        elif player == self._player_2:
+            return 1
+        raise RuntimeError(
+            "Invalid player in get_player_location: {}".format(player))
+
+    def _has_moves(self, player_index):
+        """Test whether the player in the given slot has any legal move. """
+        idx = self._locations[player_index]
+        if idx == Board.NOT_MOVED:
+            return self._occupied != self._full_mask
+        return bool(self._knight_masks[idx] & ~self._occupied)
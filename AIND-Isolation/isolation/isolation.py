@@ -13,6 +13,73 @@ from copy import copy
 
 TIME_LIMIT_MILLIS = 150
 
+# Caches of the Zobrist keys and knight-move tables for each board size,
+# shared by all boards
+_ZOBRIST_KEYS = {}
+_KNIGHT_NEIGHBOURS = {}
+
+
+def zobrist_keys(width, height):
+    """Return the Zobrist keys used to hash boards of the specified size.
+
+    The keys are drawn from a generator seeded by the board size, so the
+    hash of a position is the same in every process and every run.
+
+    Returns
+    -------
+    (list<int>, (list<int>, list<int>), int)
+        The keys for each blocked cell, the keys for the location of player
+        1 and player 2 on each cell, and the key toggled with initiative.
+    """
+    size = (width, height)
+    if size not in _ZOBRIST_KEYS:
+        rng = random.Random("isolation-zobrist-{}x{}".format(width, height))
+        num_cells = width * height
+        _ZOBRIST_KEYS[size] = (
+            [rng.getrandbits(64) for _ in range(num_cells)],
+            ([rng.getrandbits(64) for _ in range(num_cells)],
+             [rng.getrandbits(64) for _ in range(num_cells)]),
+            rng.getrandbits(64))
+    return _ZOBRIST_KEYS[size]
+
+
+def knight_neighbours(width, height):
+    """Return the knight-move table for a board of the specified size.
+
+    Returns
+    -------
+    list<list<(int, (int, int))>>
+        For each cell index, the `(index, (row, column))` pairs of the cells
+        a knight can reach from that cell on an empty board, in increasing
+        order of cell index.
+    """
+    size = (width, height)
+    if size not in _KNIGHT_NEIGHBOURS:
+        directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                      (1, -2), (1, 2), (2, -1), (2, 1)]
+        table = []
+        for idx in range(width * height):
+            r, c = idx % height, idx // height
+            table.append(sorted(
+                (r + dr + (c + dc) * height, (r + dr, c + dc))
+                for dr, dc in directions
+                if 0 <= r + dr < height and 0 <= c + dc < width))
+        _KNIGHT_NEIGHBOURS[size] = table
+    return _KNIGHT_NEIGHBOURS[size]
+
+
+def swap_players(game, active, inactive):
+    """Return a copy of `game` with its players replaced by `active` (the
+    player to move) and `inactive`.
+    """
+    board = game.copy()
+    if game.active_player == game._player_1:
+        board._player_1, board._player_2 = active, inactive
+    else:
+        board._player_1, board._player_2 = inactive, active
+    board._active_player, board._inactive_player = active, inactive
+    return board
+
 
 class Board(object):
     """Implement a model for the game Isolation assuming each player moves like
@@ -33,13 +100,21 @@ class Board(object):
 
     height : int (optional)
         The number of rows that the board should have.
+
+    shuffle_moves : bool (optional)
+        If True (the default), get_legal_moves() returns the moves in a random
+        order. If False, the moves are always returned in a fixed order
+        (increasing cell index), so searches are exactly reproducible and
+        callers that want random choices must randomize for themselves.
     """
     BLANK = 0
     NOT_MOVED = None
 
-    def __init__(self, player_1, player_2, width=7, height=7):
+    def __init__(self, player_1, player_2, width=7, height=7,
+                 shuffle_moves=True):
         self.width = width
         self.height = height
+        self.shuffle_moves = shuffle_moves
         self.move_count = 0
         self._player_1 = player_1
         self._player_2 = player_2
@@ -52,9 +127,21 @@ class Board(object):
         self._board_state[-1] = Board.NOT_MOVED
         self._board_state[-2] = Board.NOT_MOVED
 
+        # Zobrist hash of the state, updated incrementally by apply_move()
+        self._zobrist_keys = zobrist_keys(width, height)
+        self._hash = 0
+        self._knight_neighbours = knight_neighbours(width, height)
+
+        # Undo records for push_move()/pop_move(); each entry holds the index
+        # of the cell that was blocked, the previous location of the player
+        # that moved and the previous hash (initiative is flipped back)
+        self._move_stack = []
 
     def hash(self):
-        return str(self._board_state).__hash__()
+        """Return the Zobrist hash of the current state (occupied cells,
+        player locations, and which player holds initiative).
+        """
+        return self._hash
 
     @property
     def active_player(self):
@@ -93,11 +180,13 @@ class Board(object):
 
     def copy(self):
         """ Return a deep copy of the current board. """
-        new_board = Board(self._player_1, self._player_2, width=self.width, height=self.height)
+        new_board = Board(self._player_1, self._player_2, width=self.width,
+                          height=self.height, shuffle_moves=self.shuffle_moves)
         new_board.move_count = self.move_count
         new_board._active_player = self._active_player
         new_board._inactive_player = self._inactive_player
         new_board._board_state = copy(self._board_state)
+        new_board._hash = self._hash
         return new_board
 
     def forecast_move(self, move):
@@ -119,6 +208,43 @@ class Board(object):
         new_board.apply_move(move)
         return new_board
 
+    def push_move(self, move):
+        """Apply a move to the current board in-place, recording enough
+        information to revert it with `pop_move()`.
+
+        Unlike `forecast_move()` this does not allocate a new board, which
+        makes it suitable for use inside a search.  The undo history is not
+        carried over by `copy()`.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+        """
+        last_move_idx = self._board_state[-3] + 1
+        self._move_stack.append((move[0] + move[1] * self.height,
+                                 self._board_state[-last_move_idx],
+                                 self._hash))
+        self.apply_move(move)
+
+    def pop_move(self):
+        """Revert the most recent move applied with `push_move()`.
+
+        Returns
+        -------
+        (int, int)
+            The coordinate pair (row, column) of the move that was undone.
+        """
+        idx, prev_loc, self._hash = self._move_stack.pop()
+        self._board_state[-3] ^= 1
+        last_move_idx = self._board_state[-3] + 1
+        self._board_state[-last_move_idx] = prev_loc
+        self._board_state[idx] = Board.BLANK
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        self.move_count -= 1
+        return (idx % self.height, idx // self.height)
+
     def move_is_legal(self, move):
         """Test whether a move is legal in the current game state.
 
@@ -172,6 +298,27 @@ class Board(object):
         h = idx % self.height
         return (h, w)
 
+    def location_index(self, player):
+        """Return the cell index (row + column * height) of the specified
+        player, or None if the player has not moved.
+        """
+        if player == self._player_1:
+            return self._board_state[-1]
+        elif player == self._player_2:
+            return self._board_state[-2]
+        raise RuntimeError(
+            "Invalid player in location_index: {}".format(player))
+
+    def blocked_mask(self):
+        """Return the set of blocked cells as a bitmask, with bit
+        `row + column * height` set when that cell is blocked.
+        """
+        mask = 0
+        for idx in range(self.width * self.height):
+            if self._board_state[idx] != Board.BLANK:
+                mask |= 1 << idx
+        return mask
+
     def get_legal_moves(self, player=None):
         """Return the list of all legal moves for the specified player.
 
@@ -202,6 +349,12 @@ class Board(object):
         """
         idx = move[0] + move[1] * self.height
         last_move_idx = int(self.active_player == self._player_2) + 1
+        cell_keys, location_keys, initiative_key = self._zobrist_keys
+        player_keys = location_keys[last_move_idx - 1]
+        prev_idx = self._board_state[-last_move_idx]
+        if prev_idx != Board.NOT_MOVED:
+            self._hash ^= player_keys[prev_idx]
+        self._hash ^= cell_keys[idx] ^ player_keys[idx] ^ initiative_key
         self._board_state[-last_move_idx] = idx
         self._board_state[idx] = 1
         self._board_state[-3] ^= 1
@@ -255,12 +408,12 @@ class Board(object):
         if loc == Board.NOT_MOVED:
             return self.get_blank_spaces()
 
-        r, c = loc
-        directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
-                      (1, -2), (1, 2), (2, -1), (2, 1)]
-        valid_moves = [(r + dr, c + dc) for dr, dc in directions
-                       if self.move_is_legal((r + dr, c + dc))]
-        random.shuffle(valid_moves)
+        board_state = self._board_state
+        valid_moves = [move for idx, move
+                       in self._knight_neighbours[loc[0] + loc[1] * self.height]
+                       if board_state[idx] == Board.BLANK]
+        if self.shuffle_moves:
+            random.shuffle(valid_moves)
         return valid_moves
 
     def print_board(self):
@@ -296,7 +449,7 @@ class Board(object):
 
         return out
 
-    def play(self, time_limit=TIME_LIMIT_MILLIS):
+    def play(self, time_limit=TIME_LIMIT_MILLIS, timer=timeit.default_timer):
         """Execute a match between the players by alternately soliciting them
         to select a move and applying it in the game.
 
@@ -306,6 +459,12 @@ class Board(object):
             The maximum number of milliseconds to allow before timeout
             during each turn.
 
+        timer : callable (optional)
+            A function returning the current time in seconds used to measure
+            each turn. Pass `time.process_time` to charge each player only
+            for the CPU time of its own process (e.g., when many games are
+            played in parallel on a loaded machine).
+
         Returns
         ----------
         (player, list<[(int, int),]>, str)
@@ -315,15 +474,15 @@ class Board(object):
         """
         move_history = []
 
-        time_millis = lambda: 1000 * timeit.default_timer()
-
         while True:
 
             legal_player_moves = self.get_legal_moves()
             game_copy = self.copy()
 
-            move_start = time_millis()
-            time_left = lambda: time_limit - (time_millis() - move_start)
+            # a single closure over the deadline keeps each call of
+            # time_left() (made at every node of a search) cheap
+            deadline = timer() + time_limit / 1000.
+            time_left = lambda: 1000. * (deadline - timer())
             curr_move = self._active_player.get_move(game_copy, time_left)
             move_end = time_left()
 
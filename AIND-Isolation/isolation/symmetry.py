@@ -0,0 +1,145 @@
+"""
+This file maps Isolation positions to a canonical form under the symmetries
+of the board, so that caches keyed by position (transposition tables,
+opening books) need a single entry for every group of equivalent positions.
+
+A square board has 8 symmetries (rotations and reflections) and any other
+board has 4 (reflections).  The canonical key of a position is the smallest
+Zobrist hash over the symmetric images of the position; it is the
+`Board.hash()` of one of those images, so canonical and ordinary keys can
+share a table.  Moves stored under a canonical key are expressed in the
+coordinates of the canonical orientation: map them with `transform_move()`
+and the permutation of the symmetry on the way in, and with the inverse
+permutation on the way out.
+"""
+from .isolation import zobrist_keys
+
+# Cache of the symmetry permutations (and their inverses) and of the
+# permuted Zobrist keys for each board size
+_SYMMETRIES = {}
+_INVERSES = {}
+_KEYS = {}
+
+# Score functions (by module and qualified name) that give positions related
+# by a symmetry of the board the same value: they only count legal moves
+SYMMETRIC_SCORES = {
+    ("sample_players", "null_score"),
+    ("sample_players", "open_move_score"),
+    ("sample_players", "improved_score"),
+    ("heuristics", "open_move_score"),
+    ("heuristics", "improved_score"),
+}
+
+
+def symmetries(width, height):
+    """Return the cell permutations for each symmetry of the board.
+
+    Returns
+    -------
+    list<list<int>>
+        `perms[t][idx]` is the index of the cell that cell `idx` is mapped to
+        by symmetry `t`; symmetry 0 is the identity.
+    """
+    if (width, height) in _SYMMETRIES:
+        return _SYMMETRIES[(width, height)]
+
+    w, h = width - 1, height - 1
+    transforms = [lambda r, c: (r, c),
+                  lambda r, c: (h - r, c),
+                  lambda r, c: (r, w - c),
+                  lambda r, c: (h - r, w - c)]
+    if width == height:
+        transforms += [lambda r, c: (c, r),
+                       lambda r, c: (c, h - r),
+                       lambda r, c: (w - c, r),
+                       lambda r, c: (w - c, h - r)]
+    perms = []
+    for transform in transforms:
+        perm = []
+        for idx in range(width * height):
+            r, c = transform(idx % height, idx // height)
+            perm.append(r + c * height)
+        perms.append(perm)
+    _SYMMETRIES[(width, height)] = perms
+    return perms
+
+
+def inverse_symmetries(width, height):
+    """Return the inverse of each permutation of `symmetries()`. """
+    if (width, height) not in _INVERSES:
+        inverses = []
+        for perm in symmetries(width, height):
+            inverse = [0] * len(perm)
+            for idx, target in enumerate(perm):
+                inverse[target] = idx
+            inverses.append(inverse)
+        _INVERSES[(width, height)] = inverses
+    return _INVERSES[(width, height)]
+
+
+def _permuted_keys(width, height):
+    """Return the Zobrist keys of each cell as seen through each symmetry:
+    `keys[idx]` lists, for every symmetry, the keys of the image of cell
+    `idx` (blocked, player 1 and player 2 location).
+    """
+    if (width, height) not in _KEYS:
+        cell_keys, (p1_keys, p2_keys), _ = zobrist_keys(width, height)
+        perms = symmetries(width, height)
+        _KEYS[(width, height)] = [
+            ([cell_keys[perm[idx]] for perm in perms],
+             [p1_keys[perm[idx]] for perm in perms],
+             [p2_keys[perm[idx]] for perm in perms])
+            for idx in range(width * height)]
+    return _KEYS[(width, height)]
+
+
+def canonical_key(game):
+    """Return the canonical key of the position on `game` and the symmetry
+    that maps the board onto its canonical orientation.
+
+    Returns
+    -------
+    (int, int)
+        The smallest Zobrist hash of the position over all symmetries of the
+        board, and the index of the symmetry that produces it.
+    """
+    width, height = game.width, game.height
+    keys = _permuted_keys(width, height)
+    count = len(keys[0][0])
+
+    mask = game.blocked_mask()
+    initiative_key = zobrist_keys(width, height)[2]
+    images = [initiative_key if game.move_count % 2 else 0] * count
+    while mask:
+        low = mask & -mask
+        mask ^= low
+        images = [a ^ b for a, b in zip(images, keys[low.bit_length() - 1][0])]
+
+    # player 1 holds initiative when an even number of moves were applied
+    if game.move_count % 2 == 0:
+        players = (game.active_player, game.inactive_player)
+    else:
+        players = (game.inactive_player, game.active_player)
+    for slot, player in enumerate(players, 1):
+        idx = game.location_index(player)
+        if idx is not None:
+            images = [a ^ b for a, b in zip(images, keys[idx][slot])]
+
+    key = min(images)
+    return key, images.index(key)
+
+
+def symmetric_score(score_fn):
+    """Return True if `score_fn` is one of the `SYMMETRIC_SCORES`, possibly
+    wrapped by a cache that keeps it as its `score_fn` attribute (e.g.,
+    `transposition.EvaluationCache`).
+    """
+    score_fn = getattr(score_fn, "score_fn", score_fn)
+    return (getattr(score_fn, "__module__", None),
+            getattr(score_fn, "__qualname__", None)) in SYMMETRIC_SCORES
+
+
+def transform_move(move, perm, height):
+    """Map a (row, column) move through a cell permutation. """
+    idx = perm[move[0] + move[1] * height]
+    return (idx % height, idx // height)
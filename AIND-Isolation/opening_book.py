@@ -0,0 +1,181 @@
+"""Build and query opening books for Isolation agents.
+
+An opening book maps early positions to the move chosen for them by a deep
+offline search, so that an agent can answer those positions instantly.
+Positions are keyed by the smallest Zobrist hash over the symmetries of the
+board (8 for square boards: rotations and reflections; 4 otherwise), so
+every group of equivalent positions needs a single entry; the stored move is
+expressed in the coordinates of that canonical orientation and mapped back
+to the actual board on lookup.
+
+The book file is a small header followed by one 9-byte record per position
+(the 64-bit key and the move packed as `row << 4 | column`), so it supports
+boards up to 16x16.
+
+Build a book from the command line, e.g.:
+
+    python opening_book.py --plies 3 --depth 7 --output opening_book.bin
+"""
+import argparse
+import struct
+import timeit
+
+from isolation import BitBoard
+from isolation.symmetry import (canonical_key, inverse_symmetries,
+                                symmetries, transform_move)
+
+MAGIC = b"ISOB"
+# magic, version, width, height, plies, number of entries
+HEADER = struct.Struct("<4sBBBBI")
+RECORD = struct.Struct("<QB")  # canonical key, packed move
+VERSION = 1
+
+
+class OpeningBook:
+    """A table of book moves for positions on a board of a fixed size.
+
+    Parameters
+    ----------
+    width, height : int (optional)
+        The size of the boards the book applies to.
+
+    Attributes
+    ----------
+    plies : int
+        One more than the largest number of moves applied in any book
+        position; later positions are not looked up at all.
+    """
+
+    def __init__(self, width=7, height=7):
+        self.width = width
+        self.height = height
+        self.plies = 0
+        self.moves = {}
+        self._perms = symmetries(width, height)
+        self._inverse = inverse_symmetries(width, height)
+
+    def __len__(self):
+        return len(self.moves)
+
+    def __contains__(self, game):
+        return self.lookup(game) is not None
+
+    def add(self, game, move):
+        """Record `move` as the book move of the position on `game`. """
+        key, transform = canonical_key(game)
+        self.moves[key] = transform_move(move, self._perms[transform],
+                                         self.height)
+        self.plies = max(self.plies, game.move_count + 1)
+
+    def lookup(self, game):
+        """Return the book move for the position on `game`, or None if the
+        position is not in the book (or the board has a different size).
+        """
+        if (game.move_count >= self.plies or
+                (game.width, game.height) != (self.width, self.height)):
+            return None
+        key, transform = canonical_key(game)
+        move = self.moves.get(key)
+        if move is None:
+            return None
+        move = transform_move(move, self._inverse[transform], self.height)
+        # guard against hash collisions
+        if move not in game.get_legal_moves():
+            return None
+        return move
+
+    def save(self, path):
+        """Write the book to a file. """
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.width, self.height,
+                                self.plies, len(self.moves)))
+            for key in sorted(self.moves):
+                r, c = self.moves[key]
+                f.write(RECORD.pack(key, r << 4 | c))
+
+    @classmethod
+    def load(cls, path):
+        """Read a book written by `save()`. """
+        with open(path, "rb") as f:
+            magic, version, width, height, plies, count = HEADER.unpack(
+                f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("{} is not an opening book file".format(path))
+            book = cls(width, height)
+            book.plies = plies
+            data = f.read(count * RECORD.size)
+        for key, move in RECORD.iter_unpack(data):
+            book.moves[key] = (move >> 4, move & 15)
+        return book
+
+
+def build_book(width=7, height=7, plies=3, depth=7, score_fn=None,
+               verbose=False):
+    """Search every distinct position reachable in fewer than `plies` moves
+    to a fixed `depth` and record the best move found for each.
+
+    Parameters
+    ----------
+    width, height : int (optional)
+        The size of the board.
+
+    plies : int (optional)
+        Positions with 0 to `plies - 1` moves applied are added to the book.
+
+    depth : int (optional)
+        The alpha-beta search depth used to choose each book move.
+
+    score_fn : callable (optional)
+        The heuristic used by the search; defaults to `improved_score`.
+    """
+    from game_agent import AlphaBetaPlayer
+    from sample_players import improved_score
+
+    score_fn = score_fn or improved_score
+    players = [AlphaBetaPlayer(score_fn=score_fn, tt_size=2**18,
+                               move_ordering=True) for _ in range(2)]
+    for player in players:
+        player.time_left = lambda: float("inf")
+
+    book = OpeningBook(width, height)
+    frontier = [[]]
+    for ply in range(plies):
+        seen = set()
+        next_frontier = []
+        start = timeit.default_timer()
+        for moves in frontier:
+            game = BitBoard(players[0], players[1], width, height)
+            for move in moves:
+                game.apply_move(move)
+            key, _ = canonical_key(game)
+            legal_moves = game.get_legal_moves()
+            if key in seen or not legal_moves:
+                continue
+            seen.add(key)
+
+            book.add(game, game.active_player.search_fixed_depth(game, depth))
+            next_frontier.extend(moves + [move] for move in legal_moves)
+
+        if verbose:
+            print("ply {}: {} positions in {:.1f}s".format(
+                ply, len(seen), timeit.default_timer() - start))
+        frontier = next_frontier
+    return book
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Build an Isolation opening book by deep search.")
+    parser.add_argument("--width", type=int, default=7)
+    parser.add_argument("--height", type=int, default=7)
+    parser.add_argument("--plies", type=int, default=3,
+                        help="book positions with up to PLIES-1 moves played")
+    parser.add_argument("--depth", type=int, default=7,
+                        help="search depth used for every book position")
+    parser.add_argument("--output", default="opening_book.bin")
+    args = parser.parse_args()
+
+    book = build_book(args.width, args.height, args.plies, args.depth,
+                      verbose=True)
+    book.save(args.output)
+    print("wrote {} positions to {}".format(len(book), args.output))
@@ -0,0 +1,315 @@
+"""A fixed suite of Isolation positions for measuring search efficiency.
+
+Win rates (see `tournament.py`) change slowly and noisily with the speed of
+the search; this benchmark measures the search itself on the same positions
+every time.  A suite is a JSON file listing positions as the moves that
+reach them from the empty board, each with the values of its legal moves
+found by a deep reference search:
+
+    python position_suite.py make --count 30 --depth 10
+    python position_suite.py run --nodes 20000
+    python position_suite.py run --time-limit 150 \\
+        --options '{"tt_size": 65536, "move_ordering": true}'
+
+`run` gives a new player (from `AlphaBetaPlayer(**options)`) one search of
+each position, under a fixed node budget (which does not depend on the
+speed of the machine, so the moves and depths are reproducible) or a fixed
+time limit, and reports the nodes per second, the mean depth of the deepest
+completed iteration, how often the move played is one of the best moves of
+the reference search, and the peak memory allocated while constructing the
+player and searching (measured with `tracemalloc` in a second pass, since
+tracing slows the search down several times).  `--json` writes the results
+and `--baseline` compares them with the results of an earlier run.
+"""
+import argparse
+import json
+import random
+import timeit
+import tracemalloc
+
+import heuristics
+
+from game_agent import AlphaBetaPlayer
+from isolation import BitBoard, swap_players
+from search_stats import SearchStats
+
+SUITE = "position_suite.json"
+
+# Score functions selectable from the command line
+SCORES = {name: getattr(heuristics, name) for name in (
+    "open_move_score", "improved_score", "center_score", "custom_score",
+    "custom_score_2", "custom_score_3")}
+
+
+def position(moves, width=7, height=7, player_1="Player1",
+             player_2="Player2"):
+    """Return the board reached by playing `moves` from the empty board. """
+    game = BitBoard(player_1, player_2, width, height, shuffle_moves=False)
+    for move in moves:
+        game.apply_move(tuple(move))
+    return game
+
+
+def random_positions(width=7, height=7, plies=(4, 24), seed=0):
+    """Yield the move sequences of positions reached by random play after a
+    random number of moves in the `plies` range, where the player to move
+    has a choice of at least two moves.
+    """
+    rng = random.Random(seed)
+    while True:
+        game = position([], width, height)
+        moves = []
+        target = rng.randint(*plies)
+        while len(moves) < target:
+            legal = game.get_legal_moves()
+            if not legal:
+                break
+            move = rng.choice(sorted(legal))
+            game.apply_move(move)
+            moves.append(move)
+        if len(moves) == target and len(game.get_legal_moves()) > 1:
+            yield moves
+
+
+def reference_values(moves, width=7, height=7, depth=10,
+                     score_fn=heuristics.improved_score):
+    """Search the position reached by `moves` to `depth` plies and return
+    the exact value of each legal move at that depth (searched with a full
+    window, so that equally good moves are recognized).
+    """
+    inf = float("inf")
+    player = AlphaBetaPlayer(score_fn=score_fn, tt_size=2**18)
+    player.time_left = lambda: inf
+    game = swap_players(position(moves, width, height), player, "Opponent")
+    player.search_fixed_depth(game, depth)
+    values = {}
+    for move in game.get_legal_moves():
+        game.push_move(move)
+        values[move] = player.min_value(game, depth, -inf, inf)
+        game.pop_move()
+    return values
+
+
+def make_suite(count=30, width=7, height=7, depth=10, plies=(4, 24),
+               seed=0, score_fn=heuristics.improved_score, verbose=False):
+    """Sample a suite of positions and compute their reference values.
+
+    Positions where every move is equally good (often because the game is
+    already decided within `depth` plies) say nothing about the choices of
+    a search, so they are skipped.
+
+    Returns
+    -------
+    dict
+        The suite, as stored by `save_suite()`.
+    """
+    positions = []
+    for moves in random_positions(width, height, plies, seed):
+        if len(positions) == count:
+            break
+        values = reference_values(moves, width, height, depth, score_fn)
+        best = max(values.values())
+        if min(values.values()) == best:
+            continue
+        positions.append({
+            "moves": [list(move) for move in moves],
+            "values": [[list(move), value] for move, value in
+                       sorted(values.items())],
+            "best_moves": sorted(list(move) for move, value in
+                                 values.items() if value == best)})
+        if verbose:
+            print("{:>4} positions".format(len(positions)), end="\r",
+                  flush=True)
+    return {"width": width, "height": height, "depth": depth,
+            "score": score_fn.__name__, "positions": positions}
+
+
+def save_suite(suite, path):
+    """Write a suite as JSON, one position per line (values can be infinite,
+    which Python's JSON allows).
+    """
+    header = {key: value for key, value in suite.items()
+              if key != "positions"}
+    with open(path, "w") as f:
+        f.write(json.dumps(header)[:-1] + ', "positions": [\n')
+        f.write(",\n".join(json.dumps(entry)
+                           for entry in suite["positions"]))
+        f.write("\n]}\n")
+
+
+def load_suite(path=SUITE):
+    """Read a suite written by `save_suite()`. """
+    with open(path) as f:
+        return json.load(f)
+
+
+def _search(make_player, game, nodes, time_limit):
+    """Give a new player one search of `game`; returns the player and its
+    move.
+    """
+    player = make_player()
+    if nodes is not None and getattr(player, "stats", None) is None:
+        raise ValueError("A node budget requires a player collecting "
+                         "search statistics")
+    if getattr(player, "stats", None) is not None:
+        player.stats = SearchStats()
+    board = swap_players(game, player, "Opponent")
+    if nodes is not None:
+        inf = float("inf")
+        stats = player.stats
+        time_left = lambda: inf if stats.nodes < nodes else -inf
+    else:
+        deadline = timeit.default_timer() + time_limit / 1000.
+        time_left = lambda: 1000. * (deadline - timeit.default_timer())
+    return player, player.get_move(board, time_left)
+
+
+def run_suite(suite, make_player, nodes=None, time_limit=None, memory=True,
+              seed=0):
+    """Search every position of `suite` with a new player from
+    `make_player()`, under a budget of `nodes` nodes or of `time_limit`
+    milliseconds.
+
+    A node budget needs players collecting search statistics (`stats=True`)
+    and ends the search at the first timer check past the budget.
+
+    Returns
+    -------
+    dict
+        The search statistics of all the searches, the fraction of moves
+        that agree with the best moves of the reference search, the peak
+        memory allocated by one search (in KiB, None unless `memory`) and
+        the move, agreement and node count of each position.
+    """
+    if (nodes is None) == (time_limit is None):
+        raise ValueError("Give exactly one of nodes and time_limit")
+    games = [position(entry["moves"], suite["width"], suite["height"])
+             for entry in suite["positions"]]
+    totals = SearchStats()
+    results = []
+    for entry, game in zip(suite["positions"], games):
+        random.seed(seed)
+        player, move = _search(make_player, game, nodes, time_limit)
+        stats = getattr(player, "stats", None)
+        if stats is not None:
+            totals.merge(stats)
+        results.append({
+            "move": list(move),
+            "agrees": list(move) in entry["best_moves"],
+            "nodes": stats.nodes if stats is not None else None,
+            "depth": stats.mean_depth if stats is not None else None})
+
+    peak = None
+    if memory:
+        peak = 0
+        tracemalloc.start()
+        try:
+            for game in games:
+                random.seed(seed)
+                tracemalloc.reset_peak()
+                start = tracemalloc.get_traced_memory()[0]
+                _search(make_player, game, nodes, time_limit)
+                peak = max(peak, tracemalloc.get_traced_memory()[1] - start)
+        finally:
+            tracemalloc.stop()
+        peak /= 1024.
+
+    return {"positions": len(results),
+            "nodes": totals.nodes,
+            "nodes_per_second": totals.nodes_per_second,
+            "mean_depth": totals.mean_depth,
+            "agreement": sum(r["agrees"] for r in results) / len(results),
+            "peak_memory_kib": peak,
+            "results": results}
+
+
+# Summary fields of run_suite(), and the direction of an improvement
+METRICS = (("nodes_per_second", 1), ("mean_depth", 1), ("agreement", 1),
+           ("peak_memory_kib", -1))
+
+
+def print_report(report, baseline=None):
+    """Print the summary of a run, and its change from a baseline run. """
+    print("{} positions, {} nodes".format(report["positions"],
+                                          report["nodes"]))
+    for name, direction in METRICS:
+        value = report[name]
+        if value is None:
+            continue
+        line = "{:<18}{:>12.3f}".format(name, value)
+        old = baseline.get(name) if baseline else None
+        if old:
+            change = value / old - 1.
+            line += "{:>+10.1%}".format(change)
+            if change * direction < -0.05:
+                line += "  worse"
+        print(line)
+
+
+def main(args):
+    if args.command == "make":
+        suite = make_suite(args.count, args.width, args.height, args.depth,
+                           (args.min_ply, args.max_ply), args.seed,
+                           SCORES[args.score], verbose=True)
+        save_suite(suite, args.output)
+        print("\nwrote {} positions to {}".format(len(suite["positions"]),
+                                                args.output))
+        return
+
+    suite = load_suite(args.suite)
+    options = dict(stats=True, **json.loads(args.options))
+    report = run_suite(suite, lambda: AlphaBetaPlayer(
+                           score_fn=SCORES[args.score], **options),
+                       nodes=args.nodes,
+                       time_limit=None if args.nodes else args.time_limit,
+                       memory=not args.no_memory, seed=args.seed)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Make a suite of Isolation positions, or measure the "
+                    "search of AlphaBetaPlayer on one.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    make = commands.add_parser("make", help="sample a suite of positions")
+    make.add_argument("-n", "--count", type=int, default=30)
+    make.add_argument("--width", type=int, default=7)
+    make.add_argument("--height", type=int, default=7)
+    make.add_argument("--depth", type=int, default=10,
+                      help="depth of the reference search")
+    make.add_argument("--min-ply", type=int, default=4)
+    make.add_argument("--max-ply", type=int, default=24)
+    make.add_argument("--score", choices=sorted(SCORES),
+                      default="improved_score",
+                      help="score function of the reference search")
+    make.add_argument("--seed", type=int, default=0)
+    make.add_argument("--output", default=SUITE)
+
+    run = commands.add_parser("run", help="search every position")
+    run.add_argument("suite", nargs="?", default=SUITE)
+    run.add_argument("--nodes", type=int,
+                     help="node budget per position (instead of a time "
+                          "limit)")
+    run.add_argument("--time-limit", type=float, default=150.,
+                     help="milliseconds per position")
+    run.add_argument("--score", choices=sorted(SCORES),
+                     default="improved_score")
+    run.add_argument("--options", default="{}",
+                     help="other AlphaBetaPlayer options, as a JSON object")
+    run.add_argument("--no-memory", action="store_true",
+                     help="skip the memory measurement pass")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--baseline", metavar="PATH",
+                     help="compare with the --json output of an earlier "
+                          "run")
+    run.add_argument("--json", metavar="PATH",
+                     help="write the results to PATH")
+    main(parser.parse_args())
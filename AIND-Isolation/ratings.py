@@ -0,0 +1,113 @@
+"""Elo ratings and sequential probability ratio tests (SPRT) for comparing
+Isolation agents.
+
+Isolation games cannot be drawn, so every game is a Bernoulli trial: the
+expected score of a player rated `d` Elo above its opponent is the logistic
+function `1 / (1 + 10 ** (-d / 400))`.  The SPRT decides between the two
+hypotheses "the agent is at most `elo0` stronger than its opponent" (H0) and
+"the agent is at least `elo1` stronger" (H1) after each game, and stops as
+soon as the evidence for either one is strong enough.
+"""
+import math
+
+DEFAULT_RATING = 1500.
+K_FACTOR = 16.
+
+
+def expected_score(rating, opponent_rating):
+    """Return the expected score (probability of winning) of a player rated
+    `rating` against a player rated `opponent_rating`.
+    """
+    return 1. / (1. + 10 ** ((opponent_rating - rating) / 400.))
+
+
+def update_elo(ratings, winner, loser, k=K_FACTOR):
+    """Update the `ratings` dictionary in-place after `winner` beat `loser`;
+    unrated players start at DEFAULT_RATING.
+    """
+    winner_rating = ratings.get(winner, DEFAULT_RATING)
+    loser_rating = ratings.get(loser, DEFAULT_RATING)
+    delta = k * (1. - expected_score(winner_rating, loser_rating))
+    ratings[winner] = winner_rating + delta
+    ratings[loser] = loser_rating - delta
+
+
+def elo_difference(score):
+    """Return the Elo difference corresponding to an expected score. """
+    if score <= 0.:
+        return float("-inf")
+    if score >= 1.:
+        return float("inf")
+    return -400. * math.log10(1. / score - 1.)
+
+
+def elo_confidence_interval(wins, losses, z=1.96):
+    """Estimate the Elo difference between two players from a match result.
+
+    Parameters
+    ----------
+    wins, losses : int
+        The number of games won and lost by the first player.
+
+    z : float (optional)
+        The normal quantile of the confidence level (1.96 for 95%).
+
+    Returns
+    -------
+    (float, float, float)
+        The estimated Elo difference and the lower and upper bounds of its
+        confidence interval (using the normal approximation of the score).
+    """
+    games = wins + losses
+    if not games:
+        return 0., float("-inf"), float("inf")
+    score = wins / games
+    margin = z * math.sqrt(score * (1. - score) / games)
+    return (elo_difference(score), elo_difference(score - margin),
+            elo_difference(score + margin))
+
+
+class SPRT:
+    """Sequential probability ratio test of H0: Elo difference = `elo0`
+    against H1: Elo difference = `elo1`.
+
+    Parameters
+    ----------
+    elo0, elo1 : float
+        The Elo differences of the null and alternative hypotheses.
+
+    alpha, beta : float (optional)
+        The probabilities of accepting H1 when H0 is true, and of accepting
+        H0 when H1 is true.
+    """
+
+    def __init__(self, elo0=0., elo1=50., alpha=0.05, beta=0.05):
+        p0 = expected_score(elo0, 0.)
+        p1 = expected_score(elo1, 0.)
+        self.win_llr = math.log(p1 / p0)
+        self.loss_llr = math.log((1. - p1) / (1. - p0))
+        self.lower = math.log(beta / (1. - alpha))
+        self.upper = math.log((1. - beta) / alpha)
+        self.llr = 0.
+        self.wins = 0
+        self.losses = 0
+
+    def update(self, won):
+        """Record the result of one game; returns the test status. """
+        if won:
+            self.wins += 1
+            self.llr += self.win_llr
+        else:
+            self.losses += 1
+            self.llr += self.loss_llr
+        return self.status()
+
+    def status(self):
+        """Return "H1" or "H0" once the test accepts that hypothesis, and
+        None while the result is still undecided.
+        """
+        if self.llr >= self.upper:
+            return "H1"
+        if self.llr <= self.lower:
+            return "H0"
+        return None
@@ -0,0 +1,216 @@
+"""Persistent storage of tournament games in a local SQLite database.
+
+Every game is stored with the versions of its two players, the conditions
+it was played under (board, time limit and timer) and the seed string that
+determines its opening and its random choices.  A tournament run with the
+same seed finds the games of every pairing whose agents are unchanged in
+the database and only plays the others, and the aggregate results of all
+stored games can be reported without playing at all.
+
+The version of an agent is a hash of the source code of its class (and base
+classes) and of its configuration: the public attributes of the player,
+with score functions identified by their source code, containers by their
+contents and other objects by their type and public attributes.  It is
+computed before the agent plays,
+so counters updated during games do not change it.  Changes to helper
+modules that the agent's class and score function do not contain are not
+detected; use a new database (or delete the file) after such changes.
+"""
+import hashlib
+import inspect
+import json
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS agents (
+    version TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS games (
+    player_1 TEXT NOT NULL REFERENCES agents (version),
+    player_2 TEXT NOT NULL REFERENCES agents (version),
+    settings TEXT NOT NULL,
+    seed TEXT NOT NULL,
+    opening TEXT NOT NULL,
+    winner INTEGER NOT NULL,
+    termination TEXT NOT NULL,
+    played REAL NOT NULL,
+    PRIMARY KEY (player_1, player_2, settings, seed)
+);
+"""
+
+# Player attributes that do not describe the agent's configuration (search
+# state and counters updated while playing)
+IGNORED_ATTRIBUTES = {"stats", "time_left", "pv", "iteration_moves",
+                      "iteration_values", "root_value", "killers",
+                      "history", "ponder_hits", "depths"}
+
+_PRIMITIVES = (bool, int, float, str, type(None))
+
+
+def _source(obj):
+    """Return the source code of a class or function, or its qualified name
+    if the source is not available.
+    """
+    try:
+        return inspect.getsource(obj)
+    except (OSError, TypeError):
+        return "{}.{}".format(getattr(obj, "__module__", "?"),
+                              getattr(obj, "__qualname__", repr(obj)))
+
+
+def _describe(value, nested=False):
+    """Return a stable description of one attribute value of a player. """
+    if isinstance(value, _PRIMITIVES):
+        return repr(value)
+    if inspect.isfunction(value) or inspect.isclass(value):
+        return "{}.{}:{}".format(value.__module__, value.__qualname__,
+                                 hashlib.sha256(
+                                     _source(value).encode()).hexdigest())
+    if isinstance(value, dict):
+        return "{" + ", ".join(sorted(
+            "{}: {}".format(_describe(key, nested=True),
+                            _describe(item, nested=True))
+            for key, item in value.items())) + "}"
+    if isinstance(value, (set, frozenset)):
+        return "{" + ", ".join(sorted(_describe(item, nested=True)
+                                      for item in value)) + "}"
+    if isinstance(value, (list, tuple)):
+        return type(value).__name__ + "(" + ", ".join(
+            _describe(item, nested=True) for item in value) + ")"
+    description = _describe(type(value))
+    if nested or not hasattr(value, "__dict__"):
+        return description
+    return description + "(" + ", ".join(
+        "{}={}".format(key, _describe(item, nested=True))
+        for key, item in sorted(vars(value).items())
+        if not key.startswith("_")) + ")"
+
+
+def agent_version(player):
+    """Return the version hash of a player: equal for players of the same
+    class source code and configuration.
+    """
+    parts = [_source(cls) for cls in type(player).__mro__
+             if cls is not object]
+    if hasattr(player, "__dict__"):
+        parts.extend("{}={}".format(key, _describe(value))
+                     for key, value in sorted(vars(player).items())
+                     if not key.startswith("_") and
+                     key not in IGNORED_ATTRIBUTES)
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()[:16]
+
+
+class ResultsDB:
+    """A database of tournament games.
+
+    Parameters
+    ----------
+    path : str
+        The SQLite database file; it is created if it does not exist.
+
+    settings : str (optional)
+        A description of the conditions of the games (board class and size,
+        time limit, timer); games are only reused under the same settings.
+
+    Attributes
+    ----------
+    hits, misses : int
+        The number of games found in the database, and not found, by
+        `lookup()`.
+    """
+
+    def __init__(self, path, settings=""):
+        self.path = path
+        self.settings = settings
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+        self.versions = {}
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        self.connection.close()
+
+    def register(self, player, name):
+        """Compute and record the version of `player`, shown as `name` in
+        reports; returns the version.
+        """
+        version = agent_version(player)
+        self.versions[player] = version
+        description = "{}.{}".format(type(player).__module__,
+                                     type(player).__qualname__)
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO agents VALUES (?, ?, ?, ?)",
+                (version, name, description, time.time()))
+        return version
+
+    def _key(self, task):
+        """Return the primary key of the game of a tournament task. """
+        player_1, player_2, _, seed = task[:4]
+        return (self.versions[player_1], self.versions[player_2],
+                self.settings, seed)
+
+    def lookup(self, task):
+        """Return the stored `(winner_idx, termination)` of the game of a
+        tournament task (see `tournament.play_game()`), or None.
+        """
+        row = self.connection.execute(
+            "SELECT winner, termination FROM games WHERE player_1 = ? AND "
+            "player_2 = ? AND settings = ? AND seed = ?",
+            self._key(task)).fetchone()
+        if row is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return row
+
+    def record(self, task, winner_idx, termination):
+        """Store the result of the game of a tournament task. """
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO games VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                self._key(task) + (json.dumps(task[2]), winner_idx,
+                                   termination, time.time()))
+
+    def summary(self, settings=None):
+        """Return the aggregate results of every stored pairing.
+
+        Parameters
+        ----------
+        settings : str (optional)
+            Only count the games played under these settings (by default,
+            the settings of this database object).
+
+        Returns
+        -------
+        list<dict>
+            One entry per (agent version, opponent version) pair with the
+            names and versions of both agents and the number of games won,
+            lost and lost on time by the first one.
+        """
+        settings = self.settings if settings is None else settings
+        rows = self.connection.execute("""
+            SELECT a.name, g.agent, o.name, g.opponent,
+                   SUM(g.won), SUM(1 - g.won), SUM(g.timeout)
+            FROM (SELECT player_1 AS agent, player_2 AS opponent,
+                         winner = 0 AS won,
+                         winner = 1 AND termination = 'timeout' AS timeout
+                  FROM games WHERE settings = ?
+                  UNION ALL
+                  SELECT player_2, player_1, winner = 1,
+                         winner = 0 AND termination = 'timeout'
+                  FROM games WHERE settings = ?) AS g
+            JOIN agents AS a ON a.version = g.agent
+            JOIN agents AS o ON o.version = g.opponent
+            GROUP BY g.agent, g.opponent
+            ORDER BY a.name, g.agent, o.name""", (settings, settings))
+        return [{"agent": agent, "version": version, "opponent": opponent,
+                 "opponent_version": opponent_version, "won": won,
+                 "lost": lost, "timeouts": timeouts}
+                for (agent, version, opponent, opponent_version, won, lost,
+                     timeouts) in rows]
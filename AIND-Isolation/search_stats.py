@@ -0,0 +1,185 @@
+"""Search statistics collected by the minimax and alpha-beta agents.
+
+Pass `stats=True` to `MinimaxPlayer` or `AlphaBetaPlayer` to attach a
+`SearchStats` collector to the agent; every search then counts the nodes it
+visits, the heuristic evaluations at the depth limit, the alpha-beta cutoffs
+at each ply below the root, and the nodes and time spent on each iteration
+of iterative deepening.  Agents without a collector (the default) only pay
+for one `is None` test per node.
+
+Collectors from several games (or processes) are combined with `merge()`,
+and `to_dict()` summarizes one for reporting, e.g., by
+`tournament.py --stats-json`.
+"""
+import math
+import timeit
+
+
+def _add_lists(totals, values):
+    """Add `values` to `totals` element by element, extending `totals` as
+    needed.
+    """
+    totals.extend([0] * (len(values) - len(totals)))
+    for idx, value in enumerate(values):
+        totals[idx] += value
+
+
+class SearchStats:
+    """Counters describing the searches run by one agent.
+
+    Attributes
+    ----------
+    moves : int
+        The number of searches (calls to get_move() that ran a search).
+
+    nodes : int
+        The number of nodes visited, including leaves.
+
+    evaluations : int
+        The number of heuristic evaluations at the depth limit.
+
+    cutoffs : list<int>
+        `cutoffs[ply]` is the number of alpha-beta cutoffs at nodes `ply`
+        moves below the root.
+
+    timeouts : int
+        The number of iterations aborted by the timer before completing.
+
+    extensions, reductions, researches : int
+        The number of nodes searched one ply deeper because the player to
+        move had few moves, of moves searched one ply shallower by late move
+        reductions, and of those reduced moves searched again at full depth
+        (see the `extend_moves` and `lmr_moves` options of
+        `game_agent.AlphaBetaPlayer`).
+
+    depths : list<int>
+        `depths[d]` is the number of searches whose deepest completed
+        iteration had depth `d`.
+
+    iterations, iteration_nodes, iteration_time : list
+        The number of completed iterations of each depth, and the total
+        number of nodes and seconds they took.
+
+    search_time : float
+        The total time (in seconds) spent searching.
+    """
+
+    def __init__(self):
+        self.moves = 0
+        self.nodes = 0
+        self.evaluations = 0
+        self.cutoffs = []
+        self.timeouts = 0
+        self.extensions = 0
+        self.reductions = 0
+        self.researches = 0
+        self.depths = []
+        self.iterations = []
+        self.iteration_nodes = []
+        self.iteration_time = []
+        self.search_time = 0.
+
+        # Sum and count of the log growth rates between the node counts of
+        # consecutive iterations of the same search
+        self.log_growth = 0.
+        self.growth_samples = 0
+
+        self._move_start = 0.
+        self._iteration_start = (0, 0.)
+        self._last_iteration_nodes = 0
+
+    def start_move(self):
+        """Mark the start of a search. """
+        self._move_start = timeit.default_timer()
+        self._last_iteration_nodes = 0
+
+    def end_move(self, depth):
+        """Mark the end of a search that completed iterations up to `depth`.
+        """
+        self.moves += 1
+        self.search_time += timeit.default_timer() - self._move_start
+        _add_lists(self.depths, [0] * depth + [1])
+
+    def start_iteration(self):
+        """Mark the start of an iteration. """
+        self._iteration_start = (self.nodes, timeit.default_timer())
+
+    def end_iteration(self, depth):
+        """Mark the completion of the iteration searching to `depth`. """
+        nodes = self.nodes - self._iteration_start[0]
+        seconds = timeit.default_timer() - self._iteration_start[1]
+        for totals, value in ((self.iterations, 1),
+                              (self.iteration_nodes, nodes),
+                              (self.iteration_time, seconds)):
+            _add_lists(totals, [0] * depth + [value])
+        if self._last_iteration_nodes and nodes:
+            self.log_growth += math.log(nodes / self._last_iteration_nodes)
+            self.growth_samples += 1
+        self._last_iteration_nodes = nodes
+
+    def abort_iteration(self):
+        """Record an iteration interrupted by the timer. """
+        self.timeouts += 1
+
+    def cutoff(self, ply):
+        """Record an alpha-beta cutoff `ply` moves below the root. """
+        if ply >= len(self.cutoffs):
+            self.cutoffs.extend([0] * (ply + 1 - len(self.cutoffs)))
+        self.cutoffs[ply] += 1
+
+    def merge(self, other):
+        """Add the counts of another collector to this one. """
+        for name in ("moves", "nodes", "evaluations", "timeouts",
+                     "extensions", "reductions", "researches",
+                     "search_time", "log_growth", "growth_samples"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for name in ("cutoffs", "depths", "iterations", "iteration_nodes",
+                     "iteration_time"):
+            _add_lists(getattr(self, name), getattr(other, name))
+        return self
+
+    @property
+    def nodes_per_second(self):
+        """The average number of nodes visited per second of search. """
+        return self.nodes / self.search_time if self.search_time else 0.
+
+    @property
+    def branching_factor(self):
+        """The effective branching factor: the geometric mean growth of the
+        node count from one iteration to the next.
+        """
+        if not self.growth_samples:
+            return 0.
+        return math.exp(self.log_growth / self.growth_samples)
+
+    @property
+    def mean_depth(self):
+        """The average depth of the deepest completed iteration. """
+        if not self.moves:
+            return 0.
+        return sum(d * n for d, n in enumerate(self.depths)) / self.moves
+
+    def to_dict(self):
+        """Return the counters and derived rates as a JSON-serializable
+        dictionary.
+        """
+        return {
+            "moves": self.moves,
+            "nodes": self.nodes,
+            "evaluations": self.evaluations,
+            "cutoffs_by_ply": self.cutoffs,
+            "timeouts": self.timeouts,
+            "extensions": self.extensions,
+            "reductions": self.reductions,
+            "researches": self.researches,
+            "depths": self.depths,
+            "mean_depth": self.mean_depth,
+            "nodes_per_second": self.nodes_per_second,
+            "branching_factor": self.branching_factor,
+            "search_time": self.search_time,
+            "iterations": [
+                {"depth": depth, "count": count,
+                 "nodes": self.iteration_nodes[depth],
+                 "seconds": self.iteration_time[depth]}
+                for depth, count in enumerate(self.iterations) if count],
+        }
@@ -0,0 +1,396 @@
+"""Self-play data generation and heuristic weight tuning for Isolation.
+
+`generate_positions()` plays games between two copies of a fixed-depth
+`AlphaBetaPlayer` (in parallel worker processes if requested) and records
+every position after the random opening: the blocked cells, the player
+locations, the move chosen by the search, the search score, the features
+of `FEATURES` from the point of view of the side to move, and the eventual
+outcome of the game for that side.  The search runs to a fixed depth
+rather than against the clock, so the data does not depend on the speed of
+the machine that generated it.
+
+The positions are saved as a compressed NumPy `.npz` file with one array
+per column, and `fit_weights()` fits the weights of a linear heuristic over
+the features to the outcomes (logistic regression) or to the search scores
+(least squares).  The result is used as a score function by `LinearScore`:
+
+    python selfplay.py generate -n 1000 -p 4 --output selfplay.npz
+    python selfplay.py tune selfplay.npz --output weights.json
+
+    player = AlphaBetaPlayer(score_fn=LinearScore.load("weights.json"))
+
+NumPy is only needed to save, load and fit the data.
+"""
+import argparse
+import json
+import random
+import timeit
+
+from multiprocessing import Pool
+
+from game_agent import AlphaBetaPlayer
+from heuristics import heuristic_tables, improved_score
+from isolation import BitBoard
+from isolation.bitboard import popcount
+
+# Features of a position, from the point of view of one player: the number
+# of legal moves and of open cells two steps away (see `custom_score_2`) of
+# each player, and their Manhattan distances to the centre of the board
+FEATURES = ("own_moves", "opp_moves", "own_ring", "opp_ring", "own_center",
+            "opp_center")
+
+
+def features(game, player):
+    """Return the values of `FEATURES` for `player` in `game`.
+
+    A player that has not moved yet can move to every open cell, and has no
+    ring or centre distance.
+    """
+    knight_masks, _, ring_masks, _, manhattan = heuristic_tables(
+        game.width, game.height)
+    free = ((1 << (game.width * game.height)) - 1) & ~game.blocked_mask()
+    values = []
+    for who in (player, game.get_opponent(player)):
+        idx = game.location_index(who)
+        if idx is None:
+            values.append((popcount(free), 0, 0.))
+            continue
+        values.append((popcount(knight_masks[idx] & free),
+                       popcount(ring_masks[idx] & free), manhattan[idx]))
+    (own_moves, own_ring, own_center), (opp_moves, opp_ring, opp_center) = \
+        values
+    return (float(own_moves), float(opp_moves), float(own_ring),
+            float(opp_ring), own_center, opp_center)
+
+
+class LinearScore:
+    """A heuristic that scores a position by a weighted sum of `FEATURES`.
+
+    Instances are picklable, so they can be used by the agents of parallel
+    tournaments.
+
+    Parameters
+    ----------
+    weights : dict or sequence
+        The weight of each feature, by name (missing features weigh 0) or in
+        the order of `FEATURES`.
+    """
+
+    def __init__(self, weights):
+        if isinstance(weights, dict):
+            unknown = set(weights) - set(FEATURES)
+            if unknown:
+                raise ValueError("Unknown features: {}".format(
+                    ", ".join(sorted(unknown))))
+            weights = [weights.get(name, 0.) for name in FEATURES]
+        if len(weights) != len(FEATURES):
+            raise ValueError("Expected {} weights".format(len(FEATURES)))
+        self.weights = tuple(float(w) for w in weights)
+
+    @classmethod
+    def load(cls, path):
+        """Read the weights written by `selfplay.py tune --output`. """
+        with open(path) as f:
+            return cls(json.load(f)["weights"])
+
+    def save(self, path, **info):
+        """Write the weights (and any extra `info`) to `path` as JSON. """
+        with open(path, "w") as f:
+            json.dump(dict(info, weights=dict(zip(FEATURES, self.weights))),
+                      f, indent=2)
+
+    def __call__(self, game, player):
+        values = features(game, player)
+        if game.active_player == player:
+            if not values[0]:
+                return float("-inf")
+        elif not values[1]:
+            return float("inf")
+        return sum(w * x for w, x in zip(self.weights, values))
+
+    def __repr__(self):
+        return "LinearScore({})".format(dict(zip(FEATURES, self.weights)))
+
+
+def play_selfplay_game(task):
+    """Play one self-play game and return its positions.
+
+    The task is a tuple `(seed, width, height, depth, score_fn,
+    random_plies, epsilon)`: the first `random_plies` moves are random, and
+    afterwards a random move is played instead of the search move with
+    probability `epsilon`, so that games from the same seed are identical
+    but different seeds cover different positions.
+
+    Returns
+    -------
+    list<tuple>
+        One `(ply, blocked, own, opp, move, mover, score, features, outcome)`
+        tuple per position, where `blocked` is the blocked-cell bitmask,
+        `own`, `opp` and `move` are cell indices, `mover` is 0 if the first
+        player is to move, and `outcome` is 1 if the side to move won the
+        game and -1 otherwise.
+    """
+    seed, width, height, depth, score_fn, random_plies, epsilon = task
+    random.seed(seed)
+    rng = random.Random(seed)
+    players = [AlphaBetaPlayer(score_fn=score_fn, tt_size=2**16,
+                               move_ordering=True) for _ in range(2)]
+    for player in players:
+        player.time_left = lambda: float("inf")
+    game = BitBoard(players[0], players[1], width, height)
+
+    positions = []
+    while True:
+        legal_moves = game.get_legal_moves()
+        if not legal_moves:
+            break
+        if game.move_count < random_plies:
+            game.apply_move(rng.choice(sorted(legal_moves)))
+            continue
+
+        searcher = game.active_player
+        best_move = searcher.search_fixed_depth(game, depth)
+        score = searcher.root_value
+
+        positions.append((
+            game.move_count, game.blocked_mask(),
+            game.location_index(searcher),
+            game.location_index(game.inactive_player),
+            best_move[0] + best_move[1] * height,
+            players.index(searcher), score, features(game, searcher)))
+
+        if rng.random() < epsilon:
+            best_move = rng.choice(sorted(legal_moves))
+        game.apply_move(best_move)
+
+    winner = players.index(game.inactive_player)
+    return [position + (1 if position[5] == winner else -1,)
+            for position in positions]
+
+
+def generate_positions(games, width=7, height=7, depth=3,
+                       score_fn=improved_score, random_plies=2, epsilon=0.1,
+                       seed=0, processes=1, verbose=False):
+    """Play `games` self-play games and collect their positions.
+
+    Parameters
+    ----------
+    games : int
+        The number of games to play.
+
+    width, height : int (optional)
+        The size of the board.
+
+    depth : int (optional)
+        The alpha-beta search depth of both players.
+
+    score_fn : callable (optional)
+        The heuristic of both players; it must be picklable (a module level
+        function or a `LinearScore`) when `processes > 1`.
+
+    random_plies, epsilon : (optional)
+        See `play_selfplay_game()`.
+
+    seed : int (optional)
+        Game `i` is played from seed `seed + i`.
+
+    processes : int (optional)
+        The number of worker processes playing games in parallel.
+
+    Returns
+    -------
+    dict
+        The columns `game`, `ply`, `blocked`, `own`, `opp`, `move`,
+        `mover`, `score`, `features` and `outcome` as lists with one entry
+        per position, plus the board `width` and `height`.
+    """
+    tasks = [(seed + i, width, height, depth, score_fn, random_plies,
+              epsilon) for i in range(games)]
+    start = timeit.default_timer()
+    if processes > 1:
+        with Pool(processes) as pool:
+            results = pool.map(play_selfplay_game, tasks)
+    else:
+        results = [play_selfplay_game(task) for task in tasks]
+
+    names = ("ply", "blocked", "own", "opp", "move", "mover", "score",
+             "features", "outcome")
+    columns = {name: [] for name in ("game",) + names}
+    for game_id, positions in enumerate(results):
+        for position in positions:
+            columns["game"].append(game_id)
+            for name, value in zip(names, position):
+                columns[name].append(value)
+    columns["width"], columns["height"] = width, height
+
+    if verbose:
+        print("{} games, {} positions in {:.1f}s".format(
+            games, len(columns["game"]), timeit.default_timer() - start))
+    return columns
+
+
+def save_positions(columns, path):
+    """Write the columns returned by `generate_positions()` to a compressed
+    `.npz` file; the blocked-cell masks are stored as packed bits.
+    """
+    import numpy as np
+
+    cells = columns["width"] * columns["height"]
+    blocked = np.array([[mask >> idx & 1 for idx in range(cells)]
+                        for mask in columns["blocked"]],
+                       dtype=bool).reshape(-1, cells)
+    np.savez_compressed(
+        path,
+        width=columns["width"], height=columns["height"],
+        feature_names=np.array(FEATURES),
+        game=np.array(columns["game"], dtype=np.int32),
+        ply=np.array(columns["ply"], dtype=np.int16),
+        blocked=np.packbits(blocked, axis=1),
+        own=np.array(columns["own"], dtype=np.int16),
+        opp=np.array(columns["opp"], dtype=np.int16),
+        move=np.array(columns["move"], dtype=np.int16),
+        mover=np.array(columns["mover"], dtype=np.int8),
+        score=np.array(columns["score"], dtype=np.float32),
+        features=np.array(columns["features"],
+                          dtype=np.float32).reshape(-1, len(FEATURES)),
+        outcome=np.array(columns["outcome"], dtype=np.int8))
+
+
+def load_positions(path):
+    """Read a file written by `save_positions()`.
+
+    Returns
+    -------
+    dict
+        The arrays of the file, with `blocked` unpacked to a boolean array
+        with one column per cell.
+    """
+    import numpy as np
+
+    with np.load(path) as data:
+        columns = {name: data[name] for name in data.files}
+    if tuple(columns["feature_names"]) != FEATURES:
+        raise ValueError("{} was generated with different features".format(
+            path))
+    cells = int(columns["width"]) * int(columns["height"])
+    columns["blocked"] = np.unpackbits(
+        columns["blocked"], axis=1, count=cells).astype(bool)
+    return columns
+
+
+def fit_weights(columns, target="outcome", l2=1e-3, iterations=25):
+    """Fit the weights of a `LinearScore` to self-play positions.
+
+    Parameters
+    ----------
+    columns : dict
+        The data returned by `load_positions()` (or `generate_positions()`).
+
+    target : {"outcome", "score"} (optional)
+        Fit the probability that the side to move wins the game (logistic
+        regression by Newton's method), or the search score of the positions
+        whose score is finite (least squares).
+
+    l2 : float (optional)
+        The strength of the L2 penalty on the weights.
+
+    iterations : int (optional)
+        The maximum number of Newton steps of the logistic regression.
+
+    Returns
+    -------
+    (LinearScore, float)
+        The fitted heuristic and its accuracy: the fraction of positions
+        whose outcome it predicts (for "outcome"), or the coefficient of
+        determination (for "score").  The intercept of the fit is dropped,
+        since adding a constant does not change the choices of a search.
+    """
+    import numpy as np
+
+    if target not in ("outcome", "score"):
+        raise ValueError("Unknown target: {}".format(target))
+    x = np.asarray(columns["features"], dtype=float).reshape(
+        -1, len(FEATURES))
+    x = np.hstack([x, np.ones((len(x), 1))])
+    penalty = l2 * len(x) * np.eye(x.shape[1])
+    penalty[-1, -1] = 0.
+
+    if target == "score":
+        y = np.asarray(columns["score"], dtype=float)
+        finite = np.isfinite(y)
+        x, y = x[finite], y[finite]
+        w = np.linalg.solve(x.T @ x + penalty, x.T @ y)
+        residual = ((y - x @ w)**2).sum()
+        total = ((y - y.mean())**2).sum()
+        return LinearScore(w[:-1]), 1. - residual / total if total else 0.
+
+    y = (np.asarray(columns["outcome"]) > 0).astype(float)
+    w = np.zeros(x.shape[1])
+    for _ in range(iterations):
+        p = 1. / (1. + np.exp(-(x @ w)))
+        gradient = x.T @ (p - y) + penalty @ w
+        hessian = (x.T * (p * (1. - p))) @ x + penalty
+        step = np.linalg.solve(hessian, gradient)
+        w -= step
+        if np.abs(step).max() < 1e-8:
+            break
+    accuracy = float(((x @ w > 0) == (y > 0)).mean())
+    return LinearScore(w[:-1]), accuracy
+
+
+def main(args):
+    if args.command == "generate":
+        score_fn = (LinearScore.load(args.weights) if args.weights
+                    else improved_score)
+        columns = generate_positions(
+            args.games, args.width, args.height, args.depth, score_fn,
+            args.random_plies, args.epsilon, args.seed, args.processes,
+            verbose=True)
+        save_positions(columns, args.output)
+        print("wrote {} positions to {}".format(len(columns["game"]),
+                                                args.output))
+    else:
+        columns = load_positions(args.data)
+        score, accuracy = fit_weights(columns, args.target, args.l2)
+        print("{} ({} on {} positions: {:.3f})".format(
+            score, "accuracy" if args.target == "outcome" else "R^2",
+            len(columns["game"]), accuracy))
+        if args.output:
+            score.save(args.output, target=args.target, accuracy=accuracy)
+            print("weights written to {}".format(args.output))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate self-play positions and tune linear "
+                    "heuristic weights on them.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="play self-play games")
+    generate.add_argument("-n", "--games", type=int, default=100)
+    generate.add_argument("-p", "--processes", type=int, default=1,
+                          help="number of worker processes playing games")
+    generate.add_argument("--width", type=int, default=7)
+    generate.add_argument("--height", type=int, default=7)
+    generate.add_argument("--depth", type=int, default=3,
+                          help="alpha-beta search depth of both players")
+    generate.add_argument("--random-plies", type=int, default=2,
+                          help="number of random opening moves")
+    generate.add_argument("--epsilon", type=float, default=0.1,
+                          help="probability of a random move after the "
+                               "opening")
+    generate.add_argument("--seed", type=int, default=0)
+    generate.add_argument("--weights", metavar="PATH",
+                          help="play with a tuned LinearScore instead of "
+                               "improved_score")
+    generate.add_argument("--output", default="selfplay.npz")
+
+    tune = commands.add_parser("tune", help="fit heuristic weights")
+    tune.add_argument("data", help="a file written by the generate command")
+    tune.add_argument("--target", choices=("outcome", "score"),
+                      default="outcome")
+    tune.add_argument("--l2", type=float, default=1e-3,
+                      help="strength of the L2 penalty on the weights")
+    tune.add_argument("--output", metavar="PATH",
+                      help="write the weights to PATH as JSON")
+    main(parser.parse_args())
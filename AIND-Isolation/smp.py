@@ -0,0 +1,349 @@
+"""Lazy-SMP parallel alpha-beta search for Isolation agents.
+
+`LazySMPPlayer` runs the iterative deepening search of `AlphaBetaPlayer`
+in the calling process and, at the same time, in a pool of helper
+processes. Every process searches the same root position, but the
+processes share a single transposition table in shared memory, so each one
+mostly reuses the results of the others and they drift apart into
+different parts of the tree (helped by the random move order of the
+boards). When the time is up, the move of the deepest completed iteration
+of any process is played.
+
+`PonderWorker` uses the same helper processes for pondering: while the
+opponent thinks, a helper process searches the position expected after the
+opponent's reply and stores its results in the player's (shared) table.
+
+The shared table stores each entry as three 64-bit words -- a check word,
+the packed entry data and the value -- and is written without locks: the
+check word is the XOR of the key with the other two words, so an entry
+that was torn by concurrent writes fails to match its key and is treated
+as missing.
+"""
+import ctypes
+import multiprocessing
+import os
+import random
+import struct
+import timeit
+
+from game_agent import AlphaBetaPlayer, custom_score
+from isolation import swap_players
+from transposition import TranspositionTable
+
+# Placeholders for the players of boards sent to the helper processes
+ROOT = "smp-root"
+OPPONENT = "smp-opponent"
+
+_DOUBLE = struct.Struct("d")
+_WORD = struct.Struct("Q")
+
+# Layout of the packed data word of a shared table entry
+_DEPTH_MASK = 0xFFFF
+_FLAG_SHIFT = 16
+_MOVE_SHIFT = 18
+_GENERATION_SHIFT = 34
+_GENERATION_MASK = (1 << 29) - 1
+_VALID = 1 << 63
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """A `TranspositionTable` in shared memory, visible to every process
+    forked after it was created (or that receives it as an argument when
+    the process is started).
+
+    Parameters
+    ----------
+    size : int (optional)
+        The number of slots in the table; rounded up to a power of two.
+    """
+
+    def __init__(self, size=2**16):
+        self.size = 1 << max(0, int(size) - 1).bit_length()
+        self._mask = self.size - 1
+        self._slots = multiprocessing.RawArray("Q", 3 * self.size)
+        self.generation = 0
+
+    def clear(self):
+        """Remove every entry from the table. """
+        ctypes.memset(self._slots, 0, ctypes.sizeof(self._slots))
+
+    def probe(self, key):
+        """Return the entry stored for the position with hash `key`.
+
+        Returns
+        -------
+        tuple or None
+            A `(key, depth, flag, value, move, generation)` tuple, or None if
+            the position is not in the table.
+        """
+        slot = 3 * (key & self._mask)
+        check, data, bits = self._slots[slot:slot + 3]
+        if not data & _VALID or check ^ data ^ bits != key:
+            return None
+        move = data >> _MOVE_SHIFT & 0xFFFF
+        if move:
+            move = ((move - 1) >> 8, (move - 1) & 0xFF)
+        else:
+            move = None
+        return (key, data & _DEPTH_MASK, data >> _FLAG_SHIFT & 3,
+                _DOUBLE.unpack(_WORD.pack(bits))[0], move,
+                data >> _GENERATION_SHIFT & _GENERATION_MASK)
+
+    def store(self, key, depth, flag, value, move):
+        """Record the result of searching the position with hash `key` to
+        `depth` remaining plies, subject to the replacement policy of
+        `TranspositionTable`.
+        """
+        slot = 3 * (key & self._mask)
+        generation = self.generation & _GENERATION_MASK
+        depth = max(0, min(depth, _DEPTH_MASK))
+        old = self._slots[slot + 1]
+        if (old & _VALID and
+                old >> _GENERATION_SHIFT & _GENERATION_MASK == generation and
+                depth < old & _DEPTH_MASK):
+            return
+        packed_move = 0 if move is None else (move[0] << 8 | move[1]) + 1
+        data = (_VALID | generation << _GENERATION_SHIFT |
+                packed_move << _MOVE_SHIFT | flag << _FLAG_SHIFT | depth)
+        bits = _WORD.unpack(_DOUBLE.pack(value))[0]
+        self._slots[slot + 1] = data
+        self._slots[slot + 2] = bits
+        self._slots[slot] = key ^ data ^ bits
+
+    def __len__(self):
+        return sum(1 for data in self._slots[1::3] if data & _VALID)
+
+
+# The search agent of each helper process, and the flag that stops the
+# search of a pondering helper process
+_worker = None
+_stop = None
+
+
+def worker_options(player):
+    """Return the arguments of `_init_worker()` that give the agents of the
+    helper processes the search options of `player` and its (shared)
+    transposition table.
+    """
+    return (player.tt, player.score, player.move_ordering,
+            player.symmetry_plies, player.check_interval, player.driver,
+            player.aspiration_window, player.extend_moves,
+            player.extension_plies, player.lmr_moves, player.lmr_depth)
+
+
+def _init_worker(tt, score_fn, move_ordering, symmetry_plies,
+                 check_interval, driver, aspiration_window, extend_moves,
+                 extension_plies, lmr_moves, lmr_depth, stop=None):
+    """Create the search agent of a helper process. """
+    global _worker, _stop
+    _stop = stop
+    random.seed(os.getpid())
+    _worker = AlphaBetaPlayer(score_fn=score_fn, tt_size=1,
+                              move_ordering=move_ordering,
+                              symmetry_plies=symmetry_plies,
+                              check_interval=check_interval, driver=driver,
+                              aspiration_window=aspiration_window,
+                              extend_moves=extend_moves,
+                              extension_plies=extension_plies,
+                              lmr_moves=lmr_moves, lmr_depth=lmr_depth)
+    _worker.tt = tt
+
+
+def _search(task):
+    """Run iterative deepening in a helper process until `deadline`.
+
+    Returns
+    -------
+    (int, (int, int))
+        The depth of the deepest completed iteration and its best move.
+    """
+    game, deadline, generation = task
+    game = swap_players(game, _worker, OPPONENT)
+    _worker.time_left = lambda: 1000. * (deadline - timeit.default_timer())
+    _worker.new_search()
+    _worker.tt.generation = generation
+    move = _worker.iterative_deepening(game)
+    return len(_worker.iteration_moves), move
+
+
+def _ponder(task):
+    """Run iterative deepening in a helper process until `deadline`, or
+    until the stop flag is set.
+    """
+    game, deadline, generation = task
+    game = swap_players(game, _worker, OPPONENT)
+    stop = _stop
+    _worker.time_left = lambda: (float("-inf") if stop.value else 1000. * (
+        deadline - timeit.default_timer()))
+    _worker.new_search()
+    _worker.tt.generation = generation
+    _worker.iterative_deepening(game)
+
+
+class PonderWorker:
+    """A helper process that ponders for an `AlphaBetaPlayer`.
+
+    The player's transposition table is replaced by a shared one, which the
+    helper fills with the results of searching the positions it is given.
+
+    Parameters
+    ----------
+    player : `game_agent.AlphaBetaPlayer`
+        The player; the helper searches with the same options.
+    """
+
+    def __init__(self, player):
+        player.tt = SharedTranspositionTable(player.tt.size)
+        self.stop_flag = multiprocessing.RawValue("b", 0)
+        self._pool = multiprocessing.Pool(
+            1, initializer=_init_worker,
+            initargs=worker_options(player) + (self.stop_flag,))
+        self._result = None
+
+    @property
+    def pondering(self):
+        """True while the helper is searching. """
+        return self._result is not None and not self._result.ready()
+
+    def start(self, game, limit, generation):
+        """Search `game` for at most `limit` milliseconds, storing the
+        results as entries of search `generation`.
+        """
+        self.stop()
+        deadline = timeit.default_timer() + limit / 1000.
+        self._result = self._pool.apply_async(
+            _ponder, ((swap_players(game, ROOT, OPPONENT), deadline,
+                       generation),))
+
+    def stop(self):
+        """Stop the search, if any, and wait for the helper to finish it. """
+        if self._result is not None:
+            self.stop_flag.value = 1
+            self._result.wait()
+            self._result = None
+            self.stop_flag.value = 0
+
+    def close(self):
+        """Stop the helper process. """
+        self._pool.terminate()
+        self._pool.join()
+        self._result = None
+
+
+class LazySMPPlayer(AlphaBetaPlayer):
+    """Game-playing agent that runs the iterative deepening alpha-beta search
+    of `AlphaBetaPlayer` in several processes sharing one transposition
+    table.
+
+    The helper processes are started on the first call to get_move() and
+    kept until `close()`. Processes that cannot have children (e.g., the
+    workers of a parallel tournament) search on their own instead.
+
+    Parameters
+    ----------
+    search_depth, score_fn, timeout, tt_size, move_ordering, book, \
+endgame_nodes, stats, symmetry_plies, check_interval, driver, \
+aspiration_window, eval_cache, extend_moves, extension_plies, lmr_moves, \
+lmr_depth
+        See `AlphaBetaPlayer`; a transposition table is always used, and the
+        statistics only count the search in the calling process. Each
+        process keeps its own evaluation cache.
+
+    workers : int (optional)
+        The number of helper processes; defaults to one less than the number
+        of CPUs.
+
+    margin : float (optional)
+        The helper processes stop searching this many milliseconds before
+        the caller, so their results arrive in time to be used.
+    """
+
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10.,
+                 tt_size=2**16, move_ordering=True, book=None,
+                 endgame_nodes=None, workers=None, margin=5., stats=False,
+                 symmetry_plies=0, check_interval=1, driver="alphabeta",
+                 aspiration_window=1., eval_cache=None, extend_moves=0,
+                 extension_plies=4, lmr_moves=None, lmr_depth=3):
+        super().__init__(search_depth, score_fn, timeout, tt_size,
+                         move_ordering, book, endgame_nodes, stats=stats,
+                         symmetry_plies=symmetry_plies,
+                         check_interval=check_interval, driver=driver,
+                         aspiration_window=aspiration_window,
+                         eval_cache=eval_cache, extend_moves=extend_moves,
+                         extension_plies=extension_plies,
+                         lmr_moves=lmr_moves, lmr_depth=lmr_depth)
+        if workers is None:
+            workers = max(1, (os.cpu_count() or 1) - 1)
+        self.workers = workers
+        self.margin = margin
+
+        # Depth of the deepest completed iteration of each process during
+        # the last search (this process first)
+        self.depths = []
+        self._pool = None
+
+    def __getstate__(self):
+        # the pool and the shared table stay with the process that made them
+        state = super().__getstate__()
+        if self._pool is not None:
+            state["_pool"] = None
+            state["tt"] = TranspositionTable(self.tt.size)
+        return state
+
+    def start_workers(self):
+        """Start the helper processes if needed; returns False if this
+        process cannot start them.
+        """
+        if self._pool is not None:
+            return True
+        if self.workers < 1 or multiprocessing.current_process().daemon:
+            return False
+        self.tt = SharedTranspositionTable(self.tt.size)
+        self._pool = multiprocessing.Pool(
+            self.workers, initializer=_init_worker,
+            initargs=worker_options(self))
+        return True
+
+    def close(self):
+        """Stop the helper processes. """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+            self.tt = TranspositionTable(self.tt.size)
+
+    def iterative_deepening(self, game):
+        """Search `game` in this process and every helper process until the
+        timer expires.
+
+        Returns
+        -------
+        (int, int)
+            The best move of the deepest iteration completed by any process;
+            (-1, -1) if no iteration completed.
+        """
+        if not self.start_workers():
+            best_move = super().iterative_deepening(game)
+            self.depths = [len(self.iteration_moves)]
+            return best_move
+
+        deadline = (timeit.default_timer() +
+                    (self.time_left() - self.margin) / 1000.)
+        task = (swap_players(game, ROOT, OPPONENT), deadline,
+                self.tt.generation)
+        results = [self._pool.apply_async(_search, (task,))
+                   for _ in range(self.workers)]
+
+        best_move = super().iterative_deepening(game)
+        self.depths = [len(self.iteration_moves)]
+        best_depth = self.depths[0]
+        for result in results:
+            wait = (self.time_left() - self.TIMER_THRESHOLD / 2) / 1000.
+            try:
+                depth, move = result.get(max(0., wait))
+            except multiprocessing.TimeoutError:
+                continue
+            self.depths.append(depth)
+            if depth > best_depth:
+                best_depth, best_move = depth, move
+        return best_move
@@ -0,0 +1,138 @@
+"""Adaptive time management for iterative deepening search.
+
+Without a time manager, `AlphaBetaPlayer` starts a new iteration whenever
+the timer has not expired yet, and returns when the timer runs below a
+fixed threshold in the middle of an iteration.  A `TimeManager` instead
+
+- predicts the time of the next iteration from the growth of the previous
+  ones, and does not start an iteration that cannot finish in time;
+- stops deepening after `soft_fraction` of the available time unless the
+  position is critical (the best move changed in the last iteration), so
+  that unstable positions get the full time of the move;
+- calibrates the safety margin kept on the clock from the measured cost of
+  calling the timer and the measured delay between the timer check that
+  aborts a search and the return from get_move().
+
+Isolation gives every move its own time limit, so the time saved in stable
+positions cannot be spent on later moves; it is left to pondering, or to
+the other processes of a parallel tournament.
+"""
+
+
+class TimeManager:
+    """Decide when iterative deepening should stop.
+
+    Parameters
+    ----------
+    min_margin : float (optional)
+        The smallest safety margin (in milliseconds) ever used.
+
+    safety : float (optional)
+        The margin is this multiple of the longest return delay measured
+        over the last `samples` searches that ran out of time.
+
+    soft_fraction : float (optional)
+        In positions that are not critical, no iteration is started after
+        this fraction of the available time.
+
+    samples : int (optional)
+        The number of recent return delays the margin is calibrated from.
+
+    Attributes
+    ----------
+    margin : float
+        The safety margin (in milliseconds) of the current search, used as
+        the `TIMER_THRESHOLD` of the player; None until the first search,
+        when the player's own threshold is used as the initial margin.
+    """
+
+    def __init__(self, min_margin=5., safety=2., soft_fraction=0.5,
+                 samples=16):
+        self.min_margin = min_margin
+        self.safety = safety
+        self.soft_fraction = soft_fraction
+        self.samples = samples
+        self.margin = None
+        self.timer_overhead = 0.
+        self.delays = []
+
+        # Number of iterations not started because they would not finish,
+        # and of searches stopped early in stable positions
+        self.skipped = 0
+        self.soft_stops = 0
+
+        self._start = 0.
+        self._last = 0.
+        self._iteration_times = []
+
+    def start(self, time_left, margin):
+        """Start timing a search and return the safety margin to use.
+
+        Parameters
+        ----------
+        time_left : callable
+            The timer of the current move.
+
+        margin : float
+            The initial margin, used until a delay has been measured.
+        """
+        # measure the cost of a timer call, which is paid at every node
+        first = time_left()
+        for _ in range(4):
+            last = time_left()
+        self.timer_overhead = max(0., (first - last) / 4)
+
+        if self.margin is None:
+            self.margin = margin
+        if self.delays:
+            self.margin = max(self.min_margin,
+                              self.safety * max(self.delays) +
+                              self.timer_overhead)
+        self._start = self._last = last
+        self._iteration_times = []
+        return self.margin
+
+    def next_iteration(self, remaining, iteration_moves):
+        """Decide whether to start another iteration.
+
+        Parameters
+        ----------
+        remaining : float
+            The number of milliseconds left in the move.
+
+        iteration_moves : list
+            The best move of each completed iteration of this search.
+
+        Returns
+        -------
+        bool
+            True if the next iteration should be searched.
+        """
+        if iteration_moves:
+            self._iteration_times.append(self._last - remaining)
+        self._last = remaining
+        if len(self._iteration_times) < 2:
+            return True
+
+        available = self._start - self.margin
+        elapsed = self._start - remaining
+        previous, last = self._iteration_times[-2:]
+        growth = max(1., last / previous) if previous > 0 else 1.
+        if elapsed + last * growth > available:
+            self.skipped += 1
+            return False
+
+        critical = iteration_moves[-1] != iteration_moves[-2]
+        if not critical and elapsed > self.soft_fraction * available:
+            self.soft_stops += 1
+            return False
+        return True
+
+    def finish(self, remaining, timed_out):
+        """Record the end of a search; `timed_out` is True if the search was
+        aborted by the timer, in which case the time since the aborting
+        timer check is measured.
+        """
+        if timed_out:
+            self.delays.append(max(0., self.margin - remaining))
+            del self.delays[:-self.samples]
@@ -11,19 +11,30 @@ players, and the players play each match twice -- once as the first player and
 once as the second player.  Randomizing the openings and switching the player
 order corrects for imbalances due to both starting position and initiative.
 """
+import argparse
 import itertools
+import json
 import random
+import time
+import timeit
 import warnings
 
 from collections import namedtuple
+from multiprocessing import Pool
 
-from isolation import Board
+from competition_agent import CustomPlayer
+from game_record import GameRecord, RecordWriter
+from isolation import BitBoard
+from ratings import SPRT, elo_confidence_interval, update_elo
+from results_db import ResultsDB
+from search_stats import SearchStats
 from sample_players import (RandomPlayer, open_move_score,
                             improved_score, center_score)
 from game_agent import *
 
 NUM_MATCHES = 10  # number of matches against each opponent
 TIME_LIMIT = 150  # number of milliseconds before timeout
+BOARD_CLASS = BitBoard  # isolation.Board or the faster isolation.BitBoard
 
 DESCRIPTION = """
 This script evaluates the performance of the custom_score evaluation
@@ -36,36 +47,137 @@ game_agent.py.
 Agent = namedtuple("Agent", ["player", "name"])
 
 
-def play_round(cpu_agent, test_agents, win_counts, num_matches):
+def opening_moves(seed):
+    """Choose the random opening move and response shared by every game of
+    one match; the same seed always produces the same opening.
+    """
+    rng = random.Random(seed)
+    game = BOARD_CLASS("Player1", "Player2")
+    moves = []
+    for _ in range(2):
+        move = rng.choice(sorted(game.get_legal_moves()))
+        game.apply_move(move)
+        moves.append(move)
+    return moves
+
+
+def play_game(task):
+    """Play one game from its opening and return the index (0 or 1) of the
+    winning player, the termination reason, the search statistics of each
+    player in this game (None for players that do not collect them), and
+    every move of the game including the opening.
+
+    The task is a tuple `(player_1, player_2, opening, seed, timer)`; it only
+    holds picklable values so that games can be played in worker processes.
+    """
+    player_1, player_2, opening, seed, timer = task
+    random.seed(seed)
+    players = (player_1, player_2)
+    for player in players:
+        if getattr(player, "stats", None) is not None:
+            player.stats = SearchStats()
+    game = BOARD_CLASS(player_1, player_2)
+    for move in opening:
+        game.apply_move(move)
+    winner, history, termination = game.play(time_limit=TIME_LIMIT,
+                                             timer=timer)
+    # a pondering player would otherwise keep searching into the next game
+    for player in players:
+        if hasattr(player, "stop_pondering"):
+            player.stop_pondering()
+    stats = tuple(getattr(player, "stats", None) for player in players)
+    moves = [tuple(move) for move in opening] + [tuple(move)
+                                                 for move in history]
+    return int(winner is not player_1), termination, stats, moves
+
+
+def collect_stats(stats, task, game_stats):
+    """Add the statistics of one game to the per-player totals in `stats`.
+    """
+    if stats is None:
+        return
+    for player, player_stats in zip(task[:2], game_stats):
+        if player_stats is not None:
+            stats.setdefault(player, SearchStats()).merge(player_stats)
+
+
+def play_tasks(tasks, pool=None, db=None, recorder=None):
+    """Play the game of each task (see `play_game()`), in parallel if a
+    `multiprocessing.Pool` is given, and return the results in task order.
+
+    If a `results_db.ResultsDB` is given, games already stored in it are not
+    played again (and have no search statistics or moves), and the results
+    of the other games are stored.
+
+    If a `recorder` is given, it is called as `recorder(task, result)` with
+    every game that is played.
+    """
+    results = [None] * len(tasks)
+    if db is not None:
+        for idx, task in enumerate(tasks):
+            stored = db.lookup(task)
+            if stored is not None:
+                results[idx] = tuple(stored) + ((None, None), None)
+    todo = [idx for idx, result in enumerate(results) if result is None]
+    todo_tasks = [tasks[idx] for idx in todo]
+    if pool is None:
+        played = map(play_game, todo_tasks)
+    else:
+        played = pool.map(play_game, todo_tasks, chunksize=1)
+    for idx, result in zip(todo, played):
+        results[idx] = result
+        if db is not None:
+            db.record(tasks[idx], result[0], result[1])
+        if recorder is not None:
+            recorder(tasks[idx], result)
+    return results
+
+
+def play_round(cpu_agent, test_agents, win_counts, num_matches, seed=None,
+               pool=None, stats=None, db=None, recorder=None):
     """Compare the test agents to the cpu agent in "fair" matches.
 
     "Fair" matches use random starting locations and force the agents to
     play as both first and second player to control for advantages resulting
     from choosing better opening moves or having first initiative to move.
-    """
-    timeout_count = 0
-    forfeit_count = 0
-    for _ in range(num_matches):
 
-        games = sum([[Board(cpu_agent.player, agent.player),
-                      Board(agent.player, cpu_agent.player)]
-                     for agent in test_agents], [])
+    The opening of each match (and the random seed of each game) is derived
+    from `seed`, so a round is reproducible.  If a `multiprocessing.Pool` is
+    given, the games are played in parallel and each player is timed by the
+    CPU time of its worker process, so that a loaded machine does not cause
+    spurious timeouts.
 
-        # initialize all games with a random move and response
-        for _ in range(2):
-            move = random.choice(games[0].get_legal_moves())
-            for game in games:
-                game.apply_move(move)
+    If `stats` is a dictionary, the search statistics of every player are
+    added to `stats[player]`. See `play_tasks()` for `db` and `recorder`.
+    """
+    if seed is None:
+        seed = random.randrange(2**32)
+    timer = timeit.default_timer if pool is None else time.process_time
 
-        # play all games and tally the results
-        for game in games:
-            winner, _, termination = game.play(time_limit=TIME_LIMIT)
-            win_counts[winner] += 1
+    tasks = []
+    for match in range(num_matches):
+        match_seed = "{}-{}".format(seed, match)
+        opening = opening_moves(match_seed)
+        players = sum([[(cpu_agent.player, agent.player),
+                        (agent.player, cpu_agent.player)]
+                       for agent in test_agents], [])
+        tasks.extend((player_1, player_2, opening,
+                      "{}-{}".format(match_seed, game_idx), timer)
+                     for game_idx, (player_1, player_2) in enumerate(players))
+    results = play_tasks(tasks, pool, db, recorder)
 
-            if termination == "timeout":
-                timeout_count += 1
-            elif termination == "forfeit":
-                forfeit_count += 1
+    # tally the results
+    timeout_count = 0
+    forfeit_count = 0
+    for task, (winner_idx, termination, game_stats, _) in zip(tasks,
+                                                              results):
+        win_counts[task[winner_idx]] += 1
+        collect_stats(stats, task, game_stats)
+
+        if termination == "timeout":
+            timeout_count += 1
+        elif termination == "forfeit":
+            forfeit_count += 1
 
     return timeout_count, forfeit_count
 
@@ -76,8 +188,18 @@ def update(total_wins, wins):
     return total_wins
 
 
-def play_matches(cpu_agents, test_agents, num_matches):
-    """Play matches between the test agent and each cpu_agent individually. """
+def play_matches(cpu_agents, test_agents, num_matches, seed=None, processes=1,
+                 stats=None, db=None, recorder=None):
+    """Play matches between the test agent and each cpu_agent individually.
+
+    With `processes` greater than one, the games of each round are spread
+    over a pool of that many worker processes. See `play_round()` for
+    `stats`, `db` and `recorder`.
+    """
+    pool = Pool(processes) if processes > 1 else None
+    if seed is None:
+        seed = random.randrange(2**32)
+
     total_wins = {agent.player: 0 for agent in test_agents}
     total_timeouts = 0.
     total_forfeits = 0.
@@ -94,7 +216,9 @@ def play_matches(cpu_agents, test_agents, num_matches):
 
         print("{!s:^9}{:^13}".format(idx + 1, agent.name), end="", flush=True)
 
-        counts = play_round(agent, test_agents, wins, num_matches)
+        counts = play_round(agent, test_agents, wins, num_matches,
+                            seed="{}-{}".format(seed, idx), pool=pool,
+                            stats=stats, db=db, recorder=recorder)
         total_timeouts += counts[0]
         total_forfeits += counts[1]
         total_wins = update(total_wins, wins)
@@ -107,6 +231,10 @@ def play_matches(cpu_agents, test_agents, num_matches):
             ) for i in range(0, len(round_totals), 2)
         ]))
 
+    if pool is not None:
+        pool.close()
+        pool.join()
+
     print("-" * 74)
     print('{:^9}{:^13}'.format("", "Win Rate:") +
           ''.join([
@@ -125,7 +253,103 @@ def play_matches(cpu_agents, test_agents, num_matches):
                "legal moves available to play.\n").format(total_forfeits))
 
 
-def main():
+def play_rated_matches(cpu_agents, test_agents, max_matches, elo0=0.,
+                       elo1=50., alpha=0.05, beta=0.05, seed=None,
+                       processes=1, stats=None, db=None, recorder=None):
+    """Play each test agent against each cpu agent until a sequential
+    probability ratio test decides whether the test agent is at least `elo1`
+    Elo stronger (H1) or at most `elo0` Elo stronger (H0) than its opponent,
+    or until `max_matches` matches (two games each) have been played.
+
+    Every game also updates a running Elo rating of all agents.  Games are
+    played in batches of one match per worker process, so with a pool the
+    test may run up to one batch past the point where it was decided.
+    See `play_round()` for `stats`, `db` and `recorder`.
+    """
+    pool = Pool(processes) if processes > 1 else None
+    timer = timeit.default_timer if pool is None else time.process_time
+    if seed is None:
+        seed = random.randrange(2**32)
+
+    ratings = {}
+    timeout_count = 0
+    forfeit_count = 0
+
+    print("\n{:^13}{:^13}{:^8}{:^11}{:^22}{:^9}".format(
+        "Agent", "Opponent", "Games", "Won | Lost", "Elo diff (95% CI)",
+        "SPRT"))
+    for test_agent, cpu_agent in itertools.product(test_agents, cpu_agents):
+        sprt = SPRT(elo0, elo1, alpha, beta)
+        match = 0
+        while match < max_matches and sprt.status() is None:
+            tasks = []
+            for _ in range(min(processes, max_matches - match)):
+                match_seed = "{}-{}-{}-{}".format(seed, test_agent.name,
+                                                  cpu_agent.name, match)
+                opening = opening_moves(match_seed)
+                tasks.append((cpu_agent.player, test_agent.player, opening,
+                              match_seed + "-0", timer))
+                tasks.append((test_agent.player, cpu_agent.player, opening,
+                              match_seed + "-1", timer))
+                match += 1
+            results = play_tasks(tasks, pool, db, recorder)
+
+            for task, (winner_idx, termination, game_stats, _) in zip(
+                    tasks, results):
+                collect_stats(stats, task, game_stats)
+                winner, loser = task[winner_idx], task[1 - winner_idx]
+                update_elo(ratings, winner, loser)
+                sprt.update(winner is test_agent.player)
+
+                if termination == "timeout":
+                    timeout_count += 1
+                elif termination == "forfeit":
+                    forfeit_count += 1
+
+        diff, lower, upper = elo_confidence_interval(sprt.wins, sprt.losses)
+        print("{:^13}{:^13}{:^8}{:^11}{:^22}{:^9}".format(
+            test_agent.name, cpu_agent.name, sprt.wins + sprt.losses,
+            "{} | {}".format(sprt.wins, sprt.losses),
+            "{:+.0f} ({:+.0f}, {:+.0f})".format(diff, lower, upper),
+            sprt.status() or "-"))
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    print("-" * 76)
+    print("{:^13}{:^13}".format("Agent", "Elo rating"))
+    agents = {agent.player: agent.name for agent in cpu_agents + test_agents}
+    for player, rating in sorted(ratings.items(), key=lambda x: -x[1]):
+        print("{:^13}{:^13.0f}".format(agents[player], rating))
+
+    if timeout_count:
+        print(("\nThere were {} timeouts during the tournament -- make sure " +
+               "your agent handles search timeout correctly, and consider " +
+               "increasing the timeout margin for your agent.\n").format(
+            timeout_count))
+    if forfeit_count:
+        print(("\nYour agents forfeited {} games while there were still " +
+               "legal moves available to play.\n").format(forfeit_count))
+
+
+def print_report(db):
+    """Print the aggregate results of the games stored in a results
+    database, for each version of each agent.
+    """
+    print("\n{:^13}{:^18}{:^13}{:^18}{:^11}{:^9}{:^10}".format(
+        "Agent", "Version", "Opponent", "Version", "Won | Lost", "Win %",
+        "Timeouts"))
+    for row in db.summary():
+        games = row["won"] + row["lost"]
+        print("{:^13}{:^18}{:^13}{:^18}{:^11}{:^9.1f}{:^10}".format(
+            row["agent"], row["version"], row["opponent"],
+            row["opponent_version"],
+            "{} | {}".format(row["won"], row["lost"]),
+            100. * row["won"] / games, row["timeouts"]))
+
+
+def main(args):
     # Define two agents to compare -- these agents will play from the same
     # starting position against the same adversaries in the tournament
     test_agents = [
@@ -134,6 +358,8 @@ def main():
         Agent(AlphaBetaPlayer(score_fn=custom_score_3), "Manhattan"),
         Agent(AlphaBetaPlayer(score_fn=custom_score), "AvoidEdges")
     ]
+    if args.mcts:
+        test_agents.append(Agent(CustomPlayer(timeout=10.), "MCTS"))
 
     # Define a collection of agents to compete against the test agents
     cpu_agents = [
@@ -146,12 +372,120 @@ def main():
         Agent(AlphaBetaPlayer(score_fn=improved_score), "AB_Improved"),
     ]
 
+    db = None
+    if args.db:
+        # parallel games are timed by the CPU time of their worker process
+        # (see play_round())
+        timer = "process_time" if args.processes > 1 else "default_timer"
+        db = ResultsDB(args.db, settings="{} 7x7 {}ms {}".format(
+            BOARD_CLASS.__name__, TIME_LIMIT, timer))
+        if args.report:
+            print_report(db)
+            db.close()
+            return
+        for agent in cpu_agents + test_agents:
+            db.register(agent.player, agent.name)
+        if args.seed is None:
+            # stored games are only found again from the same openings
+            args.seed = 0
+
+    writer = recorder = None
+    if args.record:
+        writer = RecordWriter(args.record)
+        names = {agent.player: agent.name
+                 for agent in cpu_agents + test_agents}
+
+        def recorder(task, result):
+            winner_idx, termination, _, moves = result
+            writer.write(GameRecord(7, 7, names[task[0]], names[task[1]],
+                                    moves, winner_idx, termination))
+
+    stats = None
+    if args.stats_json:
+        stats = {}
+        for agent in cpu_agents + test_agents:
+            if hasattr(agent.player, "stats"):
+                agent.player.stats = SearchStats()
+
     print(DESCRIPTION)
     print("{:^74}".format("*************************"))
     print("{:^74}".format("Playing Matches"))
     print("{:^74}".format("*************************"))
-    play_matches(cpu_agents, test_agents, NUM_MATCHES)
+    if args.sprt:
+        play_rated_matches(cpu_agents, test_agents, args.max_matches,
+                           elo0=args.elo0, elo1=args.elo1, alpha=args.alpha,
+                           beta=args.beta, seed=args.seed,
+                           processes=args.processes, stats=stats, db=db,
+                           recorder=recorder)
+    else:
+        play_matches(cpu_agents, test_agents, args.num_matches,
+                     seed=args.seed, processes=args.processes, stats=stats,
+                     db=db, recorder=recorder)
+
+    if db is not None:
+        print("\n{} games were found in {} and {} were played.".format(
+            db.hits, args.db, db.misses))
+        db.close()
+
+    if writer is not None:
+        writer.close()
+        print("\n{} games were recorded in {}".format(writer.count,
+                                                     args.record))
+
+    if stats is not None:
+        # the same agent name can appear in both groups
+        report = {group: {agent.name: stats[agent.player].to_dict()
+                          for agent in agents if agent.player in stats}
+                  for group, agents in (("test_agents", test_agents),
+                                        ("cpu_agents", cpu_agents))}
+        with open(args.stats_json, "w") as f:
+            json.dump(report, f, indent=2)
+        print("\nSearch statistics written to {}".format(args.stats_json))
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument("-n", "--num-matches", type=int, default=NUM_MATCHES,
+                        help="number of matches against each opponent")
+    parser.add_argument("-p", "--processes", type=int, default=1,
+                        help="number of worker processes used to play games "
+                             "in parallel (each player is then timed by the "
+                             "CPU time of its own process)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed for the random openings of every match")
+    parser.add_argument("--sprt", action="store_true",
+                        help="play each pairing only until a sequential "
+                             "probability ratio test decides it, and report "
+                             "Elo ratings instead of win rates")
+    parser.add_argument("--max-matches", type=int, default=200,
+                        help="maximum number of matches per pairing with "
+                             "--sprt")
+    parser.add_argument("--elo0", type=float, default=0.,
+                        help="Elo difference of the SPRT null hypothesis")
+    parser.add_argument("--elo1", type=float, default=50.,
+                        help="Elo difference of the SPRT alternative "
+                             "hypothesis")
+    parser.add_argument("--alpha", type=float, default=0.05,
+                        help="SPRT false positive rate")
+    parser.add_argument("--beta", type=float, default=0.05,
+                        help="SPRT false negative rate")
+    parser.add_argument("--stats-json", metavar="PATH",
+                        help="collect search statistics (nodes, evaluations, "
+                             "cutoffs, depth, branching factor, time per "
+                             "iteration) for every agent and write them to "
+                             "PATH as JSON")
+    parser.add_argument("--db", metavar="PATH",
+                        help="store every game in the SQLite database PATH "
+                             "and only play the games that are not stored "
+                             "yet for the current version of each agent "
+                             "(with --seed, or seed 0 by default)")
+    parser.add_argument("--report", action="store_true",
+                        help="print the results of all the games stored in "
+                             "--db instead of playing")
+    parser.add_argument("--record", metavar="PATH",
+                        help="append every game played to the game record "
+                             "file PATH (see game_record.py)")
+    parser.add_argument("--mcts", action="store_true",
+                        help="add the Monte Carlo tree search agent from "
+                             "competition_agent.py to the test agents")
+    main(parser.parse_args())
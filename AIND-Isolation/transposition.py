@@ -0,0 +1,189 @@
+"""Bounded transposition table for the alpha-beta search agents, and a
+bounded cache of heuristic evaluations.
+
+Positions are identified by the incremental Zobrist hash returned by
+`isolation.Board.hash()`, so a lookup costs a single list index no matter
+how many cells are blocked.  Each entry records the remaining search depth
+the position was searched to, the value found, whether that value is exact
+or only a bound (because of an alpha-beta cutoff), and the best move.
+
+Values are stored from the point of view of the searching agent, so an
+agent that plays both sides (e.g., in a tournament) toggles `SIDE_KEY` into
+the keys of the positions it searches as the second player.
+"""
+import random
+
+from collections import OrderedDict
+
+# Bound types stored with each value
+EXACT = 0
+LOWER = 1  # the search failed high; the true value is >= the stored value
+UPPER = 2  # the search failed low; the true value is <= the stored value
+
+# Field offsets of the entry tuples returned by TranspositionTable.probe()
+KEY, DEPTH, FLAG, VALUE, MOVE, GENERATION = range(6)
+
+# Toggled into the position hash when the searching agent is the second
+# player (the keys of both players then never match)
+SIDE_KEY = random.Random("isolation-side").getrandbits(64)
+
+
+def bound_type(value, alpha, beta):
+    """Classify a search result against the window it was searched with. """
+    if value <= alpha:
+        return UPPER
+    if value >= beta:
+        return LOWER
+    return EXACT
+
+
+class TranspositionTable:
+    """Fixed-size hash table of search results indexed by position hash.
+
+    The table has a fixed number of slots, so its memory use is bounded.
+    When two positions map to the same slot, the new result replaces the
+    stored one if the stored entry was written during an earlier search
+    (see `new_search()`) or was searched to the same or a lower depth;
+    otherwise the deeper (and more expensive) result is kept.
+
+    Parameters
+    ----------
+    size : int (optional)
+        The number of slots in the table; rounded up to a power of two.
+    """
+
+    def __init__(self, size=2**16):
+        self.size = 1 << max(0, int(size) - 1).bit_length()
+        self._mask = self.size - 1
+        self._entries = [None] * self.size
+        self.generation = 0
+
+    def new_search(self):
+        """Mark the start of a new search; entries stored by earlier searches
+        remain available but are replaced first.
+        """
+        self.generation += 1
+
+    def clear(self):
+        """Remove every entry from the table. """
+        self._entries = [None] * self.size
+
+    def probe(self, key):
+        """Return the entry stored for the position with hash `key`.
+
+        Returns
+        -------
+        tuple or None
+            A `(key, depth, flag, value, move, generation)` tuple, or None if
+            the position is not in the table.
+        """
+        entry = self._entries[key & self._mask]
+        if entry is not None and entry[KEY] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, flag, value, move):
+        """Record the result of searching the position with hash `key` to
+        `depth` remaining plies, subject to the replacement policy.
+        """
+        slot = key & self._mask
+        entry = self._entries[slot]
+        if (entry is None or entry[GENERATION] != self.generation or
+                depth >= entry[DEPTH]):
+            self._entries[slot] = (key, depth, flag, value, move,
+                                   self.generation)
+
+    def lookup(self, key, depth, alpha, beta):
+        """Look up the position with hash `key` for a search of `depth`
+        remaining plies with the window (alpha, beta).
+
+        Returns
+        -------
+        (float or None, (int, int) or None)
+            The stored value if it was searched at least `depth` plies deep
+            and settles the window, and the stored best move.
+        """
+        entry = self.probe(key)
+        if entry is None:
+            return None, None
+        if entry[DEPTH] >= depth:
+            value, flag = entry[VALUE], entry[FLAG]
+            if (flag == EXACT or (flag == LOWER and value >= beta) or
+                    (flag == UPPER and value <= alpha)):
+                return value, entry[MOVE]
+        return None, entry[MOVE]
+
+    def record(self, key, depth, value, alpha, beta, move):
+        """Store the result of a search with the window (alpha, beta), as an
+        exact value or as the bound implied by the window.
+        """
+        self.store(key, depth, bound_type(value, alpha, beta), value, move)
+
+    def __len__(self):
+        return sum(entry is not None for entry in self._entries)
+
+
+class EvaluationCache:
+    """A score function that remembers the scores of the most recently
+    evaluated positions.
+
+    Every move blocks a cell, so the leaves of one iteration of iterative
+    deepening are never leaves of the next; evaluations are repeated when a
+    position is reached again by a different move order, or by the search
+    of a later move.  A transposition table already avoids most of those
+    (the cache then answers well under 1% of the calls), so the cache is
+    mostly useful for searches without a table or with a small one, where
+    it answers about one call in eight.
+
+    Scores are keyed by the position hash and by whether the player scored
+    is the one to move; the least recently used score is discarded once
+    `size` are stored.  The wrapped function must only depend on the
+    position and the player, as every heuristic in this project does.
+
+    Parameters
+    ----------
+    score_fn : callable
+        The heuristic `score_fn(game, player)` to cache.
+
+    size : int (optional)
+        The largest number of scores stored.
+
+    Attributes
+    ----------
+    hits, misses : int
+        The number of scores found in the cache, and computed.
+    """
+
+    def __init__(self, score_fn, size=2**16):
+        self.score_fn = score_fn
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._scores = OrderedDict()
+
+    def __call__(self, game, player):
+        key = game.hash() << 1 | (player is game.active_player)
+        scores = self._scores
+        score = scores.get(key)
+        if score is not None:
+            self.hits += 1
+            scores.move_to_end(key)
+            return score
+        self.misses += 1
+        score = scores[key] = self.score_fn(game, player)
+        if len(scores) > self.size:
+            scores.popitem(last=False)
+        return score
+
+    @property
+    def hit_rate(self):
+        """The fraction of calls answered from the cache. """
+        calls = self.hits + self.misses
+        return self.hits / calls if calls else 0.
+
+    def clear(self):
+        """Remove every score from the cache. """
+        self._scores.clear()
+
+    def __len__(self):
+        return len(self._scores)